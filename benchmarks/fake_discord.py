@@ -0,0 +1,466 @@
+import asyncio
+import itertools
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+import discord
+
+# In-process stand-ins for the parts of discord.py the Ticket cog touches.
+# Channels subclass the real TextChannel/CategoryChannel so the cog's
+# isinstance checks behave as in production; every REST call goes through
+# FakeApi, which adds latency, injects 429s and counts calls per route.
+
+_ids = itertools.count(1)
+
+
+def snowflake():
+    now = datetime.now(timezone.utc)
+    return discord.utils.time_snowflake(now) + next(_ids) % (1 << 22)
+
+
+class FakeApi:
+    def __init__(self, latency=0.08, jitter=0.04, rate_limit=0.0, retry_after=1.0, gateway_latency=0.02, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.gateway_latency = gateway_latency
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.rate_limited = Counter()
+
+    def reset(self):
+        self.calls.clear()
+        self.rate_limited.clear()
+
+    async def call(self, name, limited=True):
+        self.calls[name] += 1
+        delay = self.latency + (self.random.expovariate(1 / self.jitter) if self.jitter else 0)
+        if limited and self.rate_limit and self.random.random() < self.rate_limit:
+            # Same shape as discord.py giving up on a long 429 wait.
+            await asyncio.sleep(self.latency)
+            self.rate_limited[name] += 1
+            raise discord.RateLimited(self.retry_after)
+        await asyncio.sleep(delay)
+
+
+class FakeRole:
+    def __init__(self, guild, name, role_id=None):
+        self.guild = guild
+        self.id = role_id or snowflake()
+        self.name = name
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, FakeRole) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+# A member-typed Object, so overwrites keyed by it read as member overwrites
+# the way they do for real members.
+class FakeMember(discord.Object):
+    def __init__(self, guild, name, roles=(), admin=False):
+        super().__init__(snowflake(), type=discord.Member)
+        self.guild = guild
+        self.name = name
+        self.display_name = name
+        self.bot = False
+        self.roles = [guild.default_role, *roles]
+        self.guild_permissions = discord.Permissions(administrator=admin)
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    def __str__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return isinstance(other, FakeMember) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeActionRow:
+    # Message.components as Discord sends them back: rows of items that
+    # carry their custom_id.
+    def __init__(self, children):
+        self.children = list(children)
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content=None, embed=None, view=None):
+        self.id = snowflake()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content or ""
+        self.embeds = [embed] if embed is not None else []
+        self.components = [FakeActionRow(view.children)] if view is not None and view.children else []
+        self.attachments = []
+        self.created_at = datetime.now(timezone.utc)
+        self.edited_at = None
+        self.view = view
+
+
+class FakeCategory(discord.CategoryChannel):
+    def __init__(self, guild, name, overwrites=None, position=0):
+        self.id = snowflake()
+        self.guild = guild
+        self.name = name
+        self.position = position
+        self.category_id = None
+        self.nsfw = False
+        self._fake_overwrites = dict(overwrites or {})
+
+    def __repr__(self):
+        return f"<FakeCategory id={self.id} name={self.name!r}>"
+
+    @property
+    def overwrites(self):
+        return dict(self._fake_overwrites)
+
+    @property
+    def channels(self):
+        return [channel for channel in self.guild.channels if channel.category_id == self.id]
+
+    @property
+    def text_channels(self):
+        return [channel for channel in self.channels if isinstance(channel, FakeTextChannel)]
+
+    async def delete(self, *, reason=None):
+        await self.guild.api.call("delete_channel")
+        self.guild.remove_channel(self)
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, guild, name, category=None, overwrites=None, topic=None):
+        self.id = snowflake()
+        self.guild = guild
+        self.name = name
+        self.topic = topic
+        self.category_id = category.id if category is not None else None
+        self.position = 0
+        self.nsfw = False
+        self.last_message_id = None
+        self._fake_overwrites = dict(overwrites or {})
+        self.messages = []
+
+    def __repr__(self):
+        return f"<FakeTextChannel id={self.id} name={self.name!r}>"
+
+    @property
+    def overwrites(self):
+        return dict(self._fake_overwrites)
+
+    @property
+    def category(self):
+        return self.guild.get_channel(self.category_id)
+
+    def post(self, author, content):
+        # A user message arriving over the gateway; costs the bot nothing.
+        message = FakeMessage(self, author, content)
+        self.messages.append(message)
+        self.last_message_id = message.id
+        return message
+
+    async def send(self, content=None, *, embed=None, view=None, file=None, **kwargs):
+        await self.guild.api.call("send_message")
+        if file is not None:
+            file.close()
+        message = FakeMessage(self, self.guild.me, content, embed, view)
+        self.messages.append(message)
+        self.last_message_id = message.id
+        return message
+
+    async def fetch_message(self, message_id):
+        await self.guild.api.call("get_message")
+        for message in self.messages:
+            if message.id == message_id:
+                return message
+        raise discord.NotFound(FakeResponseMeta(404), "Unknown Message")
+
+    async def history(self, *, limit=100, oldest_first=False):
+        messages = self.messages if oldest_first else self.messages[::-1]
+        if limit is not None:
+            messages = messages[:limit]
+        # One request per page of 100, like the real pagination.
+        for start in range(0, max(1, len(messages)), 100):
+            await self.guild.api.call("get_messages")
+            for message in messages[start:start + 100]:
+                yield message
+
+    async def edit(self, *, overwrites=None, **fields):
+        await self.guild.api.call("edit_channel")
+        if overwrites is not None:
+            self._fake_overwrites = dict(overwrites)
+        for key, value in fields.items():
+            setattr(self, key, value)
+        return self
+
+    async def set_permissions(self, target, **permissions):
+        await self.guild.api.call("edit_channel_permissions")
+        self._fake_overwrites[target] = discord.PermissionOverwrite(**permissions)
+
+    async def create_thread(self, *, name, type=None, invitable=True, auto_archive_duration=None, **kwargs):
+        await self.guild.api.call("create_thread")
+        return self.guild.add_thread(FakeThread(self, name))
+
+    async def delete(self, *, reason=None):
+        await self.guild.api.call("delete_channel")
+        self.guild.remove_channel(self)
+
+
+class FakeThread(discord.Thread):
+    def __init__(self, parent, name):
+        self.id = snowflake()
+        self.guild = parent.guild
+        self.parent_id = parent.id
+        self.name = name
+        self.archived = False
+        self.locked = False
+        self.last_message_id = None
+        self.messages = []
+
+    def __repr__(self):
+        return f"<FakeThread id={self.id} name={self.name!r}>"
+
+    post = FakeTextChannel.post
+    send = FakeTextChannel.send
+    fetch_message = FakeTextChannel.fetch_message
+    history = FakeTextChannel.history
+
+    async def edit(self, *, archived=None, locked=None, **fields):
+        await self.guild.api.call("edit_channel")
+        if archived is not None:
+            self.archived = archived
+        if locked is not None:
+            self.locked = locked
+        return self
+
+    async def delete(self):
+        await self.guild.api.call("delete_channel")
+        self.guild.remove_thread(self)
+
+
+class FakeGuild:
+    def __init__(self, bot, api, name):
+        self.bot = bot
+        self.api = api
+        self.id = snowflake()
+        self.name = name
+        self.unavailable = False
+        self.filesize_limit = 25 * 1024 * 1024
+        self.default_role = FakeRole(self, "@everyone", self.id)
+        self._roles = {self.default_role.id: self.default_role}
+        self._channels = {}
+        self._threads = {}
+        # Threads Discord still has but the gateway cache dropped, as happens
+        # to archived private threads.
+        self._uncached_threads = set()
+        self._members = {}
+        self.me = FakeMember(self, "ticket-bot")
+        self.me.bot = True
+
+    @property
+    def channels(self):
+        return list(self._channels.values())
+
+    @property
+    def categories(self):
+        return [channel for channel in self._channels.values() if isinstance(channel, FakeCategory)]
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def add_role(self, name):
+        role = FakeRole(self, name)
+        self._roles[role.id] = role
+        return role
+
+    def add_member(self, name, roles=(), admin=False):
+        member = FakeMember(self, name, roles, admin)
+        self._members[member.id] = member
+        return member
+
+    def add_channel(self, channel):
+        self._channels[channel.id] = channel
+        self.bot.dispatch("guild_channel_create", channel)
+        return channel
+
+    def remove_channel(self, channel):
+        if self._channels.pop(channel.id, None) is not None:
+            self.bot.dispatch("guild_channel_delete", channel)
+
+    def add_thread(self, thread):
+        self._threads[thread.id] = thread
+        return thread
+
+    def remove_thread(self, thread):
+        self._threads.pop(thread.id, None)
+        self._uncached_threads.discard(thread.id)
+
+    def uncache_thread(self, thread):
+        self._uncached_threads.add(thread.id)
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def get_thread(self, thread_id):
+        return self._threads.get(thread_id) if thread_id not in self._uncached_threads else None
+
+    def get_channel_or_thread(self, channel_id):
+        return self.get_channel(channel_id) or self.get_thread(channel_id)
+
+    async def fetch_channel(self, channel_id):
+        await self.api.call("get_channel")
+        channel = self._channels.get(channel_id) or self._threads.get(channel_id)
+        if channel is None:
+            raise discord.NotFound(FakeResponseMeta(404), "Unknown Channel")
+        return channel
+
+    async def fetch_member(self, user_id):
+        await self.api.call("get_member")
+        member = self._members.get(user_id)
+        if member is None:
+            raise discord.NotFound(FakeResponseMeta(404), "Unknown Member")
+        return member
+
+    async def create_category(self, name, *, overwrites=None, position=0, **kwargs):
+        await self.api.call("create_channel")
+        return self.add_channel(FakeCategory(self, name, overwrites, position))
+
+    async def create_text_channel(self, name, *, category=None, overwrites=None, topic=None, **kwargs):
+        await self.api.call("create_channel")
+        return self.add_channel(FakeTextChannel(self, name, category, overwrites, topic))
+
+
+class FakeResponseMeta:
+    # Minimal aiohttp response shape for constructing discord.HTTPException.
+    def __init__(self, status):
+        self.status = status
+        self.reason = "Fake"
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _ack(self):
+        if self._done:
+            raise discord.InteractionResponded(self.interaction)
+        self._done = True
+        await self.interaction.api.call("interaction_response", limited=False)
+        self.interaction.acked()
+
+    async def send_message(self, content=None, *, embed=None, file=None, ephemeral=False, **kwargs):
+        if file is not None:
+            file.close()
+        await self._ack()
+        self.interaction.replies.append(content)
+
+    async def defer(self, *, ephemeral=False, thinking=False):
+        await self._ack()
+
+    async def send_modal(self, modal):
+        await self._ack()
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, *, ephemeral=False, **kwargs):
+        await self.interaction.api.call("followup", limited=False)
+        self.interaction.replies.append(content)
+
+
+class FakeInteraction:
+    def __init__(self, client, guild, user, channel):
+        self.client = client
+        self.api = guild.api
+        self.guild = guild
+        self.user = user
+        self.channel = channel
+        self.created = asyncio.get_running_loop().time()
+        self.ack_latency = None
+        self.replies = []
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(self)
+
+    def acked(self):
+        self.ack_latency = asyncio.get_running_loop().time() - self.created
+
+    async def edit_original_response(self, *, content=None, **kwargs):
+        await self.api.call("edit_original_response", limited=False)
+        self.replies.append(content)
+
+
+class FakeBot:
+    def __init__(self, api):
+        self.api = api
+        self.guilds = []
+        self.cached_messages = []
+        self.cog = None
+        self._pending = set()
+
+    def add_guild(self, name):
+        guild = FakeGuild(self, self.api, name)
+        self.guilds.append(guild)
+        return guild
+
+    def get_cog(self, name):
+        return self.cog
+
+    def get_guild(self, guild_id):
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    def get_channel(self, channel_id):
+        # Like the real client, cached threads are found too.
+        for guild in self.guilds:
+            channel = guild.get_channel_or_thread(channel_id)
+            if channel is not None:
+                return channel
+        return None
+
+    def add_view(self, view):
+        pass
+
+    def add_dynamic_items(self, *items):
+        pass
+
+    def dispatch(self, event, *args):
+        # Gateway events reach listeners a little after the REST reply.
+        listener = getattr(self.cog, f"on_{event}", None)
+        if listener is None:
+            return
+
+        async def deliver():
+            await asyncio.sleep(self.api.gateway_latency)
+            await listener(*args)
+
+        task = asyncio.get_running_loop().create_task(deliver())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def drain(self):
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.memory import format_bytes, rss_bytes
+
+# Filled in by import_ticket(): they need discord.py and utils.guild_config.
+discord = None
+fake_discord = None
+ticket_config = None
+
+# Drives the real Ticket cog (panel click -> open -> close -> delete) against
+# fake_discord at a chosen concurrency, with REST latency and 429 injection,
+# and reports throughput, tail latency and REST calls per ticket lifecycle.
+
+TICKET_TYPES = ("lahelu", "partner", "custom")
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+def import_ticket():
+    # Imported here rather than at the top so main() can report a missing
+    # dependency instead of dying with a traceback.
+    global discord, fake_discord, ticket_config
+    discord = importlib.import_module("discord")
+    fake_discord = importlib.import_module("fake_discord")
+    ticket_config = importlib.import_module("utils.ticket_config")
+    for name in ("cogs.ticket", "ticket"):
+        try:
+            return importlib.import_module(name)
+        except ModuleNotFoundError as exc:
+            if exc.name not in (name, name.split(".")[0]):
+                raise
+    raise ModuleNotFoundError("ticket")
+
+
+def install_guild_config(guilds):
+    # Point the cog's guild_config lookups at the fake guilds instead of the
+    # real config store.
+    ticket_config.get_ticket_category = lambda guild_id: guilds[guild_id]["category"]
+    ticket_config.get_ticket_log_channel = lambda guild_id: guilds[guild_id]["log_channel"]
+    ticket_config.get_ticket_roles = lambda guild_id, ticket_type: guilds[guild_id]["roles"]
+
+
+class Harness:
+    def __init__(self, module, api, args):
+        self.module = module
+        self.api = api
+        self.args = args
+        self.bot = fake_discord.FakeBot(api)
+        self.random = random.Random(args.seed)
+        self.latency = {}
+        self.ack = []
+        self.outcomes = Counter()
+        self.config = {}
+        self.sites = []
+
+    def record(self, step, started, interaction=None):
+        self.latency.setdefault(step, []).append(time.perf_counter() - started)
+        if interaction is not None and interaction.ack_latency is not None and step == "open":
+            self.ack.append(interaction.ack_latency)
+
+    async def setup(self):
+        for index in range(self.args.guilds):
+            guild = self.bot.add_guild(f"guild-{index}")
+            handler_role = guild.add_role("handler")
+            category = guild.add_channel(fake_discord.FakeCategory(guild, "Tickets"))
+            log_channel = guild.add_channel(fake_discord.FakeTextChannel(guild, "ticket-log"))
+            panel_channel = guild.add_channel(fake_discord.FakeTextChannel(guild, "ticket-panel"))
+            handler = guild.add_member("handler", roles=[handler_role])
+            self.config[guild.id] = {"category": category.id, "log_channel": log_channel.id, "roles": [handler_role.id]}
+            self.sites.append((guild, panel_channel, handler))
+        install_guild_config(self.config)
+
+        self.cog = self.module.Ticket(self.bot)
+        self.bot.cog = self.cog
+        await self.cog.cog_load()
+        buttons = [
+            {"label": ticket_type, "style": 1, "custom_id": ticket_type}
+            for ticket_type in TICKET_TYPES
+        ]
+        for guild, panel_channel, _ in self.sites:
+            panel_message = panel_channel.post(guild.me, "panel")
+            self.cog.store.set_panel(guild.id, {
+                "message_id": panel_message.id,
+                "channel_id": panel_channel.id,
+                "buttons": buttons
+            })
+        await self.cog.on_ready()
+        await self.bot.drain()
+
+    def new_user(self, index):
+        guild, panel_channel, handler = self.sites[index % len(self.sites)]
+        return guild, panel_channel, handler, guild.add_member(f"user-{index}")
+
+    async def open(self, guild, panel_channel, user, ticket_type):
+        button = self.module.TicketButton(ticket_type, discord.ButtonStyle.primary, ticket_type)
+        interaction = fake_discord.FakeInteraction(self.bot, guild, user, panel_channel)
+        started = time.perf_counter()
+        await button.callback(interaction)
+        self.record("open", started, interaction)
+        channel_id = self.cog.store.find_active(guild.id, user.id, ticket_type)
+        if channel_id:
+            self.outcomes["opened"] += 1
+        elif interaction.replies and str(interaction.replies[-1]).startswith(("🚦", "⌛")):
+            # Turned away by admission control rather than a failure.
+            self.outcomes["open_shed"] += 1
+        else:
+            self.outcomes["open_failed"] += 1
+        return guild.get_channel(channel_id) if channel_id else None
+
+    async def chat(self, channel, user, handler):
+        for index in range(self.args.messages):
+            author = user if index % 2 == 0 else handler
+            await self.cog.on_message(channel.post(author, f"pesan {index}"))
+            await asyncio.sleep(self.random.uniform(0, self.args.think))
+
+    async def close(self, guild, channel, handler):
+        interaction = fake_discord.FakeInteraction(self.bot, guild, handler, channel)
+        started = time.perf_counter()
+        await self.module.CloseTicketButton(channel).callback(interaction)
+        self.record("close", started)
+        self.outcomes["closed" if channel.id in self.cog.store.closed else "close_failed"] += 1
+
+    async def delete(self, guild, channel, user):
+        interaction = fake_discord.FakeInteraction(self.bot, guild, user, channel)
+        started = time.perf_counter()
+        await self.module.DeleteTicketButton(channel).callback(interaction)
+        self.record("delete", started)
+        self.outcomes["deleted" if guild.get_channel(channel.id) is None else "delete_failed"] += 1
+
+    async def lifecycle(self, index, gate):
+        guild, panel_channel, handler, user = self.new_user(index)
+        async with gate:
+            started = time.perf_counter()
+            channel = await self.open(guild, panel_channel, user, self.random.choice(TICKET_TYPES))
+            if channel is None:
+                return
+            await self.chat(channel, user, handler)
+            await self.close(guild, channel, handler)
+            await self.delete(guild, channel, user)
+            self.record("lifecycle", started)
+            self.outcomes["lifecycles"] += 1
+
+    async def open_only(self, index, gate):
+        guild, panel_channel, _, user = self.new_user(index)
+        async with gate:
+            await self.open(guild, panel_channel, user, self.random.choice(TICKET_TYPES))
+
+    async def expire_burst(self, count):
+        # Rewinds the deadline of every open ticket so the real expire loop
+        # closes them all at once.
+        tracked = list(self.cog.store.active)[:count]
+        expire_ticket = self.cog.expire_ticket
+        pending = set(tracked)
+        finished = asyncio.Event()
+
+        async def timed(ch_id):
+            started = time.perf_counter()
+            try:
+                await expire_ticket(ch_id)
+            finally:
+                self.record("expire", started)
+                self.outcomes["expired" if ch_id in self.cog.store.closed else "expire_failed"] += 1
+                pending.discard(ch_id)
+                if not pending:
+                    finished.set()
+
+        self.cog.expire_ticket = timed
+        for ch_id in tracked:
+            self.cog.expiry.touch(ch_id, time.time() - self.module.AUTO_EXPIRE_SECONDS - 1)
+        if pending:
+            await finished.wait()
+        self.cog.expire_ticket = expire_ticket
+
+    async def run(self):
+        args = self.args
+        gate = asyncio.Semaphore(args.concurrency)
+        if args.scenario in ("expire", "mixed"):
+            await asyncio.gather(*(self.open_only(index, gate) for index in range(args.expire)))
+            await self.bot.drain()
+            self.outcomes.clear()
+            self.latency.clear()
+            self.ack.clear()
+            self.api.reset()
+        offset = args.expire if args.scenario in ("expire", "mixed") else 0
+
+        started = time.perf_counter()
+        if args.scenario == "open":
+            await asyncio.gather(*(self.open_only(index, gate) for index in range(args.users)))
+        elif args.scenario == "lifecycle":
+            await asyncio.gather(*(self.lifecycle(index, gate) for index in range(args.users)))
+        elif args.scenario == "expire":
+            await self.expire_burst(args.expire)
+        else:
+            await asyncio.gather(
+                self.expire_burst(args.expire),
+                *(self.lifecycle(offset + index, gate) for index in range(args.users))
+            )
+        await self.bot.drain()
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        args = self.args
+        load = f"{args.expire} ticket expire" if args.scenario == "expire" else f"{args.users} user"
+        if args.scenario == "mixed":
+            load += f" + {args.expire} ticket expire"
+        print(
+            f"Skenario {args.scenario}: {load}, {args.guilds} guild, konkurensi {args.concurrency}, "
+            f"latensi {args.latency_ms:.0f}+~{args.jitter_ms:.0f}ms, 429 {args.rate_limit:.1%}, storage {args.storage}"
+        )
+        print(f"Durasi {elapsed:.2f}s | hasil: {dict(self.outcomes)}")
+        units = self.outcomes.get("lifecycles") or self.outcomes.get("opened") or self.outcomes.get("expired") or 0
+        if units:
+            print(f"Throughput: {units / elapsed:.1f}/s")
+        print(f"{'langkah':12} {'n':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        rows = dict(self.latency)
+        if self.ack:
+            rows["open ack"] = self.ack
+        for step, samples in rows.items():
+            print(
+                f"{step:12} {len(samples):6} {percentile(samples, 0.5) * 1000:9.1f} {percentile(samples, 0.9) * 1000:9.1f} "
+                f"{percentile(samples, 0.99) * 1000:9.1f} {max(samples) * 1000:9.1f}"
+            )
+        total = sum(self.api.calls.values())
+        print(f"Panggilan REST: {total} total, {sum(self.api.rate_limited.values())} kena 429")
+        for name, count in self.api.calls.most_common():
+            per_unit = f"{count / units:6.2f}/tiket" if units else ""
+            limited = self.api.rate_limited.get(name, 0)
+            print(f"  {name:26} {count:7} {per_unit} {f'({limited} x 429)' if limited else ''}")
+        print(f"RSS: {format_bytes(rss_bytes())}")
+
+
+async def main(args):
+    try:
+        module = import_ticket()
+    except ModuleNotFoundError as exc:
+        print(f"❌ Cog ticket tidak bisa diimpor ({exc}); butuh discord.py dan utils.guild_config.")
+        return 1
+    module.TICKET_STORAGE = args.storage
+    if args.no_admission:
+        # Measure raw capacity: every click goes straight to the API.
+        for name in ("USER", "GUILD", "GLOBAL"):
+            os.environ[f"TICKET_OPEN_{name}_PER_MIN"] = "0"
+    module.LIVE_TRANSCRIPT = args.live_transcript
+
+    api = fake_discord.FakeApi(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        gateway_latency=args.gateway_ms / 1000,
+        seed=args.seed
+    )
+    directory = tempfile.mkdtemp(prefix="ticket-load-")
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        harness = Harness(module, api, args)
+        await harness.setup()
+        api.reset()
+        elapsed = await harness.run()
+        harness.report(elapsed)
+        await harness.cog.cog_unload()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+    return 1 if any(outcome.endswith("_failed") for outcome in harness.outcomes) else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test cog Ticket dengan Discord tiruan")
+    parser.add_argument("--scenario", choices=("lifecycle", "open", "expire", "mixed"), default="lifecycle")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--guilds", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--expire", type=int, default=200, help="jumlah ticket untuk burst expire (expire/mixed)")
+    parser.add_argument("--messages", type=int, default=4, help="pesan per ticket sebelum ditutup")
+    parser.add_argument("--think", type=float, default=0.05, help="jeda maksimal antar pesan (detik)")
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--gateway-ms", type=float, default=20)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="peluang tiap panggilan REST kena 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--live-transcript", action="store_true")
+    parser.add_argument("--no-admission", action="store_true", help="matikan admission control pembuatan ticket")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
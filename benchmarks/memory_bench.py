@@ -0,0 +1,126 @@
+import argparse
+import gc
+import itertools
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+
+from utils.bot_profile import bot_options
+from utils.memory import format_bytes, rss_bytes
+
+PROFILES = ("full", "lean")
+
+# Feeds the same synthetic gateway traffic into a discord.py connection state
+# built with each BOT_PROFILE's client options, one child process per profile
+# so RSS is not shared, and reports what each one keeps resident. Payloads
+# follow what Discord sends for the profile's intents: member lists and
+# presences only with those intents (as after startup chunking), messages
+# either way.
+
+
+def guild_payloads(args, intents):
+    ids = itertools.count(10 ** 17)
+    for g in range(args.guilds):
+        guild_id = str(next(ids))
+        channels = [
+            {"id": str(next(ids)), "type": 0, "name": f"channel-{i}", "position": i, "permission_overwrites": [], "guild_id": guild_id}
+            for i in range(args.channels)
+        ]
+        members = []
+        presences = []
+        if intents.members:
+            for m in range(args.members):
+                user = {"id": str(next(ids)), "username": f"user{m}", "discriminator": "0", "avatar": None, "global_name": f"User {m}"}
+                members.append({"user": user, "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0})
+                if intents.presences and m < args.members * args.online:
+                    presences.append({
+                        "user": {"id": user["id"]},
+                        "status": "online",
+                        "activities": [{"name": "game", "type": 0}],
+                        "client_status": {"desktop": "online"}
+                    })
+        everyone = {"id": guild_id, "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                    "hoist": False, "managed": False, "mentionable": False}
+        guild = {
+            "id": guild_id, "name": f"guild-{g}", "roles": [everyone], "channels": channels, "members": members,
+            "presences": presences, "member_count": args.members, "threads": [], "emojis": [], "stickers": [],
+            "features": [], "large": args.members > 250
+        }
+        messages = [
+            {
+                "id": str(next(ids)), "channel_id": channels[i % len(channels)]["id"], "guild_id": guild_id,
+                "author": {"id": str(next(ids)), "username": "user", "discriminator": "0", "avatar": None},
+                "content": f"pesan {i} " + "x" * 60, "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None,
+                "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+                "embeds": [], "pinned": False, "type": 0
+            }
+            for i in range(args.messages)
+        ]
+        yield guild, messages
+
+
+def measure(profile, args):
+    client = discord.Client(**bot_options(profile))
+    state = client._connection
+    # No gateway and no event loop: events are parsed but not dispatched.
+    state.dispatch = lambda *a, **kw: None
+    state.user = discord.ClientUser(state=state, data={"id": "1", "username": "ticket-bot", "discriminator": "0", "avatar": None, "bot": True})
+    gc.collect()
+    before = rss_bytes()
+    for guild, messages in guild_payloads(args, state._intents):
+        state._get_create_guild(guild)
+        for message in messages:
+            state.parse_message_create(message)
+        del guild, messages
+    gc.collect()
+    return {
+        "profile": profile,
+        "rss_before": before,
+        "rss_after": rss_bytes(),
+        "guilds": len(state.guilds),
+        "members": sum(len(guild.members) for guild in state.guilds),
+        "messages": len(state._messages or ()),
+    }
+
+
+def run_child(profile, argv):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", profile, *argv],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main(args, argv):
+    if args.child:
+        print(json.dumps(measure(args.child, args)))
+        return 0
+    print(f"{args.guilds} guild x {args.members} member, {args.channels} channel, {args.messages} pesan per guild")
+    results = {profile: run_child(profile, argv) for profile in PROFILES}
+    print(f"{'profil':<8}{'RSS awal':>12}{'RSS akhir':>12}{'selisih':>12}{'member':>10}{'pesan':>8}")
+    for profile, result in results.items():
+        grown = result["rss_after"] - result["rss_before"]
+        print(
+            f"{profile:<8}{format_bytes(result['rss_before']):>12}{format_bytes(result['rss_after']):>12}"
+            f"{format_bytes(grown):>12}{result['members']:>10}{result['messages']:>8}"
+        )
+    saved = results["full"]["rss_after"] - results["lean"]["rss_after"]
+    print(f"📉 Profil lean menghemat {format_bytes(saved)} RSS dibanding full")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bandingkan RSS profil bot full dan lean")
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=2000, help="member per guild")
+    parser.add_argument("--channels", type=int, default=30, help="channel per guild")
+    parser.add_argument("--messages", type=int, default=200, help="pesan per guild")
+    parser.add_argument("--online", type=float, default=0.3, help="porsi member dengan presence")
+    parser.add_argument("--child", choices=PROFILES, help=argparse.SUPPRESS)
+    argv = sys.argv[1:]
+    sys.exit(main(parser.parse_args(argv), argv))
@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ticket_journal import TicketJournal
+from utils.ticket_storage import JsonStorage, SqliteStorage, atomic_write
+from utils.ticket_store import TicketStore
+
+GUILDS = 10
+REGRESSION_THRESHOLD = 0.20
+
+
+def written_bytes():
+    # Bytes passed to write() by this process, including worker threads.
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+class Recorder:
+    def __init__(self):
+        self.results = {}
+
+    def add(self, name, samples, written=None, peak=None):
+        ops = len(samples)
+        self.results[name] = {
+            "ops": ops,
+            "p50_ms": percentile(samples, 0.5) * 1000,
+            "p90_ms": percentile(samples, 0.9) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "max_ms": max(samples) * 1000,
+            "bytes_per_op": None if written is None else written / ops,
+            "peak_kb": None if peak is None else peak / 1024,
+        }
+
+
+async def measure(recorder, name, op, ops):
+    tracemalloc.start()
+    before = written_bytes()
+    samples = []
+    for i in range(ops):
+        started = time.perf_counter()
+        await op(i)
+        samples.append(time.perf_counter() - started)
+    after = written_bytes()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    recorder.add(name, samples, None if before is None else after - before, peak)
+
+
+def synthetic_state(size, rng):
+    now = time.time()
+    closed = {
+        10_000_000 + i: {"user_id": rng.randrange(1 << 40), "guild_id": i % GUILDS, "ticket_type": "lahelu", "closed_by": 1}
+        for i in range(size)
+    }
+    active = {
+        20_000_000 + i: {
+            "user_id": i, "guild_id": i % GUILDS, "ticket_type": "partner",
+            "opened_at": "2024-01-01T00:00:00", "last_activity": now, "channel_id": 20_000_000 + i
+        }
+        for i in range(max(1, size // 10))
+    }
+    bans = {str(g): {} for g in range(GUILDS)}
+    for i in range(max(1, size // 10)):
+        bans[str(i % GUILDS)][30_000_000 + i] = None
+    log = [dict(data, closed_at="2024-01-02T00:00:00", channel_id=ch_id) for ch_id, data in closed.items()]
+    return {"bans": bans, "panels": {}, "active": active, "closed": closed}, log
+
+
+def create_backend(kind, directory):
+    if kind == "sqlite":
+        return SqliteStorage(os.path.join(directory, "tickets.db"))
+    journal = TicketJournal(os.path.join(directory, "ticket_log"), fsync_interval=0)
+    return JsonStorage(
+        os.path.join(directory, "ticket_bans.json"),
+        os.path.join(directory, "ticket_buttons.json"),
+        os.path.join(directory, "ticket_active.json"),
+        os.path.join(directory, "ticket_closed.json"),
+        journal
+    )
+
+
+async def seed(kind, directory, state, log):
+    store = TicketStore(create_backend(kind, directory), flush_delay=3600)
+    await store.load()
+    store.bans, store.active, store.closed = state["bans"], state["active"], state["closed"]
+    for name in ("bans", "active", "closed"):
+        store.mark_dirty(name)
+    for entry in log:
+        await store.append_log(entry)
+    await store.close()
+
+
+async def bench_backend(recorder, kind, size, ops, rng):
+    directory = tempfile.mkdtemp(prefix=f"ticket-bench-{kind}-")
+    try:
+        state, log = synthetic_state(size, rng)
+        await seed(kind, directory, state, log)
+        prefix = f"{kind}/{size}"
+
+        async def load(_):
+            store = TicketStore(create_backend(kind, directory))
+            await store.load()
+            await store.backend.close()
+        await measure(recorder, f"{prefix}/load", load, max(3, ops // 40))
+
+        store = TicketStore(create_backend(kind, directory), flush_delay=3600)
+        await store.load()
+        active_ids = list(store.active)
+
+        async def ban(i):
+            store.ban(i % GUILDS, 40_000_000 + i)
+            await store.flush()
+        await measure(recorder, f"{prefix}/ban+flush", ban, ops)
+
+        async def open_ticket(i):
+            store.add_active(50_000_000 + i, {"user_id": i, "guild_id": i % GUILDS, "ticket_type": "custom", "last_activity": time.time()})
+            await store.flush()
+        await measure(recorder, f"{prefix}/open+flush", open_ticket, ops)
+
+        async def close_ticket(i):
+            ch_id = 50_000_000 + i
+            data = store.pop_active(ch_id)
+            await store.append_log(dict(data, closed_at="2024-01-03T00:00:00"))
+            store.add_closed(ch_id, {"user_id": data["user_id"], "guild_id": data["guild_id"], "ticket_type": "custom", "closed_by": 1})
+            await store.flush()
+            if kind == "json":
+                await store.backend.journal.flush()
+        await measure(recorder, f"{prefix}/close+flush", close_ticket, ops)
+
+        async def lookups(i):
+            for j in range(1000):
+                store.is_banned(j % GUILDS, 30_000_000 + j)
+                store.find_active(j % GUILDS, j, "partner")
+        await measure(recorder, f"{prefix}/lookup x1000", lookups, max(3, ops // 10))
+
+        async def touch_active(i):
+            channel_id = active_ids[i % len(active_ids)]
+            store.active[channel_id]["last_activity"] = time.time()
+            store.mark_dirty("active", channel_id)
+            await store.flush()
+        await measure(recorder, f"{prefix}/activity+flush", touch_active, ops)
+        await store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# The JSON helpers the cog used before TicketStore, copied verbatim as the
+# baseline for the legacy group. File names are relative to the run directory.
+LEGACY_LOG_FILE = "ticket_log.json"
+LEGACY_BANS_FILE = "ticket_bans.json"
+LEGACY_CLOSED_FILE = "ticket_closed.json"
+
+
+def load_banned_users():
+    if os.path.exists(LEGACY_BANS_FILE):
+        with open(LEGACY_BANS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_ticket_log(entry):
+    logs = []
+    if os.path.exists(LEGACY_LOG_FILE):
+        with open(LEGACY_LOG_FILE, "r", encoding="utf-8") as f:
+            try:
+                logs = json.load(f)
+            except json.JSONDecodeError:
+                logs = []
+    logs.append(entry)
+    with open(LEGACY_LOG_FILE, "w", encoding="utf-8") as f:
+        json.dump(logs, f, indent=2)
+
+
+def save_closed_tickets(data):
+    with open(LEGACY_CLOSED_FILE, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+async def bench_legacy(recorder, size, ops, rng):
+    directory = tempfile.mkdtemp(prefix="ticket-bench-legacy-")
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        state, log = synthetic_state(size, rng)
+        atomic_write(LEGACY_LOG_FILE, json.dumps(log))
+        atomic_write(LEGACY_BANS_FILE, json.dumps({g: list(users) for g, users in state["bans"].items()}))
+        closed = {str(ch_id): data for ch_id, data in state["closed"].items()}
+        active = state["active"]
+        prefix = f"legacy/{size}"
+
+        async def save_log(i):
+            save_ticket_log({"channel_id": i, "closed_at": "2024-01-03T00:00:00"})
+        await measure(recorder, f"{prefix}/save_ticket_log", save_log, max(3, ops // 20))
+
+        async def save_closed(i):
+            closed[str(60_000_000 + i)] = {"user_id": i}
+            save_closed_tickets(closed)
+        await measure(recorder, f"{prefix}/save_closed_tickets", save_closed, max(3, ops // 20))
+
+        ban_checks = Counter()
+
+        async def load_bans(i):
+            # Same user/guild pairing as synthetic_state: a hit for every
+            # seeded ban, found by walking the guild's list like the old cog.
+            banned = load_banned_users()
+            ban_checks["hit" if 30_000_000 + i in banned.get(str(i % GUILDS), []) else "miss"] += 1
+        await measure(recorder, f"{prefix}/load_banned_users+check", load_bans, max(3, ops // 20))
+        print(f"… legacy {size}: {ban_checks['hit']}/{sum(ban_checks.values())} cek ban kena", file=sys.stderr)
+
+        async def active_scan(i):
+            # The pre-store duplicate check walked every active ticket per
+            # click, matching owner and type; half of the lookups miss.
+            for j in range(1000):
+                user_id = (j * 7919) % (len(active) * 2)
+                for ch_id, data in active.items():
+                    if data["user_id"] == user_id and data["ticket_type"] == "partner":
+                        break
+        await measure(recorder, f"{prefix}/active scan x1000", active_scan, max(3, ops // 10))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def report(results, baseline=None):
+    header = f"{'operation':40} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'B/op':>11} {'peak KB':>9}"
+    if baseline is not None:
+        header += f" {'p50 vs base':>12}"
+    print(header)
+    regressions = []
+    for name, row in results.items():
+        line = (
+            f"{name:40} {row['p50_ms']:9.3f} {row['p90_ms']:9.3f} {row['p99_ms']:9.3f} {row['max_ms']:9.3f} "
+            f"{fmt(row['bytes_per_op'], '11.0f')} {fmt(row['peak_kb'], '9.0f')}"
+        )
+        base = (baseline or {}).get(name)
+        if base is not None and base["p50_ms"] > 0:
+            ratio = row["p50_ms"] / base["p50_ms"]
+            flag = " !" if ratio > 1 + REGRESSION_THRESHOLD else ""
+            line += f" {ratio:11.2f}x{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    for size in args.sizes:
+        # Full-file JSON writes grow with the dataset, so large sizes take
+        # fewer samples to keep a run in minutes.
+        ops = max(10, min(args.ops, args.ops * 10_000 // size))
+        for kind in args.backends:
+            if kind == "legacy":
+                await bench_legacy(recorder, size, ops, rng)
+            else:
+                await bench_backend(recorder, kind, size, ops, rng)
+            print(f"… {kind} {size} selesai", file=sys.stderr)
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = report(recorder.results, baseline)
+    if "legacy" not in args.backends:
+        print("ℹ️ Grup legacy dilewati: tidak ada di --backends.")
+    missing = sorted(set(baseline or {}) - set(recorder.results))
+    if missing:
+        shown = ", ".join(missing[:6]) + (", …" if len(missing) > 6 else "")
+        print(f"ℹ️ {len(missing)} operasi di baseline tidak diukur pada run ini (ukuran/backend lain): {shown}")
+    if args.save_baseline:
+        payload = {"created_at": time.time(), "python": sys.version.split()[0], "results": recorder.results}
+        atomic_write(args.save_baseline, json.dumps(payload, indent=2))
+        print(f"💾 Baseline disimpan ke {args.save_baseline}")
+    if regressions:
+        print(f"❌ {len(regressions)} operasi lebih lambat >{REGRESSION_THRESHOLD:.0%} dari baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark jalur penyimpanan ticket")
+    parser.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[1000, 10000, 100000])
+    parser.add_argument("--backends", type=lambda v: v.split(","), default=["json", "sqlite", "legacy"])
+    parser.add_argument("--ops", type=int, default=200, help="sampel per operasi tulis")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="file baseline JSON untuk dibandingkan")
+    parser.add_argument("--save-baseline", help="simpan hasil sebagai baseline JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
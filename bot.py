@@ -3,42 +3,52 @@ from discord.ext import commands
 import os
 from dotenv import load_dotenv
 import asyncio
+import signal
+import sys
+from utils.memory import cache_summary, format_bytes
+from utils.bot_profile import bot_options
+from utils.cluster import ClusterConfig, ShardLeases, run_cluster
 
 load_dotenv()
 
 TOKEN = os.getenv("BOT_TOKEN")
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+BOT_PROFILE = os.getenv("BOT_PROFILE", "full")
+CLUSTER = ClusterConfig.from_env()
+
+def shard_options(cluster):
+    if not cluster.enabled:
+        return commands.Bot, {}
+    return commands.AutoShardedBot, {"shard_ids": cluster.shard_ids, "shard_count": cluster.shard_count}
+
+bot_class, shard_kwargs = shard_options(CLUSTER)
+# Long bucket waits surface as discord.RateLimited so the ticket REST
+# scheduler can requeue the call instead of stalling a concurrency slot.
+bot = bot_class(
+    command_prefix="!",
+    help_command=None,
+    max_ratelimit_timeout=30.0,
+    **bot_options(BOT_PROFILE),
+    **shard_kwargs
+)
+
+synced = False
 
 @bot.event
 async def on_ready():
+    global synced
     print(f"✅ Logged in as {bot.user}")
+    stats = cache_summary(bot)
+    print(
+        f"📊 Profil {BOT_PROFILE}: RSS {format_bytes(stats['rss'])}, {stats['guilds']} guild, "
+        f"{stats['members']} member dan {stats['messages']} pesan di cache"
+    )
+    # Application commands are global, so one cluster syncing them is enough.
+    if synced or CLUSTER.cluster_id != 0:
+        return
     try:
-
-        from cogs.ticket import load_ticket_buttons, TicketPanelView, load_closed_tickets, DeleteReopenView, load_active_tickets, CloseTicketButton
-        data = load_ticket_buttons()
-        for guild_id, info in data.items():
-            buttons = info.get("buttons", [])
-            if buttons:
-                bot.add_view(TicketPanelView(buttons))
-
-        closed_tickets = load_closed_tickets()
-        for ch_id, data in closed_tickets.items():
-            channel = bot.get_channel(int(ch_id))
-            if channel:
-                user_id = data.get("user_id")
-                bot.add_view(DeleteReopenView(channel, user_id))
-
-        active_ticket_ids = load_active_tickets()
-        for ch_id in active_ticket_ids:
-            channel = bot.get_channel(ch_id)
-            if channel:
-                view = discord.ui.View(timeout=None)
-                view.add_item(CloseTicketButton(channel))
-                bot.add_view(view)
-
-        synced = await bot.tree.sync()
-        print(f"🔧 Synced {len(synced)} command(s)")
+        synced_commands = await bot.tree.sync()
+        synced = True
+        print(f"🔧 Synced {len(synced_commands)} command(s)")
     except Exception as e:
         import traceback
         print(f"❌ Sync failed: {e}")
@@ -68,8 +78,27 @@ async def on_command_error(ctx, error):
         )
 
 async def main():
-    await bot.load_extension("cogs.ticket")
-    await bot.start(TOKEN)
+    leases = None
+    if CLUSTER.enabled:
+        print(f"🧩 Cluster {CLUSTER.cluster_id}/{CLUSTER.clusters}, shard {CLUSTER.shard_ids} dari {CLUSTER.shard_count}")
+        # Another worker owns these guilds now: stop, and let the supervisor
+        # restart us to wait for the lease again.
+        leases = ShardLeases(
+            os.getenv("TICKET_DB_FILE", "tickets.db"), CLUSTER.owner, CLUSTER.shard_ids,
+            on_lost=lambda: asyncio.create_task(bot.close())
+        )
+        await leases.acquire()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    try:
+        await bot.load_extension("cogs.ticket")
+        await bot.start(TOKEN)
+    finally:
+        if leases is not None:
+            await leases.release()
+    return 1 if leases is not None and leases.lost else 0
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if CLUSTER.enabled and not CLUSTER.is_worker:
+        run_cluster(CLUSTER)
+    else:
+        sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -0,0 +1,96 @@
+import contextlib
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+def install_guild_config_stub():
+    # utils/guild_config.py is the bot's shared config store and does not
+    # ship with this repository; tests get an in-memory stand-in with the
+    # same functions so the cog can be imported.
+    try:
+        importlib.import_module("utils.guild_config")
+        return
+    except ModuleNotFoundError as exc:
+        if exc.name != "utils.guild_config":
+            raise
+    config = {}
+    module = types.ModuleType("utils.guild_config")
+
+    def guild(guild_id):
+        return config.setdefault(guild_id, {"category": None, "log_channel": None, "roles": {}})
+
+    def set_ticket_category(guild_id, category_id):
+        guild(guild_id)["category"] = category_id
+
+    def set_ticket_log_channel(guild_id, channel_id):
+        guild(guild_id)["log_channel"] = channel_id
+
+    def add_ticket_role(guild_id, ticket_type, role_id):
+        roles = guild(guild_id)["roles"].setdefault(ticket_type, [])
+        if role_id not in roles:
+            roles.append(role_id)
+
+    def remove_ticket_role(guild_id, ticket_type, role_id):
+        roles = guild(guild_id)["roles"].get(ticket_type, [])
+        if role_id in roles:
+            roles.remove(role_id)
+
+    module.set_ticket_category = set_ticket_category
+    module.set_ticket_log_channel = set_ticket_log_channel
+    module.add_ticket_role = add_ticket_role
+    module.remove_ticket_role = remove_ticket_role
+    module.get_ticket_category = lambda guild_id: guild(guild_id)["category"]
+    module.get_ticket_log_channel = lambda guild_id: guild(guild_id)["log_channel"]
+    module.get_ticket_roles = lambda guild_id, ticket_type: list(guild(guild_id)["roles"].get(ticket_type, []))
+    sys.modules["utils.guild_config"] = module
+
+
+install_guild_config_stub()
+
+
+@pytest.fixture
+def ticket_module(monkeypatch):
+    pytest.importorskip("discord")
+    import load_test
+
+    module = load_test.import_ticket()
+    # load_test.main() sets these on the module; keep them from leaking
+    # into later tests.
+    monkeypatch.setattr(module, "TICKET_STORAGE", "json")
+    monkeypatch.setattr(module, "LIVE_TRANSCRIPT", False)
+    for name in ("USER", "GUILD", "GLOBAL"):
+        monkeypatch.setenv(f"TICKET_OPEN_{name}_PER_MIN", "0")
+    return module
+
+
+@pytest.fixture
+def ticket_harness(ticket_module, tmp_path, monkeypatch):
+    # Runs the real Ticket cog against benchmarks/fake_discord in a scratch
+    # directory. Use inside the test's event loop:
+    #     async with ticket_harness() as harness: ...
+    import fake_discord
+    import load_test
+
+    monkeypatch.chdir(tmp_path)
+
+    @contextlib.asynccontextmanager
+    async def start(*argv):
+        args = load_test.parse_args(["--latency-ms", "0", "--jitter-ms", "0", "--gateway-ms", "0", "--no-admission", *argv])
+        api = fake_discord.FakeApi(latency=0, jitter=0, gateway_latency=0, seed=args.seed)
+        harness = load_test.Harness(ticket_module, api, args)
+        await harness.setup()
+        try:
+            yield harness
+        finally:
+            await harness.bot.drain()
+            await harness.cog.cog_unload()
+
+    return start
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from utils.admission import AdmissionController, TokenBucket
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=0.5, capacity=2, now=0)
+    assert bucket.take(0)
+    assert bucket.take(0)
+    assert not bucket.take(0)
+    assert bucket.wait_time(0) == pytest.approx(2.0)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    assert bucket.take(2)
+    assert not bucket.full(2)
+    assert bucket.full(100)
+    assert bucket.tokens == 2
+    # A clock that goes backwards never drains the bucket.
+    assert bucket.wait_time(50) == 0.0
+
+
+def test_user_bucket_rejects_repeat_clicks():
+    clock = FakeClock()
+    admission = AdmissionController(user_rate=6, user_burst=2, clock=clock)
+    assert admission.check_user(1, 42) is None
+    assert admission.check_user(1, 42) is None
+    assert admission.check_user(1, 42) == pytest.approx(10.0)
+    # Other users and other guilds have their own buckets.
+    assert admission.check_user(1, 43) is None
+    assert admission.check_user(2, 42) is None
+    clock.now = 10
+    assert admission.check_user(1, 42) is None
+
+
+def test_disabled_limits_admit_everything():
+    admission = AdmissionController(user_rate=0, guild_rate=0, global_rate=0, clock=FakeClock())
+    assert admission.check_user(1, 1) is None
+    assert all(admission.try_admit(1) for _ in range(1000))
+
+
+def test_guild_bucket_admits_burst_then_refuses():
+    clock = FakeClock()
+    admission = AdmissionController(guild_rate=60, guild_burst=3, global_rate=0, clock=clock)
+    assert [admission.try_admit(1) for _ in range(4)] == [True, True, True, False]
+    assert admission.try_admit(2)
+    clock.now = 1
+    assert admission.try_admit(1)
+
+
+def test_queue_sheds_when_full():
+    async def run():
+        admission = AdmissionController(guild_rate=60, guild_burst=1, global_rate=0, max_queue=2, max_queue_total=3, clock=FakeClock())
+        assert admission.try_admit(1)
+        first = admission.enqueue(1)
+        second = admission.enqueue(1)
+        assert admission.enqueue(1) is None
+        assert admission.position(first) == 1
+        assert admission.position(second) == 2
+        assert admission.try_admit(2)
+        assert admission.enqueue(2) is not None
+        # The total cap sheds even a guild with an empty queue.
+        assert admission.enqueue(3) is None
+        assert len(admission) == 3
+        await admission.close()
+        assert len(admission) == 0
+        assert first.future.result() is False
+
+    asyncio.run(run())
+
+
+def test_waiters_are_served_round_robin():
+    async def run():
+        clock = FakeClock()
+        admission = AdmissionController(guild_rate=60, guild_burst=1, global_rate=60, global_burst=1, clock=clock)
+        assert admission.try_admit(1)
+        waiters = [admission.enqueue(1), admission.enqueue(1), admission.enqueue(2)]
+        order = []
+        for waiter in waiters:
+            waiter.future.add_done_callback(lambda _, w=waiter: order.append(waiters.index(w)))
+        # One global token per second: guild 2 gets the second turn even
+        # though guild 1 queued first.
+        for now in (1, 2, 3):
+            clock.now = now
+            admission._wake.set()
+            await asyncio.sleep(0.01)
+        await admission.close()
+        return order
+
+    assert asyncio.run(run()) == [0, 2, 1]
+
+
+def test_wait_times_out_and_reports_position():
+    async def run():
+        clock = FakeClock()
+        admission = AdmissionController(guild_rate=1, guild_burst=1, global_rate=0, clock=clock)
+        assert admission.try_admit(1)
+        ahead = admission.enqueue(1)
+        waiter = admission.enqueue(1)
+        positions = []
+
+        async def on_position(position):
+            positions.append(position)
+
+        async def tick():
+            await asyncio.sleep(0.02)
+            admission.cancel(ahead)
+            await asyncio.sleep(0.02)
+            clock.now = 10
+
+        ticker = asyncio.create_task(tick())
+        admitted = await admission.wait(waiter, timeout=5, on_position=on_position, update_every=0.01)
+        await ticker
+        assert admission.position(waiter) is None
+        await admission.close()
+        return admitted, positions
+
+    admitted, positions = asyncio.run(run())
+    assert admitted is False
+    assert positions == [1]
+
+
+def test_close_is_not_delayed_by_an_enqueue_on_the_same_tick():
+    async def run():
+        admission = AdmissionController(guild_rate=60, guild_burst=1, global_rate=0, clock=FakeClock())
+        assert admission.try_admit(1)
+        first = admission.enqueue(1)
+        await asyncio.sleep(0.01)
+        # The enqueue's wake and close()'s cancel reach the dispatcher together.
+        second = admission.enqueue(1)
+        closing = asyncio.create_task(admission.close())
+        done, _ = await asyncio.wait((closing,), timeout=0.5)
+        assert closing in done
+        assert first.future.result() is False
+        assert second.future.result() is False
+
+    asyncio.run(run())
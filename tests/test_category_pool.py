@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import fake_discord
+from utils.category_pool import CATEGORY_LIMIT, CategoryPool
+from utils.rest_scheduler import RestScheduler
+
+
+def make_guild(filled=0):
+    api = fake_discord.FakeApi(latency=0, jitter=0, gateway_latency=0)
+    guild = fake_discord.FakeBot(api).add_guild("guild")
+    base = guild.add_channel(fake_discord.FakeCategory(guild, "Tickets", position=3))
+    fill(guild, base, filled)
+    return api, guild, base
+
+
+def fill(guild, category, count):
+    return [guild.add_channel(fake_discord.FakeTextChannel(guild, f"ticket-{i}", category)) for i in range(count)]
+
+
+def test_full_category_overflows_once():
+    async def run():
+        api, guild, base = make_guild(filled=CATEGORY_LIMIT - 1)
+        rest = RestScheduler()
+        pool = CategoryPool(rest)
+        # The last free slot is reserved, not counted from the API.
+        assert await pool.acquire(guild, base, "partner", {}) is base
+        assert pool.occupancy(base.id) == CATEGORY_LIMIT
+        created = await asyncio.gather(*(pool.acquire(guild, base, "partner", {}) for _ in range(3)))
+        await rest.close()
+        return api, base, created, pool
+
+    api, base, created, pool = asyncio.run(run())
+    overflow = created[0]
+    assert all(category is overflow for category in created)
+    assert overflow.name == "Tickets • partner 2"
+    assert overflow.position == base.position + 1
+    assert api.calls["create_channel"] == 1
+    assert pool.occupancy(overflow.id) == 3
+
+
+def test_overflow_names_per_type_and_after_restart():
+    async def run():
+        api, guild, base = make_guild(filled=2)
+        # Left over from before a restart, and already full.
+        existing = guild.add_channel(fake_discord.FakeCategory(guild, "Tickets • partner 2"))
+        fill(guild, existing, 2)
+        guild.add_channel(fake_discord.FakeCategory(guild, "Tickets • partner lama"))
+        rest = RestScheduler()
+        pool = CategoryPool(rest, limit=2)
+        partner = await pool.acquire(guild, base, "partner", {})
+        lahelu = await pool.acquire(guild, base, "lahelu", {})
+        await rest.close()
+        return api, existing, partner, lahelu
+
+    api, existing, partner, lahelu = asyncio.run(run())
+    assert partner.name == "Tickets • partner 3"
+    assert lahelu.name == "Tickets • lahelu 2"
+    assert api.calls["create_channel"] == 2
+
+
+def test_least_occupied_category_is_picked():
+    async def run():
+        _, guild, base = make_guild(filled=2)
+        existing = guild.add_channel(fake_discord.FakeCategory(guild, "Tickets • partner 2"))
+        pool = CategoryPool(RestScheduler(), limit=3)
+        picked = [await pool.acquire(guild, base, "partner", {}) for _ in range(3)]
+        return base, existing, picked
+
+    base, existing, picked = asyncio.run(run())
+    assert picked == [existing, existing, base]
+
+
+def test_idle_overflow_is_deleted_after_the_idle_period():
+    async def run():
+        api, guild, base = make_guild(filled=1)
+        rest = RestScheduler()
+        pool = CategoryPool(rest, limit=1, idle_seconds=0.05)
+        overflow = await pool.acquire(guild, base, "partner", {})
+        channel = fake_discord.FakeTextChannel(guild, "ticket-baru", overflow)
+        guild.add_channel(channel)
+        pool.release(overflow, channel)
+
+        guild.remove_channel(channel)
+        pool.channel_deleted(channel)
+        await asyncio.sleep(0.02)
+        # Reused within the idle period: the cleanup leaves it alone.
+        assert await pool.acquire(guild, base, "partner", {}) is overflow
+        await asyncio.sleep(0.06)
+        kept = guild.get_channel(overflow.id) is overflow
+
+        pool.release(overflow)
+        await asyncio.sleep(0.15)
+        await rest.close()
+        return api, guild, base, overflow, pool, kept
+
+    api, guild, base, overflow, pool, kept = asyncio.run(run())
+    assert kept
+    assert guild.get_channel(overflow.id) is None
+    assert api.calls["delete_channel"] == 1
+    assert pool._pools[(guild.id, base.id, "partner")] == [base.id]
+    # The base category is never cleaned up.
+    assert guild.get_channel(base.id) is base
+
+
+def test_close_cancels_pending_cleanup():
+    async def run():
+        api, guild, base = make_guild(filled=1)
+        pool = CategoryPool(RestScheduler(), limit=1, idle_seconds=0.01)
+        overflow = await pool.acquire(guild, base, "partner", {})
+        pool.release(overflow)
+        pool.close()
+        await asyncio.sleep(0.03)
+        return api, guild, overflow
+
+    api, guild, overflow = asyncio.run(run())
+    assert guild.get_channel(overflow.id) is overflow
+    assert api.calls["delete_channel"] == 0
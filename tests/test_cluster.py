@@ -0,0 +1,105 @@
+import asyncio
+
+from utils.cluster import ClusterConfig, ShardLeases, shard_of, shard_ranges
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_shard_ranges_cover_every_shard_once():
+    ranges = shard_ranges(10, 3)
+    assert ranges == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    config = ClusterConfig(1, 3, 10)
+    guild_id = 5 << 22
+    assert shard_of(guild_id, 10) == 5
+    assert config.owns_guild(guild_id)
+    assert not config.owns_guild(guild_id + (1 << 22) * 3)
+
+
+def test_owner_is_unique_per_config():
+    first = ClusterConfig(0, 2, 4)
+    second = ClusterConfig(0, 2, 4)
+    assert first.owner == first.owner
+    assert first.owner != second.owner
+    assert ":cluster-0:" in first.owner
+
+
+def test_duplicate_worker_waits_until_lease_expires(tmp_path):
+    path = str(tmp_path / "leases.db")
+    clock = FakeClock()
+    first = ShardLeases(path, ClusterConfig(0, 2, 4).owner, [0, 1], ttl=90, clock=clock)
+    second = ShardLeases(path, ClusterConfig(0, 2, 4).owner, [1, 2], ttl=90, clock=clock)
+    assert first._try_acquire() == []
+    held = second._try_acquire()
+    assert held == [(1, first.owner)]
+
+    # Renewing keeps the lease; only a crashed worker's lease runs out.
+    clock.now = 60
+    assert first._try_acquire() == []
+    clock.now = 140
+    assert second._try_acquire() != []
+    clock.now = 151
+    assert second._try_acquire() == []
+    assert first._try_acquire() == [(1, second.owner)]
+
+
+def test_release_lets_the_next_worker_in(tmp_path):
+    async def run():
+        path = str(tmp_path / "leases.db")
+        first = ShardLeases(path, "a", [0], renew_every=3600)
+        second = ShardLeases(path, "b", [0])
+        await first.acquire()
+        assert second._try_acquire() == [(0, "a")]
+        await first.release()
+        assert second._try_acquire() == []
+
+    asyncio.run(run())
+
+
+def test_renew_loop_reports_takeover(tmp_path):
+    async def run():
+        path = str(tmp_path / "leases.db")
+        clock = FakeClock()
+        lost = asyncio.Event()
+        first = ShardLeases(path, "a", [0, 1], ttl=90, renew_every=0.01, on_lost=lost.set, clock=clock)
+        await first.acquire()
+        # The renew loop stalls (e.g. a frozen process) and the lease expires.
+        first._task.cancel()
+        clock.now = 100
+        takeover = ShardLeases(path, "b", [1], ttl=90, clock=clock)
+        assert takeover._try_acquire() == []
+        first._task = asyncio.create_task(first._renew_loop())
+        await asyncio.wait_for(lost.wait(), 1)
+        assert first.lost
+        await first.release()
+        # A lost lease is not deleted on release: it belongs to "b" now.
+        assert ShardLeases(path, "c", [1], clock=clock)._try_acquire() == [(1, "b")]
+
+    asyncio.run(run())
+
+
+def test_renew_loop_gives_up_before_expiry(tmp_path):
+    async def run():
+        path = str(tmp_path / "leases.db")
+        clock = FakeClock()
+        lost = []
+        leases = ShardLeases(path, "a", [0], ttl=90, renew_every=0.01, on_lost=lambda: lost.append(clock()), clock=clock)
+        await leases.acquire()
+
+        def broken():
+            raise OSError("database is locked")
+        leases._try_acquire = broken
+        # Failures while the lease is still good are retried.
+        await asyncio.sleep(0.05)
+        assert lost == []
+        clock.now = 89.995
+        await asyncio.sleep(0.05)
+        await leases.release()
+        return lost
+
+    assert asyncio.run(run()) == [89.995]
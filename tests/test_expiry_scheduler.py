@@ -0,0 +1,98 @@
+import asyncio
+
+from utils.expiry_scheduler import DeadlineScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+async def drain(scheduler):
+    keys = []
+    async for key in scheduler.due():
+        keys.append(key)
+        if not scheduler:
+            break
+    return keys
+
+
+def test_due_yields_in_deadline_order():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(60, clock=clock)
+    scheduler.touch("c", 930)
+    scheduler.touch("a", 900)
+    scheduler.touch("b", 910)
+    assert scheduler.deadline("a") == 960
+    assert asyncio.run(drain(scheduler)) == ["a", "b", "c"]
+    assert len(scheduler) == 0
+
+
+def test_touch_moves_deadline_and_discard_skips():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(60, clock=clock)
+    scheduler.touch("a", 900)
+    scheduler.touch("b", 910)
+    scheduler.touch("c", 920)
+    # Activity in "a" pushes it behind the others; "b" is closed by hand.
+    scheduler.touch("a", 930)
+    scheduler.discard("b")
+    assert "b" not in scheduler
+    assert asyncio.run(drain(scheduler)) == ["c", "a"]
+
+
+def test_due_sleeps_until_the_earliest_deadline():
+    async def run():
+        clock = FakeClock()
+        scheduler = DeadlineScheduler(60, clock=clock)
+        scheduler.touch("later")
+        results = []
+
+        async def consume():
+            async for key in scheduler.due():
+                results.append(key)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        assert results == []
+        # An earlier deadline wakes the sleeper instead of waiting for "later".
+        scheduler.touch("stale", clock.now - 120)
+        await asyncio.sleep(0.01)
+        assert results == ["stale"]
+        assert "later" in scheduler
+        task.cancel()
+
+    asyncio.run(run())
+
+
+def test_heap_is_compacted():
+    scheduler = DeadlineScheduler(60, clock=FakeClock())
+    for i in range(1000):
+        scheduler.touch("a", i)
+    assert len(scheduler) == 1
+    assert len(scheduler._heap) <= 2 * len(scheduler) + 65
+
+
+def test_cancel_is_not_lost_when_the_wake_fires():
+    async def run():
+        clock = FakeClock()
+        scheduler = DeadlineScheduler(60, clock=clock)
+        scheduler.touch("later")
+
+        async def consume():
+            async for _ in scheduler.due():
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        # Shutdown right after a touch, as when reconcile runs just before
+        # cog_unload: the wake and the cancel land on the same tick.
+        scheduler.touch("sooner", clock.now - 30)
+        task.cancel()
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 1)
+        return task
+
+    assert asyncio.run(run()).cancelled()
@@ -0,0 +1,19 @@
+import asyncio
+
+import load_test
+
+
+def test_lifecycle_smoke(ticket_module):
+    args = load_test.parse_args([
+        "--users", "5", "--concurrency", "5", "--messages", "2", "--think", "0",
+        "--latency-ms", "1", "--jitter-ms", "0", "--gateway-ms", "1", "--no-admission"
+    ])
+    assert asyncio.run(load_test.main(args)) == 0
+
+
+def test_open_with_rate_limits_smoke(ticket_module):
+    args = load_test.parse_args([
+        "--scenario", "open", "--users", "5", "--concurrency", "5", "--latency-ms", "1", "--jitter-ms", "0",
+        "--gateway-ms", "1", "--rate-limit", "0.2", "--retry-after", "0.01", "--storage", "sqlite", "--no-admission"
+    ])
+    assert asyncio.run(load_test.main(args)) == 0
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import time
+
+from utils.loop_monitor import LAG_BUCKETS, LoopMonitor, handler_scope
+from utils.metrics import Histogram, Metrics
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+def test_blocked_loop_is_reported_with_its_handler(tmp_path):
+    report_dir = str(tmp_path / "reports")
+
+    async def run():
+        metrics = Metrics(enabled=True)
+        monitor = LoopMonitor(threshold=0.1, interval=0.02, sample_every=0.01, report_dir=report_dir,
+                              report_interval=3600, name="test", metrics=metrics)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        with handler_scope("tutup_ticket"):
+            blocking_handler()
+        await asyncio.sleep(0.1)
+        stalls, max_lag, p99 = monitor.total_stalls, monitor.max_lag, monitor.lag.quantile(0.99)
+        await monitor.close()
+        return metrics, stalls, max_lag, p99
+
+    metrics, stalls, max_lag, p99 = asyncio.run(run())
+    assert stalls == 1
+    assert 0.25 <= max_lag < 1.0
+    assert p99 <= max_lag
+
+    lag = metrics.histograms["ticket_loop_lag_seconds"][()]
+    assert lag.count >= 5
+    assert lag.max == max_lag
+    # Only the stall lands above the threshold.
+    assert sum(count for bound, count in zip(lag.bounds + (float("inf"),), lag.counts) if bound > 0.1) == 1
+    assert metrics.counters["ticket_loop_stalls_total"] == {(("handler", "tutup_ticket"),): 1}
+
+    reports = os.listdir(report_dir)
+    assert len(reports) == 1 and reports[0].startswith("test-")
+    with open(os.path.join(report_dir, reports[0]), encoding="utf-8") as file:
+        report = file.read()
+    assert "1 stall >= 100ms" in report
+    assert "  tutup_ticket: 1x" in report
+    # The sampled stack points at the blocking call, also in the folded stacks.
+    assert "blocking_handler (test_loop_monitor.py:" in report
+    folded = report.split("Stack (folded):\n", 1)[1].splitlines()
+    assert folded[0].startswith("tutup_ticket;") and "blocking_handler" in folded[0]
+
+
+def test_quiet_loop_writes_no_report(tmp_path):
+    report_dir = str(tmp_path / "reports")
+
+    async def run():
+        monitor = LoopMonitor(threshold=0.1, interval=0.01, report_dir=report_dir, name="test")
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await monitor.close()
+        return monitor
+
+    monitor = asyncio.run(run())
+    assert monitor.total_stalls == 0
+    assert not os.path.exists(report_dir)
+
+
+def test_histogram_quantile_never_exceeds_the_max():
+    histogram = Histogram(LAG_BUCKETS)
+    # Two slow ticks put p99 in the 0.25-0.5 bucket; interpolating there
+    # used to report about 435ms for a maximum of 251ms.
+    for _ in range(50):
+        histogram.observe(0.002)
+    histogram.observe(0.251)
+    histogram.observe(0.251)
+    assert histogram.quantile(0.5) <= 0.005
+    assert histogram.quantile(0.99) == 0.251
+    # Above the last bound the maximum is the only estimate there is.
+    histogram.observe(42.0)
+    assert histogram.quantile(1.0) == 42.0
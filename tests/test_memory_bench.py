@@ -0,0 +1,16 @@
+import argparse
+
+import pytest
+
+pytest.importorskip("discord")
+
+import memory_bench
+
+
+def test_lean_profile_caches_no_members_or_messages():
+    args = argparse.Namespace(guilds=2, members=50, channels=3, messages=20, online=0.5)
+    full = memory_bench.measure("full", args)
+    lean = memory_bench.measure("lean", args)
+    assert (full["guilds"], full["members"], full["messages"]) == (2, 100, 40)
+    assert (lean["guilds"], lean["members"], lean["messages"]) == (2, 0, 0)
+    assert lean["rss_after"] is not None
@@ -0,0 +1,92 @@
+import asyncio
+
+from utils.metrics import DEFAULT_BUCKETS, Metrics
+
+
+def sample_metrics(**kwargs):
+    metrics = Metrics(enabled=True, **kwargs)
+    metrics.inc("ticket_rest_requests_total", route="send_message")
+    metrics.inc("ticket_rest_requests_total", 2, route="send_message")
+    metrics.inc("ticket_admission_total", result="queued")
+    metrics.observe("ticket_handler_seconds", 0.02, handler="open")
+    metrics.observe("ticket_handler_seconds", 0.3, handler="open")
+    metrics.observe("ticket_handler_seconds", 60, handler="open")
+    metrics.gauge("ticket_active", lambda: 4, "Ticket aktif")
+    metrics.gauge("ticket_broken", lambda: 1 / 0)
+    metrics.gauge("ticket_unknown", lambda: None)
+    return metrics
+
+
+def test_render_exposition_format():
+    lines = sample_metrics().render().splitlines()
+    assert lines[:6] == [
+        "# HELP ticket_admission_total Keputusan admission pembuatan ticket per hasil",
+        "# TYPE ticket_admission_total counter",
+        'ticket_admission_total{result="queued"} 1',
+        "# HELP ticket_rest_requests_total Panggilan REST per route",
+        "# TYPE ticket_rest_requests_total counter",
+        'ticket_rest_requests_total{route="send_message"} 3',
+    ]
+    assert lines[6:8] == [
+        "# HELP ticket_handler_seconds Durasi handler interaksi (tombol dan app command)",
+        "# TYPE ticket_handler_seconds histogram",
+    ]
+    # Cumulative buckets with le appended after the series labels.
+    buckets = lines[8:8 + len(DEFAULT_BUCKETS) + 1]
+    assert buckets[0] == 'ticket_handler_seconds_bucket{handler="open",le="0.005"} 0'
+    assert buckets[2] == 'ticket_handler_seconds_bucket{handler="open",le="0.025"} 1'
+    assert buckets[6] == 'ticket_handler_seconds_bucket{handler="open",le="0.5"} 2'
+    assert buckets[-2] == 'ticket_handler_seconds_bucket{handler="open",le="30.0"} 2'
+    assert buckets[-1] == 'ticket_handler_seconds_bucket{handler="open",le="+Inf"} 3'
+    rest = lines[8 + len(buckets):]
+    assert rest == [
+        'ticket_handler_seconds_sum{handler="open"} 60.32',
+        'ticket_handler_seconds_count{handler="open"} 3',
+        # Failing and empty gauges are left out.
+        "# HELP ticket_active Ticket aktif",
+        "# TYPE ticket_active gauge",
+        "ticket_active 4",
+    ]
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics(enabled=True)
+    metrics.inc("ticket_rest_requests_total", route='a"b\\c\nd')
+    assert 'ticket_rest_requests_total{route="a\\"b\\\\c\\nd"} 1' in metrics.render()
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    metrics.inc("ticket_rest_requests_total", route="send_message")
+    metrics.observe("ticket_handler_seconds", 0.1)
+    assert metrics.render() == "\n"
+
+
+def test_http_endpoint_serves_metrics():
+    async def get(port, path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("ascii"))
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    async def run():
+        metrics = sample_metrics(port=0)
+        server = await metrics.start_server()
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return metrics, await get(port, "/metrics?x=1"), await get(port, "/favicon.ico")
+        finally:
+            await metrics.close()
+
+    metrics, ok, missing = asyncio.run(run())
+    head, body = ok.split(b"\r\n\r\n", 1)
+    head = head.decode("ascii").split("\r\n")
+    assert head[0] == "HTTP/1.1 200 OK"
+    assert "Content-Type: text/plain; version=0.0.4; charset=utf-8" in head
+    assert f"Content-Length: {len(body)}" in head
+    assert body.decode("utf-8") == metrics.render()
+    assert missing.startswith(b"HTTP/1.1 404 Not Found\r\n")
+    assert missing.endswith(b"\r\n\r\nnot found\n")
+    assert metrics._server is None
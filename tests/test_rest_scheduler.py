@@ -0,0 +1,230 @@
+import asyncio
+
+import pytest
+
+from utils.rest_scheduler import BACKGROUND, INTERACTIVE, NORMAL, RestScheduler, route
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__("429")
+        self.retry_after = retry_after
+
+
+def test_one_call_in_flight_per_bucket():
+    async def run():
+        scheduler = RestScheduler(max_concurrency=4)
+        inflight = {}
+        peak = {}
+
+        def call(key):
+            async def send():
+                inflight[key] = inflight.get(key, 0) + 1
+                peak[key] = max(peak.get(key, 0), inflight[key])
+                await asyncio.sleep(0.01)
+                inflight[key] -= 1
+                return key
+            return send
+
+        keys = [route("channel", 1)] * 3 + [route("channel", 2)] * 3
+        results = await asyncio.gather(*(scheduler.submit(key, call(key)) for key in keys))
+        await scheduler.close()
+        return results, peak
+
+    results, peak = asyncio.run(run())
+    assert results == [route("channel", 1)] * 3 + [route("channel", 2)] * 3
+    assert peak == {route("channel", 1): 1, route("channel", 2): 1}
+
+
+def test_interactive_goes_before_background():
+    async def run():
+        scheduler = RestScheduler(max_concurrency=2)
+        order = []
+        gate = asyncio.Event()
+
+        async def hold():
+            await gate.wait()
+
+        def call(name):
+            async def send():
+                order.append(name)
+            return send
+
+        # Fill both slots, then queue work while they are busy.
+        blockers = [asyncio.create_task(scheduler.submit(route("hold", i), hold, INTERACTIVE)) for i in range(2)]
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(scheduler.submit(route("bg", 1), call("background"), BACKGROUND)),
+            asyncio.create_task(scheduler.submit(route("normal", 1), call("normal"), NORMAL)),
+            asyncio.create_task(scheduler.submit(route("ui", 1), call("interactive"), INTERACTIVE)),
+        ]
+        await asyncio.sleep(0.01)
+        assert order == []
+        gate.set()
+        await asyncio.gather(*blockers, *queued)
+        await scheduler.close()
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "normal", "background"]
+
+
+def test_background_leaves_a_slot_free():
+    async def run():
+        scheduler = RestScheduler(max_concurrency=2)
+        gate = asyncio.Event()
+        running = []
+
+        def call(name):
+            async def send():
+                running.append(name)
+                await gate.wait()
+            return send
+
+        tasks = [asyncio.create_task(scheduler.submit(route("bg", i), call(f"bg{i}"), BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert running == ["bg0"]
+        tasks.append(asyncio.create_task(scheduler.submit(route("ui", 1), call("ui"), INTERACTIVE)))
+        await asyncio.sleep(0.01)
+        assert running == ["bg0", "ui"]
+        gate.set()
+        await asyncio.gather(*tasks)
+        await scheduler.close()
+
+    asyncio.run(run())
+
+
+def test_rate_limit_blocks_only_that_bucket():
+    async def run():
+        clock = FakeClock()
+        scheduler = RestScheduler(max_concurrency=4, clock=clock)
+        attempts = []
+
+        async def limited_once():
+            attempts.append(clock())
+            if len(attempts) == 1:
+                raise RateLimited(30)
+            return "ok"
+
+        async def other():
+            return "other"
+
+        limited = asyncio.create_task(scheduler.submit(route("channel", 1), limited_once))
+        await asyncio.sleep(0.01)
+        assert await scheduler.submit(route("channel", 2), other) == "other"
+        assert attempts == [0.0]
+        assert not limited.done()
+        assert scheduler.pending() == 1
+
+        clock.now = 30.0
+        scheduler._wake.set()
+        assert await asyncio.wait_for(limited, 1) == "ok"
+        await scheduler.close()
+        return attempts
+
+    assert asyncio.run(run()) == [0.0, 30.0]
+
+
+def test_rate_limit_gives_up_after_max_retries():
+    async def run():
+        scheduler = RestScheduler(max_retries=2)
+        calls = []
+
+        async def always_limited():
+            calls.append(1)
+            raise RateLimited(0)
+
+        with pytest.raises(RateLimited):
+            await scheduler.submit(route("channel", 1), always_limited)
+        await scheduler.close()
+        return len(calls)
+
+    assert asyncio.run(run()) == 3
+
+
+def test_coalesced_jobs_share_one_call():
+    async def run():
+        scheduler = RestScheduler(max_concurrency=1)
+        gate = asyncio.Event()
+        sent = []
+
+        async def hold():
+            await gate.wait()
+
+        def edit(value):
+            async def send():
+                sent.append(value)
+                return value
+            return send
+
+        blocker = asyncio.create_task(scheduler.submit(route("hold", 1), hold))
+        await asyncio.sleep(0)
+        edits = [
+            asyncio.create_task(scheduler.submit(route("channel", 1), edit(1), BACKGROUND, coalesce_key="topic")),
+        ]
+        await asyncio.sleep(0)
+        edits.append(asyncio.create_task(scheduler.submit(route("channel", 1), edit(2), INTERACTIVE, coalesce_key="topic")))
+        await asyncio.sleep(0)
+        # Raising the priority pushed a second heap entry for the same job.
+        assert len(scheduler._queue) == 2
+        assert scheduler.pending() == 1
+        gate.set()
+        results = await asyncio.gather(blocker, *edits)
+        await scheduler.close()
+        return results[1:], sent
+
+    results, sent = asyncio.run(run())
+    assert results == [2, 2]
+    assert sent == [2]
+
+
+def test_close_cancels_queued_and_waits_for_running():
+    async def run():
+        scheduler = RestScheduler(max_concurrency=1)
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def never():
+            return "never"
+
+        running = asyncio.create_task(scheduler.submit(route("a", 1), slow))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(scheduler.submit(route("b", 1), never))
+        await asyncio.sleep(0.01)
+        await scheduler.close()
+        assert await running == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    asyncio.run(run())
+
+
+def test_close_is_not_delayed_by_a_wake_on_the_same_tick():
+    async def run():
+        clock = FakeClock()
+        scheduler = RestScheduler(clock=clock)
+
+        async def limited():
+            raise RateLimited(30)
+
+        blocked = asyncio.create_task(scheduler.submit(route("channel", 1), limited))
+        await asyncio.sleep(0.01)
+        # A submit's wake and close()'s cancel reach the dispatcher together;
+        # the cancel must win instead of waiting out the 30s block.
+        scheduler._wake.set()
+        closing = asyncio.create_task(scheduler.close())
+        done, _ = await asyncio.wait((closing,), timeout=1)
+        assert closing in done
+        with pytest.raises(asyncio.CancelledError):
+            await blocked
+
+    asyncio.run(run())
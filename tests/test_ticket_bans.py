@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("discord")
+
+import fake_discord
+
+USER = 123456789012345678
+OTHER = 234567890123456789
+
+
+def test_parse_duration(ticket_module):
+    parse_duration = ticket_module.parse_duration
+    assert parse_duration("30m") == 1800
+    assert parse_duration(" 12H ") == 43200
+    assert parse_duration("7d") == 604800
+    assert parse_duration("2w") == 1209600
+    assert parse_duration("45s") == 45
+    assert parse_duration("1.5h") is None
+    assert parse_duration("7") is None
+    assert parse_duration("d") is None
+    assert parse_duration("7y") is None
+
+
+def test_parse_ban_list(ticket_module):
+    parse_ban_list = ticket_module.parse_ban_list
+    assert parse_ban_list(f"{USER}\n{OTHER} 1700000000\n") == [(USER, None), (OTHER, 1700000000.0)]
+    # A second id on the line is not an expiry.
+    assert parse_ban_list("123,456") == [(123, None), (456, None)]
+    assert parse_ban_list(f"{USER},{OTHER}") == [(USER, None), (OTHER, None)]
+    assert parse_ban_list(f"{USER}, 1700000000.5; {OTHER}") == [(USER, 1700000000.5), (OTHER, None)]
+    assert parse_ban_list(f"<@{USER}>  # spam\r\n\nbukan id\n1.5\n") == [(USER, None)]
+
+
+class Attachment:
+    def __init__(self, text):
+        self.data = text.encode()
+        self.size = len(self.data)
+
+    async def read(self):
+        return self.data
+
+
+def capture_files(interaction):
+    files = []
+    send_message = interaction.response.send_message
+
+    async def capture(content=None, *, file=None, **kwargs):
+        if file is not None:
+            files.append((file.filename, file.fp.read().decode()))
+        return await send_message(content, file=file, **kwargs)
+
+    interaction.response.send_message = capture
+    return files
+
+
+def test_import_skips_expired_entries_and_export_round_trips(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, _, handler, _ = harness.new_user(0)
+            now = time.time()
+            text = f"{USER}\n{OTHER} {int(now) + 3600}\n345678901234567890 {int(now) - 60}\n123,456\n"
+
+            interaction = fake_discord.FakeInteraction(harness.bot, guild, handler, None)
+            await cog.import_ticket_bans.callback(cog, interaction, Attachment(text), None)
+            assert interaction.replies[-1] == "✅ 4 user diblokir dari 4 ID di file (0 sudah diblokir)."
+
+            interaction = fake_discord.FakeInteraction(harness.bot, guild, handler, None)
+            await cog.import_ticket_bans.callback(cog, interaction, Attachment(text), None)
+            assert interaction.replies[-1] == "✅ 0 user diblokir dari 4 ID di file (4 sudah diblokir)."
+
+            interaction = fake_discord.FakeInteraction(harness.bot, guild, handler, None)
+            files = capture_files(interaction)
+            await cog.export_ticket_bans.callback(cog, interaction)
+            assert interaction.replies == ["📄 4 user diblokir."]
+            name, exported = files[0]
+            assert name == f"ticket_bans-{guild.id}.txt"
+
+            # The export imports cleanly into another guild.
+            other_guild = harness.bot.add_guild("guild-lain")
+            interaction = fake_discord.FakeInteraction(harness.bot, other_guild, handler, None)
+            await cog.import_ticket_bans.callback(cog, interaction, Attachment(exported), None)
+            return now, exported, cog.store.export_bans(guild.id), cog.store.export_bans(other_guild.id)
+
+    now, exported, bans, copied = asyncio.run(run())
+    assert exported.splitlines() == ["123", "456", str(USER), f"{OTHER} {int(now) + 3600}"]
+    assert bans == [(123, None), (456, None), (USER, None), (OTHER, float(int(now) + 3600))]
+    assert copied == bans
+
+
+def test_import_duration_overrides_file_expiry(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, _, handler, _ = harness.new_user(0)
+            interaction = fake_discord.FakeInteraction(harness.bot, guild, handler, None)
+            await cog.import_ticket_bans.callback(cog, interaction, Attachment(f"{USER} 1000000000\n"), "7d")
+            invalid = fake_discord.FakeInteraction(harness.bot, guild, handler, None)
+            await cog.import_ticket_bans.callback(cog, invalid, Attachment(f"{OTHER}\n"), "seminggu")
+            return cog.store.ban_expiry(guild.id, USER), cog.store.is_banned(guild.id, OTHER), invalid.replies
+
+    expires_at, other_banned, replies = asyncio.run(run())
+    assert abs(expires_at - (time.time() + 604800)) < 60
+    assert not other_banned
+    assert replies == ["❌ Format durasi tidak valid. Contoh: `30m`, `12h`, `7d`."]
+
+
+def test_temporary_ban_expires(ticket_harness, ticket_module, monkeypatch):
+    clock = [1_700_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            interaction = fake_discord.FakeInteraction(harness.bot, guild, handler, None)
+            await cog.ban_ticket_user.callback(cog, interaction, user, "1h")
+            assert interaction.replies == [f"✅ {user.mention} telah diblokir dari sistem tiket sampai <t:{int(clock[0]) + 3600}:f>."]
+            assert await harness.open(guild, panel_channel, user, "partner") is None
+
+            clock[0] += 3599
+            assert cog.store.is_banned(guild.id, user.id)
+            clock[0] += 1
+            assert not cog.store.is_banned(guild.id, user.id)
+            # The expired entry was dropped, not just ignored.
+            assert cog.store.export_bans(guild.id) == []
+            assert user.id not in cog.store.bans.get(str(guild.id), {})
+            assert await harness.open(guild, panel_channel, user, "partner") is not None
+
+    asyncio.run(run())
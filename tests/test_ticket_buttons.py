@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import fake_discord
+from utils.ticket_reconcile import looks_closed
+
+
+def press(harness, button, guild, user, channel):
+    interaction = fake_discord.FakeInteraction(harness.bot, guild, user, channel)
+    return interaction, button.callback(interaction)
+
+
+def test_close_reopen_close(ticket_harness, ticket_module):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            channel = await harness.open(guild, panel_channel, user, "partner")
+            assert channel is not None
+
+            await harness.close(guild, channel, handler)
+            await harness.bot.drain()
+            assert channel.id in cog.store.closed
+            assert looks_closed(channel)
+
+            interaction, pressed = press(harness, ticket_module.ReopenTicketButton(channel, user.id), guild, user, channel)
+            await pressed
+            assert interaction.replies[-1] == "🔓 Ticket dibuka kembali!"
+            assert channel.id not in cog.store.closed
+            assert cog.store.find_active(guild.id, user.id, "partner") == channel.id
+            assert cog.store.active[channel.id]["opened_at"]
+            assert channel.id in cog.expiry
+            # The closer's deny is gone and the owner can write again, so a
+            # restart does not adopt the live ticket as closed.
+            assert not looks_closed(channel)
+            assert channel.overwrites[user].send_messages
+
+            # A second open of the same type is refused while reopened.
+            assert await harness.open(guild, panel_channel, user, "partner") == channel
+
+            await harness.close(guild, channel, handler)
+            assert channel.id in cog.store.closed
+            assert channel.id not in cog.store.active
+            assert channel.id not in cog.expiry
+            return harness.outcomes
+
+    outcomes = asyncio.run(run())
+    assert outcomes["closed"] == 2
+    assert "close_failed" not in outcomes
+
+
+def test_reopen_after_expire_restores_handlers(ticket_harness, ticket_module):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            channel = await harness.open(guild, panel_channel, user, "lahelu")
+            await cog.expire_ticket(channel.id)
+            handler_role = handler.roles[-1]
+            assert channel.overwrites[handler_role].read_messages is False
+
+            _, pressed = press(harness, ticket_module.ReopenTicketButton(channel, user.id), guild, user, channel)
+            await pressed
+            assert channel.overwrites[handler_role].read_messages
+            assert channel.overwrites[user].read_messages
+            assert cog.store.find_active(guild.id, user.id, "lahelu") == channel.id
+
+    asyncio.run(run())
+
+
+def test_delete_splits_an_oversized_transcript(ticket_harness, ticket_module):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            channel = await harness.open(guild, panel_channel, user, "custom")
+            for index in range(40):
+                channel.post(user, f"pesan nomor {index} " + "x" * 40)
+            await harness.close(guild, channel, handler)
+            log_channel = guild.get_channel(harness.config[guild.id]["log_channel"])
+            guild.filesize_limit = 1024
+
+            sent = []
+            send = log_channel.send
+
+            async def capture(content=None, *, embed=None, file=None, **kwargs):
+                sent.append((embed, file and (file.filename, file.fp.read())))
+                return await send(content, embed=embed, file=file, **kwargs)
+
+            log_channel.send = capture
+            await harness.delete(guild, channel, user)
+            assert guild.get_channel(channel.id) is None
+            assert channel.id not in cog.store.closed
+            return sent
+
+    sent = asyncio.run(run())
+    assert len(sent) > 1
+    assert sent[0][0] is not None and all(embed is None for embed, _ in sent[1:])
+    assert "dibagi menjadi" in sent[0][0].fields[-1].value
+    assert [name for _, (name, _) in sent] == [f"part{i}-transcript-ticket-user-0.txt" for i in range(1, len(sent) + 1)]
+    assert all(len(data) <= 1024 for _, (_, data) in sent)
+    text = b"".join(data for _, (_, data) in sent).decode()
+    assert "pesan nomor 0 " in text and "pesan nomor 39 " in text
@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+
+
+def command_context(guild):
+    sent = []
+
+    async def send(content=None, **kwargs):
+        sent.append(content)
+
+    return SimpleNamespace(guild=guild, send=send, sent=sent)
+
+
+def test_added_role_applies_to_the_next_open(ticket_harness, ticket_module, monkeypatch):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            first = await harness.open(guild, panel_channel, user, "partner")
+            # The first open has cached this guild's config.
+            assert guild.id in cog.config._guilds
+
+            config = harness.config[guild.id]
+            monkeypatch.setattr(ticket_module, "add_ticket_role", lambda guild_id, tipe, role_id: config["roles"].append(role_id))
+            moderator = guild.add_role("moderator")
+            ctx = command_context(guild)
+            await cog.addticketrole.callback(cog, ctx, "partner", moderator)
+            assert ctx.sent == [f"Role {moderator.mention} ditambahkan sebagai handler ticket tipe `partner`."]
+
+            _, _, _, other = harness.new_user(1)
+            second = await harness.open(guild, panel_channel, other, "partner")
+            return first, second, moderator
+
+    first, second, moderator = asyncio.run(run())
+    assert moderator not in first.overwrites
+    assert second.overwrites[moderator].read_messages
+    assert moderator.mention in second.messages[0].content
+
+
+def test_deleting_a_configured_role_drops_the_cached_config(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            await harness.open(guild, panel_channel, user, "partner")
+            unrelated = guild.add_role("unrelated")
+            cog.config.role_deleted(unrelated)
+            assert guild.id in cog.config._guilds
+
+            handler_role = handler.roles[-1]
+            cog.config.role_deleted(handler_role)
+            assert guild.id not in cog.config._guilds
+
+            log_channel = guild.get_channel(harness.config[guild.id]["log_channel"])
+            cog.config.get(guild)
+            cog.config.channel_deleted(log_channel)
+            assert guild.id not in cog.config._guilds
+
+    asyncio.run(run())
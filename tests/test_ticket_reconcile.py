@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import fake_discord
+from utils.ticket_reconcile import _channel_gone, reconcile
+
+
+def forget(cog, channel_id):
+    # State lost with the data files; Discord still has the channel.
+    cog.store.pop_active(channel_id)
+    cog.store.pop_closed(channel_id)
+    cog.expiry.discard(channel_id)
+
+
+def test_adopts_active_and_closed_ticket_channels(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            _, _, _, other = harness.new_user(1)
+            active = await harness.open(guild, panel_channel, user, "partner")
+            closed = await harness.open(guild, panel_channel, other, "lahelu")
+            await harness.close(guild, closed, handler)
+            category = guild.get_channel(harness.config[guild.id]["category"])
+            # Not a ticket: wrong name, or no member overwrite to take the owner from.
+            guild.add_channel(fake_discord.FakeTextChannel(guild, "aturan", category, {user: active.overwrites[user]}))
+            guild.add_channel(fake_discord.FakeTextChannel(guild, "ticket-tanpa-owner", category))
+            forget(cog, active.id)
+            forget(cog, closed.id)
+
+            report = cog.reconcile_tickets()
+            again = cog.reconcile_tickets()
+            return cog, guild, user, other, active, closed, report, again
+
+    cog, guild, user, other, active, closed, report, again = asyncio.run(run())
+    assert sorted(report.adopted) == sorted([active.id, closed.id])
+    assert not again
+    data = cog.store.active[active.id]
+    assert (data["user_id"], data["guild_id"], data["ticket_type"]) == (user.id, guild.id, "partner")
+    assert data["last_activity"] and data["opened_at"]
+    assert active.id in cog.expiry
+    assert cog.store.closed[closed.id] == {"user_id": other.id, "guild_id": guild.id, "ticket_type": "lahelu", "closed_by": None}
+    assert closed.id not in cog.store.active
+    assert closed.id not in cog.expiry
+
+
+def test_rebuilds_incomplete_records_and_purges_deleted_channels(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            _, _, _, other = harness.new_user(1)
+            _, _, _, third = harness.new_user(2)
+            partial = await harness.open(guild, panel_channel, user, "partner")
+            deleted = await harness.open(guild, panel_channel, other, "partner")
+            deleted_closed = await harness.open(guild, panel_channel, third, "custom")
+            await harness.close(guild, deleted_closed, handler)
+            cog.store.add_active(partial.id, {"guild_id": guild.id})
+            # Deleted while the bot was offline: no gateway event arrived.
+            guild._channels.pop(deleted.id)
+            guild._channels.pop(deleted_closed.id)
+
+            report = cog.reconcile_tickets()
+            return cog, user, partial, deleted, deleted_closed, report
+
+    cog, user, partial, deleted, deleted_closed, report = asyncio.run(run())
+    assert report.rebuilt == [partial.id]
+    assert cog.store.active[partial.id]["user_id"] == user.id
+    assert cog.store.active[partial.id]["ticket_type"] == "partner"
+    assert report.purged_active == [deleted.id]
+    assert report.purged_closed == [deleted_closed.id]
+    assert deleted.id not in cog.store.active and deleted.id not in cog.expiry
+    assert deleted_closed.id not in cog.store.closed
+
+
+def test_unavailable_guild_keeps_its_tickets(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, _, user = harness.new_user(0)
+            channel = await harness.open(guild, panel_channel, user, "partner")
+            # An outage looks like every channel vanished from the cache.
+            guild._channels.pop(channel.id)
+            guild.unavailable = True
+            report = cog.reconcile_tickets()
+            return cog, channel, report
+
+    cog, channel, report = asyncio.run(run())
+    assert report.skipped == 1
+    assert not report.purged_active
+    assert channel.id in cog.store.active
+
+
+def test_channel_gone():
+    api = fake_discord.FakeApi(latency=0, jitter=0, gateway_latency=0)
+    bot = fake_discord.FakeBot(api)
+    guild = bot.add_guild("guild")
+    parent = guild.add_channel(fake_discord.FakeTextChannel(guild, "ticket-panel"))
+    down = bot.add_guild("down")
+    down.unavailable = True
+
+    # Plain channel records: gone only once the guild is loaded.
+    assert _channel_gone(bot, {"guild_id": guild.id}, True, True)
+    assert not _channel_gone(bot, {"guild_id": down.id}, False, True)
+    assert not _channel_gone(bot, {"guild_id": 12345}, True, True)
+    # Uncached threads are kept while their parent exists.
+    assert not _channel_gone(bot, {"guild_id": guild.id, "parent_id": parent.id}, True, True)
+    assert _channel_gone(bot, {"guild_id": guild.id, "parent_id": 12345}, True, True)
+    assert not _channel_gone(bot, {"guild_id": down.id, "parent_id": 12345}, False, True)
+    # Legacy records without a guild need every guild loaded, in one process.
+    assert _channel_gone(bot, {}, True, True)
+    assert not _channel_gone(bot, {}, False, True)
+    assert not _channel_gone(bot, {}, True, False)
+
+
+def test_cluster_worker_keeps_legacy_records(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            cog.store.add_active(999, {"user_id": 1, "ticket_type": "partner"})
+            worker = reconcile(harness.bot, cog.store, cog.config, {}, owns_all_guilds=False)
+            kept = 999 in cog.store.active
+            single = reconcile(harness.bot, cog.store, cog.config, {})
+            return worker, kept, single
+
+    worker, kept, single = asyncio.run(run())
+    assert kept and worker.skipped == 1
+    assert single.purged_active == [999]
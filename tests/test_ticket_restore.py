@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import discord
+
+import fake_discord
+
+
+async def closed_ticket(harness, index, ticket_type="partner"):
+    guild, panel_channel, handler, user = harness.new_user(index)
+    channel = await harness.open(guild, panel_channel, user, ticket_type)
+    await harness.close(guild, channel, handler)
+    return guild, user, channel
+
+
+def test_controls_are_reposted_once_then_found(ticket_harness, ticket_module):
+    async def run():
+        async with ticket_harness() as harness:
+            cog, api = harness.cog, harness.api
+            _, user, lost = await closed_ticket(harness, 0)
+            _, _, kept = await closed_ticket(harness, 1)
+            # Records from before control ids were stored; in one channel the
+            # controls scrolled away under a later message.
+            lost.post(user, "halo?")
+            for channel in (lost, kept):
+                cog.store.update_closed(channel.id, control_message_id=None)
+
+            api.reset()
+            await cog.restore_closed_ticket_views()
+            first = dict(api.calls)
+            reposted = lost.messages[-1]
+            assert ticket_module.has_ticket_controls(reposted)
+            assert cog.store.closed[lost.id]["control_message_id"] == reposted.id
+            assert cog.store.closed[kept.id]["control_message_id"] == kept.messages[-1].id
+
+            # Recorded ids are trusted without a fetch.
+            api.reset()
+            await cog.restore_closed_ticket_views()
+            recorded = dict(api.calls)
+
+            # Without the ids the re-posted controls are found, not sent again.
+            for channel in (lost, kept):
+                cog.store.update_closed(channel.id, control_message_id=None)
+            api.reset()
+            await cog.restore_closed_ticket_views()
+            second = dict(api.calls)
+            return first, recorded, second, lost, kept
+
+    first, recorded, second, lost, kept = asyncio.run(run())
+    assert first == {"get_messages": 2, "send_message": 1}
+    assert recorded == {}
+    assert second == {"get_messages": 2}
+    controls = ticket_module.has_ticket_controls
+    assert sum(map(controls, lost.messages)) == 2
+    assert sum(map(controls, kept.messages)) == 1
+
+
+def test_legacy_controls_are_replaced_and_deleted_channels_skipped(ticket_harness, ticket_module):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, _, legacy = await closed_ticket(harness, 0)
+            _, _, gone = await closed_ticket(harness, 1)
+            # Old reopen buttons had random custom_ids that no longer route.
+            view = discord.ui.View()
+            view.add_item(discord.ui.Button(label="Reopen", custom_id="a1b2c3"))
+            await legacy.send(embed=discord.Embed(title="❌ Ticket Ditutup"), view=view)
+            cog.store.update_closed(legacy.id, control_message_id=None)
+            cog.store.update_closed(gone.id, control_message_id=None)
+            guild._channels.pop(gone.id)
+
+            results = [await cog.restore_closed_ticket_view(legacy.id), await cog.restore_closed_ticket_view(gone.id)]
+            return results, legacy
+
+    results, legacy = asyncio.run(run())
+    assert results == ["restored", "missing"]
+    assert ticket_module.has_ticket_controls(legacy.messages[-1])
+    assert not ticket_module.has_ticket_controls(legacy.messages[-2])
+
+
+def test_verify_panels_drops_only_missing_panels(ticket_harness):
+    async def run():
+        async with ticket_harness("--guilds", "3") as harness:
+            cog = harness.cog
+            (kept, _, _), (deleted_message, panel_channel, _), (deleted_channel, other_channel, _) = harness.sites
+            panel_channel.messages.clear()
+            deleted_channel._channels.pop(other_channel.id)
+
+            harness.api.reset()
+            await cog.verify_panels()
+            panels = [cog.store.get_panel(guild.id) is not None for guild in (kept, deleted_message, deleted_channel)]
+            return panels, harness.api.calls["get_message"]
+
+    panels, fetched = asyncio.run(run())
+    assert panels == [True, False, False]
+    assert fetched == 2
+
+
+def test_verify_panels_keeps_panels_on_other_errors(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, _ = harness.sites[0]
+
+            async def unavailable(message_id):
+                raise discord.HTTPException(fake_discord.FakeResponseMeta(503), "Service Unavailable")
+
+            panel_channel.fetch_message = unavailable
+            await cog.verify_panels()
+            return cog.store.get_panel(guild.id) is not None
+
+    assert asyncio.run(run())
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import random
+
+from utils.ticket_stats import HOURLY_RETENTION, GuildStats, QuantileSketch, TicketStats
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+def exact(values, q):
+    # Same rank rule as the sketch: the value at floor(q * (n - 1)).
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def samples(seed, count=20000):
+    rng = random.Random(seed)
+    # Minutes to weeks, like real time-to-close.
+    return [rng.lognormvariate(8, 2) for _ in range(count)]
+
+
+def assert_within_accuracy(sketch, values):
+    worst = 0.0
+    for q in QUANTILES:
+        true = exact(values, q)
+        worst = max(worst, abs(sketch.quantile(q) - true) / true)
+    assert worst <= sketch.relative_accuracy
+    return worst
+
+
+def test_quantiles_stay_within_the_relative_accuracy():
+    for values in (samples(1), [random.Random(2).uniform(1, 10) for _ in range(5000)], [60.0] * 100):
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.add(value)
+        assert sketch.count == len(values)
+        assert_within_accuracy(sketch, values)
+    # Memory follows the value range, not the number of samples.
+    assert len(sketch.buckets) == 1
+
+
+def test_tighter_accuracy_is_honoured():
+    values = samples(3)
+    sketch = QuantileSketch(0.005)
+    for value in values:
+        sketch.add(value)
+    assert_within_accuracy(sketch, values)
+
+
+def test_zero_and_empty():
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None
+    for value in (0, -5, 0, 10):
+        sketch.add(value)
+    assert sketch.quantile(0.5) == 0.0
+    assert abs(sketch.quantile(1.0) - 10) <= 10 * sketch.relative_accuracy
+
+
+def test_sketch_carried_across_a_restart_equals_one_sketch():
+    values = samples(4)
+    continuous = QuantileSketch()
+    for value in values:
+        continuous.add(value)
+    before = QuantileSketch()
+    for value in values[:7000]:
+        before.add(value)
+    resumed = QuantileSketch.from_dict(json.loads(json.dumps(before.to_dict())))
+    for value in values[7000:]:
+        resumed.add(value)
+    assert resumed.to_dict() == continuous.to_dict()
+    assert [resumed.quantile(q) for q in QUANTILES] == [continuous.quantile(q) for q in QUANTILES]
+
+
+def test_per_type_sketches_merge_into_the_overall_one():
+    stats = GuildStats()
+    rng = random.Random(5)
+    values = {"partner": [], "lahelu": [], "custom": []}
+    for i in range(6000):
+        ticket_type = rng.choice(list(values))
+        duration = rng.lognormvariate(8 if ticket_type != "custom" else 10, 1.5)
+        values[ticket_type].append(duration)
+        stats.record_close(ticket_type, 42 if i % 3 else "auto-expire", duration, 1_700_000_000 + i)
+
+    merged = QuantileSketch()
+    for sketch in stats.time_to_close_by_type.values():
+        merged.count += sketch.count
+        merged.zero += sketch.zero
+        for key, count in sketch.buckets.items():
+            merged.buckets[key] = merged.buckets.get(key, 0) + count
+    assert merged.to_dict() == stats.time_to_close.to_dict()
+    assert_within_accuracy(stats.time_to_close, [v for group in values.values() for v in group])
+    for ticket_type, group in values.items():
+        assert_within_accuracy(stats.time_to_close_by_type[ticket_type], group)
+    assert stats.closed == 6000
+    assert stats.auto_closed == 2000
+    assert stats.by_handler == {"42": 4000}
+    assert sum(stats.by_type.values()) == 6000
+
+
+def test_hourly_volume_and_retention():
+    stats = GuildStats()
+    now = 1_700_000_000
+    stats.record_open(now - 7200)
+    stats.record_open(now)
+    stats.record_close("partner", 1, 60, now)
+    assert stats.volume(1, now) == (1, 1)
+    assert stats.volume(3, now) == (2, 1)
+    # Buckets are pruned once there are more hours than the retention.
+    for hour in range(1, HOURLY_RETENTION + 10):
+        stats.record_open(now + hour * 3600)
+    assert min(stats.hourly) > now // 3600
+    assert len(stats.hourly) <= HOURLY_RETENTION + 1
+    assert stats.volume(24, now + (HOURLY_RETENTION + 9) * 3600) == (24, 0)
+
+
+def test_stats_survive_a_reload(tmp_path):
+    path = str(tmp_path / "ticket_stats.json")
+
+    async def run():
+        stats = TicketStats(path, flush_delay=3600)
+        await stats.load()
+        stats.record_open(1, 1_700_000_000)
+        stats.record_close(1, "partner", 7, 600, 1_700_000_600)
+        await stats.close()
+
+        reloaded = TicketStats(path, flush_delay=3600)
+        await reloaded.load()
+        reloaded.record_close(1, "partner", 8, 1200, 1_700_001_000)
+        await reloaded.close()
+
+        final = TicketStats(path)
+        await final.load()
+        return final.get(1), final.get(2)
+
+    guild, missing = asyncio.run(run())
+    assert missing is None
+    assert (guild.opened, guild.closed) == (1, 2)
+    assert guild.by_handler == {"7": 1, "8": 1}
+    assert guild.time_to_close.count == 2
+    assert abs(guild.time_to_close_by_type["partner"].quantile(1.0) - 1200) <= 1200 * 0.02
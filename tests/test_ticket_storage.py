@@ -0,0 +1,206 @@
+import asyncio
+import gzip
+import json
+import os
+import types
+
+from utils import ticket_journal
+from utils.ticket_journal import TicketJournal, iter_journal
+from utils.ticket_storage import JsonStorage, SqliteStorage
+from utils.ticket_store import TicketStore
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def legacy_files(directory):
+    files = {name: str(directory / f"ticket_{name}.json") for name in ("bans", "panels", "active", "closed")}
+    write_json(files["bans"], {"1": [7, [8, 5000.0]]})
+    write_json(files["panels"], {"1": {"channel_id": 3, "message_id": 4}})
+    write_json(files["active"], {"100": {"guild_id": 1, "user_id": 7, "ticket_type": "partner"}})
+    write_json(files["closed"], {"200": {"guild_id": 1, "user_id": 8, "ticket_type": "lahelu"}})
+    return files
+
+
+def log_entry(channel_id):
+    return {"channel_id": channel_id, "guild_id": 1, "user_id": 7, "ticket_type": "partner", "closed_at": "2024-01-01T00:00:00"}
+
+
+def test_sqlite_migrates_legacy_json_once(tmp_path):
+    files = legacy_files(tmp_path)
+    log_file = str(tmp_path / "ticket_log.json")
+    write_json(log_file, [log_entry(1), log_entry(2)])
+    log_dir = tmp_path / "ticket_log"
+    log_dir.mkdir()
+    with open(log_dir / "segment-000000000000001.jsonl", "w", encoding="utf-8") as f:
+        f.write(json.dumps(log_entry(3)) + "\n{torn")
+
+    async def run():
+        backend = SqliteStorage(str(tmp_path / "tickets.db"), legacy_files=files, legacy_log_file=log_file, legacy_log_dir=str(log_dir))
+        store = TicketStore(backend, flush_delay=3600)
+        await store.load()
+        state = (store.bans, store.panels, dict(store.active), dict(store.closed), store.find_active(1, 7, "partner"))
+        store.add_closed(300, {"guild_id": 1, "user_id": 9})
+        await store.close()
+
+        # A second start must not import the JSON files again.
+        write_json(files["closed"], {})
+        backend = SqliteStorage(str(tmp_path / "tickets.db"), legacy_files=files, legacy_log_file=log_file, legacy_log_dir=str(log_dir))
+        reloaded = await backend.load()
+        logged = await backend._run(lambda: backend._connect().execute("SELECT channel_id FROM ticket_log ORDER BY id").fetchall())
+        await backend.close()
+        return state, reloaded, logged
+
+    state, reloaded, logged = asyncio.run(run())
+    bans, panels, active, closed, owner = state
+    assert bans == {"1": {7: None, 8: 5000.0}}
+    assert panels == {"1": {"channel_id": 3, "message_id": 4}}
+    assert active == {100: {"guild_id": 1, "user_id": 7, "ticket_type": "partner"}}
+    assert closed == {200: {"guild_id": 1, "user_id": 8, "ticket_type": "lahelu"}}
+    assert owner == 100
+    assert set(reloaded["closed"]) == {200, 300}
+    assert logged == [(1,), (2,), (3,)]
+
+
+def test_sqlite_loads_only_owned_guilds(tmp_path):
+    async def run():
+        path = str(tmp_path / "tickets.db")
+        backend = SqliteStorage(path)
+        store = TicketStore(backend, flush_delay=3600)
+        await store.load()
+        store.add_active(1, {"guild_id": 10, "user_id": 1})
+        store.add_active(2, {"guild_id": 11, "user_id": 1})
+        await store.close()
+
+        backend = SqliteStorage(path, owns_guild=lambda guild_id: guild_id == 11)
+        state = await backend.load()
+        await backend.close()
+        return state
+
+    assert list(asyncio.run(run())["active"]) == [2]
+
+
+def test_json_storage_round_trip(tmp_path):
+    def create():
+        journal = TicketJournal(str(tmp_path / "ticket_log"), fsync_interval=0)
+        return JsonStorage(*(str(tmp_path / f"{name}.json") for name in ("bans", "panels", "active", "closed")), journal)
+
+    async def run():
+        store = TicketStore(create(), flush_delay=3600)
+        await store.load()
+        store.ban(1, 7)
+        store.add_active(5, {"guild_id": 1, "user_id": 7, "ticket_type": "partner"})
+        await store.append_log(log_entry(4))
+        await store.close()
+
+        store = TicketStore(create())
+        await store.load()
+        await store.backend.close()
+        return store
+
+    store = asyncio.run(run())
+    assert store.is_banned(1, 7)
+    assert store.find_active(1, 7, "partner") == 5
+    assert [entry["channel_id"] for entry in iter_journal(str(tmp_path / "ticket_log"))] == [4]
+
+
+def test_journal_migrates_legacy_log(tmp_path):
+    legacy = str(tmp_path / "ticket_log.json")
+    write_json(legacy, [log_entry(1), log_entry(2)])
+    directory = str(tmp_path / "ticket_log")
+
+    async def run():
+        journal = TicketJournal(directory, fsync_interval=0, legacy_file=legacy)
+        await journal.open()
+        journal.append(log_entry(3))
+        await journal.close()
+
+    asyncio.run(run())
+    assert [entry["channel_id"] for entry in iter_journal(directory)] == [1, 2, 3]
+    assert not os.path.exists(legacy)
+    assert os.path.exists(legacy + ".migrated")
+
+
+def test_journal_rotates_by_size_and_compresses(tmp_path):
+    directory = str(tmp_path / "ticket_log")
+
+    async def run():
+        journal = TicketJournal(directory, max_segment_bytes=300, fsync_interval=3600, fsync_batch=1000)
+        await journal.open()
+        for i in range(20):
+            journal.append(log_entry(i))
+            await journal.flush()
+        await journal.close()
+
+    asyncio.run(run())
+    names = sorted(os.listdir(directory))
+    sealed = [name for name in names if name.endswith(".jsonl.gz")]
+    assert len(sealed) >= 5
+    assert names[-1].endswith(".jsonl")
+    with gzip.open(os.path.join(directory, sealed[0]), "rt", encoding="utf-8") as f:
+        assert json.loads(f.readline())["channel_id"] == 0
+    assert [entry["channel_id"] for entry in iter_journal(directory)] == list(range(20))
+
+
+def test_journal_recovers_from_a_crash_during_rotation(tmp_path):
+    directory = tmp_path / "ticket_log"
+    directory.mkdir()
+    lines = "".join(json.dumps(log_entry(i)) + "\n" for i in (1, 2))
+    # Crashed after the .gz was renamed into place, before the unlink.
+    first = directory / "segment-000000000000001.jsonl"
+    first.write_text(lines, encoding="utf-8")
+    with gzip.open(str(first) + ".gz", "wt", encoding="utf-8") as f:
+        f.write(lines)
+    # Crashed while compressing the next segment.
+    second = directory / "segment-000000000000002.jsonl"
+    second.write_text(json.dumps(log_entry(3)) + "\n", encoding="utf-8")
+    (directory / "segment-000000000000002.jsonl.gz.tmp").write_bytes(b"\x1f\x8b\x08")
+
+    assert [entry["channel_id"] for entry in iter_journal(str(directory))] == [1, 2, 3]
+
+    async def run():
+        journal = TicketJournal(str(directory), fsync_interval=3600)
+        await journal.open()
+        journal.append(log_entry(4))
+        await journal.close()
+
+    asyncio.run(run())
+    names = sorted(os.listdir(directory))
+    # The leftovers are gone and the old second segment was sealed on open.
+    assert names[:2] == ["segment-000000000000001.jsonl.gz", "segment-000000000000002.jsonl.gz"]
+    assert len(names) == 3 and names[2].endswith(".jsonl")
+    assert [entry["channel_id"] for entry in iter_journal(str(directory))] == [1, 2, 3, 4]
+
+
+def test_journal_rotates_by_age(tmp_path, monkeypatch):
+    directory = str(tmp_path / "ticket_log")
+    clock = types.SimpleNamespace(now=1_700_000_000.0)
+    monkeypatch.setattr(ticket_journal, "time", types.SimpleNamespace(time=lambda: clock.now))
+
+    async def run():
+        journal = TicketJournal(directory, max_segment_age=3600, fsync_interval=3600, compress=False)
+        await journal.open()
+        journal.append(log_entry(1))
+        await journal.flush()
+        clock.now += 1800
+        journal.append(log_entry(2))
+        await journal.flush()
+        assert len(os.listdir(directory)) == 1
+        clock.now += 1800
+        journal.append(log_entry(3))
+        await journal.flush()
+        await journal.close()
+
+        # Reopening resumes the newest segment, which is still young.
+        journal = TicketJournal(directory, max_segment_age=3600, fsync_interval=3600, compress=False)
+        await journal.open()
+        journal.append(log_entry(4))
+        await journal.close()
+
+    asyncio.run(run())
+    names = sorted(os.listdir(directory))
+    assert len(names) == 2
+    assert not any(name.endswith(".gz") for name in names)
+    assert [entry["channel_id"] for entry in iter_journal(directory)] == [1, 2, 3, 4]
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.ticket_store import TicketStore
+
+
+class MemoryBackend:
+    def __init__(self, state=None, fail=False):
+        self.state = state or {"bans": {}, "panels": {}, "active": {}, "closed": {}}
+        self.fail = fail
+        self.commits = []
+        self.log = []
+        self.closed = False
+
+    async def load(self):
+        return {name: dict(items) for name, items in self.state.items()}
+
+    def prepare(self, name, items, keys):
+        return (dict(items), None if keys is None else set(keys))
+
+    async def commit(self, payloads):
+        if self.fail:
+            self.commits.append(None)
+            raise OSError("disk penuh")
+        self.commits.append(payloads)
+
+    async def append_log(self, entry):
+        self.log.append(entry)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_owner_lock_blocks_double_click():
+    async def run():
+        store = TicketStore(MemoryBackend(), flush_delay=3600)
+        await store.load()
+        created = []
+        answers = []
+
+        # Mirrors TicketButton.callback: a click that finds the lock held is
+        # answered at once; the holder checks and creates under the lock.
+        async def click(channel_id):
+            lock = store.owner_lock(1, 42, "partner")
+            if lock.locked():
+                answers.append("sedang dibuat")
+                return
+            async with lock:
+                if store.find_active(1, 42, "partner") is not None:
+                    answers.append("sudah ada")
+                    return
+                await asyncio.sleep(0.01)
+                store.add_active(channel_id, {"guild_id": 1, "user_id": 42, "ticket_type": "partner"})
+                created.append(channel_id)
+
+        await asyncio.gather(click(100), click(101))
+        await click(102)
+        await store.close()
+        return created, answers
+
+    created, answers = asyncio.run(run())
+    assert created == [100]
+    assert answers == ["sedang dibuat", "sudah ada"]
+
+
+def test_owner_lock_is_per_owner_and_released():
+    async def run():
+        store = TicketStore(MemoryBackend())
+        lock = store.owner_lock(1, 42, "partner")
+        assert store.owner_lock(1, 42, "partner") is lock
+        assert store.owner_lock(1, 42, "lahelu") is not lock
+        assert store.owner_lock(1, 43, "partner") is not lock
+        async with lock:
+            assert store.owner_lock(1, 42, "partner").locked()
+        del lock
+        # The weak map drops locks nobody holds.
+        assert (1, 42, "partner") not in store._owner_locks
+
+    asyncio.run(run())
+
+
+def test_owner_index_follows_active_tickets():
+    async def run():
+        state = {"bans": {}, "panels": {}, "closed": {}, "active": {
+            10: {"guild_id": 1, "user_id": 5, "ticket_type": "partner"},
+            11: {"channel_id": 11},
+        }}
+        store = TicketStore(MemoryBackend(state), flush_delay=3600)
+        await store.load()
+        assert store.find_active(1, 5, "partner") == 10
+        store.add_active(12, {"guild_id": 1, "user_id": 5, "ticket_type": "lahelu"})
+        assert store.find_active(1, 5, "lahelu") == 12
+        assert store.pop_active(10)["user_id"] == 5
+        assert store.find_active(1, 5, "partner") is None
+        assert store.pop_active(10) is None
+        await store.close()
+
+    asyncio.run(run())
+
+
+def test_flush_sends_only_dirty_keys():
+    async def run():
+        backend = MemoryBackend()
+        store = TicketStore(backend, flush_delay=3600)
+        await store.load()
+        store.add_active(1, {"guild_id": 1, "user_id": 2, "ticket_type": "partner"})
+        store.ban(1, 7, expires_at=time.time() + 60)
+        await store.flush()
+        await store.flush()
+        await store.close()
+        return backend
+
+    backend = asyncio.run(run())
+    assert len(backend.commits) == 1
+    payloads = backend.commits[0]
+    assert payloads["active"][1] == {1}
+    assert payloads["bans"][1] == {("1", 7)}
+    assert backend.closed
+
+
+def test_close_with_failing_backend_raises_without_spinning():
+    async def run():
+        backend = MemoryBackend(fail=True)
+        store = TicketStore(backend, flush_delay=0.05)
+        await store.load()
+        store.add_closed(1, {"guild_id": 1})
+        await asyncio.sleep(0.4)
+        with pytest.raises(OSError):
+            await asyncio.wait_for(store.close(), 2)
+        return backend, store
+
+    backend, store = asyncio.run(run())
+    # Back-off doubles the delay: 0.1, 0.2 ... so only a few attempts fit,
+    # plus the final flush from close().
+    assert 2 <= len(backend.commits) <= 5
+    assert backend.closed
+    # The failed keys stay dirty for whoever retries.
+    assert store._dirty == {"closed": {1}}
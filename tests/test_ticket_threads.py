@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import fake_discord
+
+
+async def open_thread_ticket(harness, index=0, ticket_type="partner"):
+    guild, panel_channel, handler, user = harness.new_user(index)
+    harness.cog.store.get_panel(guild.id)["mode"] = "thread"
+    await harness.open(guild, panel_channel, user, ticket_type)
+    channel_id = harness.cog.store.find_active(guild.id, user.id, ticket_type)
+    assert channel_id is not None
+    return guild, panel_channel, handler, user, guild.get_channel_or_thread(channel_id)
+
+
+def test_uncached_thread_still_blocks_a_duplicate(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, _, user, thread = await open_thread_ticket(harness)
+            assert isinstance(thread, fake_discord.FakeThread)
+            # An archived private thread drops out of the gateway cache.
+            guild.uncache_thread(thread)
+
+            interaction = fake_discord.FakeInteraction(harness.bot, guild, user, panel_channel)
+            await harness.module.TicketButton("partner", 1, "partner").callback(interaction)
+            assert interaction.replies == [f"❌ Kamu sudah memiliki tiket aktif untuk kategori ini: <#{thread.id}>"]
+            assert cog.store.find_active(guild.id, user.id, "partner") == thread.id
+            assert harness.api.calls["create_thread"] == 1
+
+    asyncio.run(run())
+
+
+def test_deleted_thread_is_dropped_and_reopened(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, _, user, thread = await open_thread_ticket(harness)
+            # Deleted while the bot was offline: no gateway event arrived.
+            guild.remove_thread(thread)
+
+            await harness.open(guild, panel_channel, user, "partner")
+            new_id = cog.store.find_active(guild.id, user.id, "partner")
+            assert new_id not in (None, thread.id)
+            assert thread.id not in cog.store.active
+            assert harness.api.calls["get_channel"] == 1
+            assert harness.api.calls["create_thread"] == 2
+
+    asyncio.run(run())
+
+
+def test_expire_closes_an_uncached_thread(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, _, _, user, thread = await open_thread_ticket(harness, ticket_type="lahelu")
+            guild.uncache_thread(thread)
+
+            await cog.expire_ticket(thread.id)
+            assert thread.id not in cog.store.active
+            closed = cog.store.closed[thread.id]
+            assert closed["closed_by"] == "auto-expire"
+            assert closed["parent_id"] == thread.parent_id
+            assert thread.archived and thread.locked
+            assert thread.messages[-1].content.startswith("⏰")
+
+    asyncio.run(run())
+
+
+def test_expire_drops_a_thread_only_once_confirmed_gone(ticket_harness):
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, _, _, _, thread = await open_thread_ticket(harness)
+            guild.remove_thread(thread)
+
+            await cog.expire_ticket(thread.id)
+            assert thread.id not in cog.store.active
+            assert thread.id not in cog.store.closed
+            assert harness.api.calls["get_channel"] == 1
+
+    asyncio.run(run())
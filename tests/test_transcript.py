@@ -0,0 +1,211 @@
+import asyncio
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from utils.transcript import (
+    TranscriptSpool, TranscriptWriter, export_history, message_record, raw_message_record, split_transcript, transcript_size
+)
+
+
+class Author:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+def message(message_id, content, author=None, attachments=(), embeds=()):
+    return SimpleNamespace(
+        id=message_id,
+        created_at=datetime(2024, 1, 1, 12, message_id % 60, tzinfo=timezone.utc),
+        edited_at=None,
+        author=author or Author(7, "budi"),
+        content=content,
+        attachments=list(attachments),
+        embeds=list(embeds),
+    )
+
+
+class Channel:
+    def __init__(self, name, messages):
+        self.name = name
+        self.messages = messages
+
+    async def history(self, limit=None, oldest_first=False):
+        for msg in self.messages if oldest_first else self.messages[::-1]:
+            yield msg
+
+
+def export(messages, fmt, compress=False):
+    fp, name = asyncio.run(export_history(Channel("ticket-budi", messages), fmt, compress))
+    with fp:
+        data = fp.read()
+    return (gzip.decompress(data) if compress else data).decode("utf-8"), name
+
+
+def test_txt_transcript():
+    attachment = SimpleNamespace(filename="bukti.png", url="https://cdn/bukti.png", size=10, content_type="image/png")
+    embed = SimpleNamespace(title="Judul", description="Isi", url=None)
+    text, name = export([message(1, "halo"), message(2, "", attachments=[attachment], embeds=[embed])], "txt")
+    assert name == "transcript-ticket-budi.txt"
+    assert text.splitlines() == [
+        "[2024-01-01 12:01] budi (<@7>): halo",
+        "[2024-01-01 12:02] budi (<@7>): ",
+        "    📎 bukti.png (https://cdn/bukti.png)",
+        "    [embed] Judul — Isi",
+    ]
+    assert export([], "txt")[0] == "No messages."
+
+
+def test_jsonl_transcript_keeps_every_field():
+    text, name = export([message(1, "halo"), message(2, "dunia")], "jsonl")
+    assert name == "transcript-ticket-budi.jsonl"
+    records = [json.loads(line) for line in text.splitlines()]
+    assert [r["content"] for r in records] == ["halo", "dunia"]
+    assert records[0]["author_id"] == 7
+    assert records[0]["event"] == "message"
+
+
+def test_html_transcript_escapes_content():
+    text, name = export([message(1, "<script>alert(1)</script>", author=Author(8, "a&b"))], "html")
+    assert name == "transcript-ticket-budi.html"
+    assert text.startswith("<!DOCTYPE html>")
+    assert text.endswith("</body></html>\n")
+    assert "&lt;script&gt;" in text and "<script>" not in text
+    assert "a&amp;b" in text
+
+
+def test_gzip_transcript():
+    text, name = export([message(1, "halo")], "txt", compress=True)
+    assert name == "transcript-ticket-budi.txt.gz"
+    assert text.startswith("[2024-01-01 12:01] budi")
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        TranscriptWriter("x", "pdf")
+
+
+def lines_file(count, width=30):
+    return io.BytesIO("".join(f"{i:04d} {'x' * width}\n" for i in range(count)).encode())
+
+
+def test_split_cuts_on_newlines_within_the_limit():
+    fp = lines_file(50)
+    original = fp.getvalue()
+    assert transcript_size(fp) == len(original)
+    parts = split_transcript(fp, "transcript-t.txt", 200, 20)
+    assert [name for _, name in parts][:2] == ["part1-transcript-t.txt", "part2-transcript-t.txt"]
+    chunks = [part.read() for part, _ in parts]
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    assert b"".join(chunks) == original
+
+
+def test_split_hard_cuts_a_line_longer_than_the_limit():
+    fp = io.BytesIO(b"a" * 450 + b"\nb\n")
+    parts = split_transcript(fp, "t.txt", 200, 5)
+    chunks = [part.read() for part, _ in parts]
+    assert [len(chunk) for chunk in chunks] == [200, 200, 53]
+    assert b"".join(chunks) == b"a" * 450 + b"\nb\n"
+
+
+def test_split_gzip_parts_concatenate_to_the_original():
+    writer = TranscriptWriter("t", "txt", compress=True)
+    for i in range(300):
+        writer.write({"created_at": "2024-01-01T00:00", "author": f"user{i}", "content": str(i * 7919)})
+    fp = writer.finish()
+    original = fp.read()
+    fp.seek(0)
+    parts = split_transcript(fp, writer.filename, 512, 20)
+    assert len(parts) > 1
+    assert all(name.endswith(".txt.gz") for _, name in parts)
+    joined = b"".join(part.read() for part, _ in parts)
+    assert joined == original
+    assert gzip.decompress(joined).decode().count("\n") == 300
+
+
+def test_split_gives_up_past_max_parts():
+    assert split_transcript(lines_file(100), "t.txt", 200, 3) is None
+
+
+def spool_records(spool, channel_id):
+    with open(spool.path(channel_id), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_spool_records_message_edit_and_delete(tmp_path):
+    async def run():
+        spool = TranscriptSpool(str(tmp_path / "spool"), flush_interval=3600)
+        spool.load()
+        spool.start(100)
+        spool.record(100, message_record(message(1, "halo")))
+        spool.record(100, raw_message_record({
+            "id": "1", "content": "halo semua", "timestamp": "2024-01-01T12:01:00+00:00",
+            "edited_timestamp": "2024-01-01T12:05:00+00:00", "author": {"id": "7", "username": "budi", "discriminator": "0"}
+        }, "edit"))
+        spool.record(100, dict(message_record(message(1, "halo semua"), event="delete"), created_at="2024-01-01T12:09:00+00:00"))
+        # Channels that were never started are not recorded.
+        spool.record(200, message_record(message(2, "bukan ticket")))
+        fp, name = await spool.render(100, "ticket-budi", "txt")
+        with fp:
+            text = fp.read().decode()
+        records = spool_records(spool, 100)
+        await spool.close()
+
+        reloaded = TranscriptSpool(str(tmp_path / "spool"))
+        reloaded.load()
+        known = 100 in reloaded, 200 in reloaded
+        await reloaded.discard(100)
+        return name, text, records, known
+
+    name, text, records, known = asyncio.run(run())
+    assert [r["event"] for r in records] == ["message", "edit", "delete"]
+    assert [r["content"] for r in records] == ["halo", "halo semua", "halo semua"]
+    assert name == "transcript-ticket-budi.txt"
+    assert text.splitlines() == [
+        "[2024-01-01 12:01] budi (<@7>): halo",
+        "[2024-01-01 12:05] budi (<@7>) [edit]: halo semua",
+        "[2024-01-01 12:09] budi (<@7>) [delete]: halo semua",
+    ]
+    assert known == (True, False)
+    assert not (tmp_path / "spool" / "100.jsonl").exists()
+
+
+def test_live_transcript_through_the_cog(ticket_harness, ticket_module, monkeypatch):
+    monkeypatch.setattr(ticket_module, "LIVE_TRANSCRIPT", True)
+
+    async def run():
+        async with ticket_harness() as harness:
+            cog = harness.cog
+            guild, panel_channel, handler, user = harness.new_user(0)
+            channel = await harness.open(guild, panel_channel, user, "partner")
+            assert channel.id in cog.spool
+
+            sent = channel.post(user, "halo")
+            await cog.on_message(sent)
+            await cog.on_raw_message_edit(SimpleNamespace(channel_id=channel.id, data={
+                "id": str(sent.id), "content": "halo, mau tanya", "edited_timestamp": "2024-01-01T12:05:00+00:00",
+                "author": {"id": str(user.id), "username": user.name, "discriminator": "0"}
+            }))
+            # Embed-only updates are not edits.
+            await cog.on_raw_message_edit(SimpleNamespace(channel_id=channel.id, data={"id": str(sent.id), "embeds": []}))
+            await cog.on_raw_message_delete(SimpleNamespace(channel_id=channel.id, message_id=sent.id, cached_message=None))
+            fp, _ = await cog.spool.render(channel.id, channel.name, "txt")
+            with fp:
+                text = fp.read().decode()
+            return text, spool_records(cog.spool, channel.id), sent.id, user.id
+
+    text, records, message_id, user_id = asyncio.run(run())
+    assert [(r["event"], r["id"]) for r in records] == [("message", message_id), ("edit", message_id), ("delete", message_id)]
+    lines = text.splitlines()
+    assert lines[0].endswith(f"user-0 (<@{user_id}>): halo")
+    assert lines[1].endswith(f"user-0 (<@{user_id}>) [edit]: halo, mau tanya")
+    assert lines[2].endswith("unknown [delete]: ")
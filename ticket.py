@@ -1,230 +1,645 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 from discord.ui import View, Button
 from discord.ui import Modal, TextInput
 import os
-import json
-from datetime import datetime, timedelta
 import io
+import re
+from datetime import datetime, timedelta, timezone
+import time
+import traceback
+import asyncio
+import functools
 
 from utils.guild_config import (
-    set_ticket_category, get_ticket_category,
-    set_ticket_log_channel, get_ticket_log_channel,
-    add_ticket_role, remove_ticket_role, get_ticket_roles
+    set_ticket_category, set_ticket_log_channel,
+    add_ticket_role, remove_ticket_role
+)
+from utils.ticket_store import TicketStore
+from utils.ticket_storage import JsonStorage, SqliteStorage
+from utils.ticket_journal import TicketJournal
+from utils.expiry_scheduler import DeadlineScheduler
+from utils.ticket_config import TicketConfigCache
+from utils.category_pool import CategoryPool
+from utils.member_cache import MemberResolver
+from utils.cluster import ClusterConfig
+from utils.metrics import Metrics
+from utils.loop_monitor import LoopMonitor, handler_scope, tag_handler
+from utils.admission import AdmissionController
+from utils.memory import rss_bytes, format_bytes
+from utils.ticket_stats import TicketStats
+from utils.ticket_reconcile import reconcile, rebuild_metadata, reopened_overwrites, is_complete, type_roles_for
+from utils.rest_scheduler import RestScheduler, route, INTERACTIVE, NORMAL, BACKGROUND
+from utils.transcript import (
+    TRANSCRIPT_FORMATS, export_history, message_record, raw_message_record, split_transcript, transcript_size, TranscriptSpool
 )
 
 TICKET_JSON_FILE = "ticket_log.json"
+TICKET_LOG_DIR = "ticket_log"
+TICKET_LOG_SEGMENT_BYTES = 8 * 1024 * 1024
+TICKET_LOG_SEGMENT_SECONDS = 86400
+TICKET_LOG_COMPRESS = True
 BUTTONS_FILE = "ticket_buttons.json"
 AUTO_EXPIRE_SECONDS = 259200  
 
-active_tickets = {}
 BANNED_USERS_FILE = "ticket_bans.json"
 TICKET_CLOSED_FILE = "ticket_closed.json"
 TICKET_ACTIVE_FILE = "ticket_active.json"
-
-def load_banned_users():
-    if os.path.exists(BANNED_USERS_FILE):
-        with open(BANNED_USERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_banned_users(data):
-    with open(BANNED_USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+TICKET_STORAGE = os.getenv("TICKET_STORAGE", "json")
+TICKET_DB_FILE = os.getenv("TICKET_DB_FILE", "tickets.db")
+TRANSCRIPT_FORMAT = os.getenv("TICKET_TRANSCRIPT_FORMAT", "txt")
+if TRANSCRIPT_FORMAT not in TRANSCRIPT_FORMATS:
+    print(f"⚠️ TICKET_TRANSCRIPT_FORMAT {TRANSCRIPT_FORMAT!r} tidak dikenal, memakai txt.")
+    TRANSCRIPT_FORMAT = "txt"
+TRANSCRIPT_GZIP = os.getenv("TICKET_TRANSCRIPT_GZIP", "0") == "1"
+LIVE_TRANSCRIPT = os.getenv("TICKET_LIVE_TRANSCRIPT", "0") == "1"
+TRANSCRIPT_SPOOL_DIR = "ticket_transcripts"
+MAX_TRANSCRIPT_PARTS = 10
+BAN_IMPORT_MAX_BYTES = 2 * 1024 * 1024
+TICKET_STATS_FILE = os.getenv("TICKET_STATS_FILE", "ticket_stats.json")
+OPEN_SLOW_MS = int(os.getenv("TICKET_OPEN_SLOW_MS", "1500"))
+RESTORE_CONCURRENCY = int(os.getenv("TICKET_RESTORE_CONCURRENCY", "8"))
+RESTORE_PROGRESS_EVERY = 100
+EXPIRE_RETRY_SECONDS = 300
+# Longest a queued ticket request waits before it is shed; well inside the
+# 15 minute interaction token.
+ADMISSION_MAX_WAIT = int(os.getenv("TICKET_OPEN_MAX_WAIT", "120"))
 
 def now_wib():
     return datetime.utcnow() + timedelta(hours=7)
 
-def save_ticket_log(entry):
-    logs = []
-    if os.path.exists(TICKET_JSON_FILE):
-        with open(TICKET_JSON_FILE, "r", encoding="utf-8") as f:
-            try:
-                logs = json.load(f)
-            except json.JSONDecodeError:
-                logs = []
-    logs.append(entry)
-    with open(TICKET_JSON_FILE, "w", encoding="utf-8") as f:
-        json.dump(logs, f, indent=2)
-
-def load_ticket_buttons():
-    if os.path.exists(BUTTONS_FILE):
-        with open(BUTTONS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_ticket_buttons(data):
-    with open(BUTTONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-
-def load_closed_tickets():
-    if os.path.exists(TICKET_CLOSED_FILE):
-        with open(TICKET_CLOSED_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_closed_tickets(data):
-    with open(TICKET_CLOSED_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-
-def load_active_tickets():
-    if os.path.exists(TICKET_ACTIVE_FILE):
-        with open(TICKET_ACTIVE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
-
-def save_active_tickets(data):
-    with open(TICKET_ACTIVE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+def wib_to_timestamp(value):
+    return (datetime.fromisoformat(value) - timedelta(hours=7)).replace(tzinfo=timezone.utc).timestamp()
+
+def last_activity_of(data):
+    if "last_activity" in data:
+        return data["last_activity"]
+    if "opened_at" in data:
+        return wib_to_timestamp(data["opened_at"])
+    return None
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+def parse_duration(value):
+    match = re.fullmatch(r"\s*(\d+)\s*([smhdw])\s*", value.lower())
+    if not match:
+        return None
+    return int(match[1]) * DURATION_UNITS[match[2]]
+
+def is_unix_time(number):
+    # Seconds between 2001 and 5138; user ids are snowflakes of 17+ digits.
+    return 1e9 <= float(number) < 1e11
+
+def parse_ban_list(text):
+    # One user per line: "<user_id>" or "<user_id> <expires_at unix>".
+    # A number after an id is its expiry only if it looks like a unix time,
+    # otherwise it is another id, so "123,456" bans two users.
+    entries = []
+    for line in text.splitlines():
+        user_id = None
+        for number in re.findall(r"\d+(?:\.\d+)?", line):
+            if user_id is not None and is_unix_time(number):
+                entries.append((user_id, float(number)))
+                user_id = None
+            elif "." not in number:
+                if user_id is not None:
+                    entries.append((user_id, None))
+                user_id = int(number)
+        if user_id is not None:
+            entries.append((user_id, None))
+    return entries
+
+def get_cog(client):
+    return client.get_cog("Ticket")
+
+def get_store(client):
+    return get_cog(client).store
+
+def get_config(client, guild):
+    return get_cog(client).config.get(guild)
+
+async def edit_panel_message(store, guild, **fields):
+    panel = store.get_panel(guild.id)
+    channel = guild.get_channel(panel.get("channel_id")) if panel else None
+    if channel is None:
+        store.remove_panel(guild.id)
+        return False
+    try:
+        await channel.get_partial_message(panel["message_id"]).edit(**fields)
+    except discord.NotFound:
+        store.remove_panel(guild.id)
+        return False
+    return True
+
+def create_storage():
+    legacy_files = {
+        "bans": BANNED_USERS_FILE,
+        "panels": BUTTONS_FILE,
+        "active": TICKET_ACTIVE_FILE,
+        "closed": TICKET_CLOSED_FILE,
+    }
+    cluster = ClusterConfig.from_env()
+    if TICKET_STORAGE == "sqlite":
+        return SqliteStorage(
+            TICKET_DB_FILE,
+            legacy_files=legacy_files,
+            legacy_log_file=TICKET_JSON_FILE,
+            legacy_log_dir=TICKET_LOG_DIR,
+            owns_guild=cluster.owns_guild
+        )
+    if cluster.enabled:
+        # Flat JSON files are rewritten whole and cannot be shared by workers.
+        raise RuntimeError("Mode cluster membutuhkan TICKET_STORAGE=sqlite")
+    journal = TicketJournal(
+        TICKET_LOG_DIR,
+        max_segment_bytes=TICKET_LOG_SEGMENT_BYTES,
+        max_segment_age=TICKET_LOG_SEGMENT_SECONDS,
+        compress=TICKET_LOG_COMPRESS,
+        legacy_file=TICKET_JSON_FILE
+    )
+    return JsonStorage(BANNED_USERS_FILE, BUTTONS_FILE, TICKET_ACTIVE_FILE, TICKET_CLOSED_FILE, journal)
+
+REASON_MAP = {
+    "lahelu": "Customer Service Lahelu",
+    "partner": "Partnership Server",
+    "custom": "Custom Role Request"
+}
+
+class StageTimer:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    @property
+    def total(self):
+        return self.last - self.started
+
+    def report(self, context=""):
+        if self.total * 1000 < OPEN_SLOW_MS:
+            return
+        stages = " ".join(f"{stage}={elapsed * 1000:.0f}ms" for stage, elapsed in self.stages)
+        print(f"[ticket] {self.name} lambat {self.total * 1000:.0f}ms {context} {stages}")
+
+def instrumented(handler):
+    # Tags the callback for the loop monitor and times it per handler when
+    # metrics are enabled; app commands get the same from the cog's
+    # interaction_check and completion hooks.
+    def decorator(callback):
+        @functools.wraps(callback)
+        async def wrapper(self, interaction, *args, **kwargs):
+            metrics = get_cog(interaction.client).metrics
+            with handler_scope(handler):
+                if not metrics.enabled:
+                    return await callback(self, interaction, *args, **kwargs)
+                started = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await callback(self, interaction, *args, **kwargs)
+                    outcome = "ok"
+                    return result
+                finally:
+                    metrics.observe("ticket_handler_seconds", time.perf_counter() - started, handler=handler, outcome=outcome)
+        return wrapper
+    return decorator
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}ms"
 
 class TicketButton(Button):
     def __init__(self, label: str, style: discord.ButtonStyle, custom_id: str):
         super().__init__(label=label, style=style, custom_id=custom_id)
 
+    @instrumented("open_ticket")
     async def callback(self, interaction: discord.Interaction):
-        banned_data = load_banned_users()
-        guild_id = str(interaction.guild.id)
-        if guild_id in banned_data and interaction.user.id in banned_data[guild_id]:
-            await interaction.response.send_message("❌ Kamu telah diblokir dari sistem tiket.", ephemeral=True)
-            return
-        for ch_id, data in active_tickets.items():
-            if data["user_id"] == interaction.user.id and data["ticket_type"] == self.custom_id:
-                existing_channel = interaction.guild.get_channel(ch_id)
-                if existing_channel:
-                    await interaction.response.send_message(
-                        f"❌ Kamu sudah memiliki tiket aktif untuk kategori ini: {existing_channel.mention}",
-                        ephemeral=True
-                    )
+        timer = StageTimer("open_ticket")
+        store = get_store(interaction.client)
+        lock = store.owner_lock(interaction.guild.id, interaction.user.id, self.custom_id)
+        if lock.locked():
+            await interaction.response.send_message("⏳ Tiket kamu sedang dibuat, mohon tunggu.", ephemeral=True)
+            return
+        async with lock:
+            # Everything up to the defer is answered from local state, so
+            # rejections never wait on the API (short of an uncached thread).
+            error, plan = await self.prepare_ticket(interaction, store)
+            timer.mark("validate")
+            if error:
+                await interaction.response.send_message(error, ephemeral=True)
+                return
+            admitted = await self.admit(interaction)
+            if admitted is None:
+                return
+            timer.mark("admission")
+            if admitted == "queued":
+                # The queue reply already acknowledged the interaction, and
+                # the panel or the user may have changed while waiting.
+                error, plan = await self.prepare_ticket(interaction, store)
+                if error:
+                    try:
+                        await interaction.edit_original_response(content=error)
+                    except discord.HTTPException:
+                        pass
                     return
-        guild_id = str(interaction.guild.id)
-        data = load_ticket_buttons()
-        ticket_info = data.get(guild_id)
+            else:
+                try:
+                    await interaction.response.defer(ephemeral=True, thinking=True)
+                except discord.HTTPException:
+                    # The interaction already expired; nothing has been created yet.
+                    traceback.print_exc()
+                    return
+                timer.mark("defer")
+            await self.open_ticket(interaction, store, plan, timer)
+        timer.report(f"guild={interaction.guild.id} user={interaction.user.id}")
+
+    async def admit(self, interaction: discord.Interaction):
+        # "now" when the ticket may be created right away, "queued" after
+        # waiting for a slot, None when the request was turned away.
+        admission = get_cog(interaction.client).admission
+        guild_id = interaction.guild.id
+        retry_after = admission.check_user(guild_id, interaction.user.id)
+        if retry_after is not None:
+            await interaction.response.send_message(
+                f"🚦 Kamu membuka tiket terlalu cepat. Coba lagi dalam {int(retry_after) + 1} detik.", ephemeral=True
+            )
+            return None
+        if admission.try_admit(guild_id):
+            return "now"
+
+        waiter = admission.enqueue(guild_id)
+        if waiter is None:
+            await interaction.response.send_message(
+                "🚦 Sistem tiket sedang sibuk dan antrean penuh. Silakan coba lagi beberapa saat lagi.", ephemeral=True
+            )
+            return None
 
-        if not ticket_info:
-            await interaction.response.send_message("❌ Panel ticket tidak ditemukan atau sudah direset. Silakan hubungi admin.", ephemeral=True)
-            return
+        def queue_message(position):
+            return f"⏳ Banyak permintaan tiket saat ini. Kamu **#{position}** dalam antrean, tiket akan dibuat otomatis."
 
-        channel_id = ticket_info.get("channel_id")
-        message_id = ticket_info.get("message_id")
-        channel = interaction.guild.get_channel(channel_id)
+        try:
+            await interaction.response.send_message(queue_message(admission.position(waiter)), ephemeral=True)
+        except discord.HTTPException:
+            admission.cancel(waiter)
+            traceback.print_exc()
+            return None
 
-        if not channel:
-            del data[guild_id]
-            save_ticket_buttons(data)
-            await interaction.response.send_message("❌ Channel panel sudah dihapus. Data dibersihkan.", ephemeral=True)
-            return
+        async def update(position):
+            try:
+                await interaction.edit_original_response(content=queue_message(position))
+            except discord.HTTPException:
+                pass
 
+        if await admission.wait(waiter, ADMISSION_MAX_WAIT, update):
+            return "queued"
         try:
-            await channel.fetch_message(message_id)
-        except discord.NotFound:
-            del data[guild_id]
-            save_ticket_buttons(data)
-            await interaction.response.send_message("❌ Panel ticket sudah dihapus. Silakan minta admin kirim ulang.", ephemeral=True)
-            return
+            await interaction.edit_original_response(content="⌛ Antrean tiket terlalu lama. Silakan coba lagi nanti.")
+        except discord.HTTPException:
+            pass
+        return None
+
+    async def prepare_ticket(self, interaction: discord.Interaction, store):
         guild = interaction.guild
         user = interaction.user
+        if store.is_banned(guild.id, user.id):
+            return "❌ Kamu telah diblokir dari sistem tiket.", None
 
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(read_messages=False),
-            user: discord.PermissionOverwrite(read_messages=True, send_messages=True, read_message_history=True)
-        }
-
-        reason_map = {
-            "lahelu": "Customer Service Lahelu",
-            "partner": "Partnership Server",
-            "custom": "Custom Role Request"
+        existing_id = store.find_active(guild.id, user.id, self.custom_id)
+        if existing_id is not None:
+            try:
+                existing_channel = await find_ticket_channel(
+                    get_cog(interaction.client).rest, guild, existing_id, store.active[existing_id], INTERACTIVE
+                )
+            except discord.HTTPException:
+                # Unknown is not gone: keep the record and refuse the duplicate.
+                traceback.print_exc()
+                existing_channel = discord.Object(existing_id)
+            if existing_channel:
+                return f"❌ Kamu sudah memiliki tiket aktif untuk kategori ini: <#{existing_channel.id}>", None
+            store.pop_active(existing_id)
+
+        ticket_info = store.get_panel(guild.id)
+        if not ticket_info:
+            return "❌ Panel ticket tidak ditemukan atau sudah direset. Silakan hubungi admin.", None
+
+        # Panel deletions reach us through gateway events (see Ticket listeners),
+        # so the stored panel is trusted here without fetching the message.
+        if not guild.get_channel(ticket_info.get("channel_id")):
+            store.remove_panel(guild.id)
+            return "❌ Channel panel sudah dihapus. Data dibersihkan.", None
+
+        config = get_config(interaction.client, guild)
+        type_config = config.ticket_type(self.custom_id)
+        if ticket_mode(ticket_info, self.custom_id) == "thread":
+            parent = guild.get_channel(ticket_info.get("thread_parent_id") or ticket_info["channel_id"])
+            if not isinstance(parent, discord.TextChannel):
+                return "❌ Channel untuk thread ticket tidak ditemukan.", None
+            return None, {"parent": parent, "role_mentions": type_config.mentions}
+
+        if config.category is None:
+            return "❌ Kategori ticket belum di-set.", None
+
+        return None, {
+            "category": config.category,
+            "category_overwrites": type_config.overwrites,
+            "overwrites": type_config.overwrites_for(user),
+            "owner": user,
+            "role_mentions": type_config.mentions
         }
 
-        category_id = get_ticket_category(guild.id)
-        category = guild.get_channel(category_id) if category_id else None
-        if not isinstance(category, discord.CategoryChannel):
-            await interaction.response.send_message("❌ Kategori ticket belum di-set.", ephemeral=True)
-            return
-
-        role_ids = get_ticket_roles(guild.id, self.custom_id)
-        for role_id in role_ids:
-            role = guild.get_role(role_id)
-            if role:
-                overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True, read_message_history=True)
-
+    async def open_ticket(self, interaction: discord.Interaction, store, plan, timer):
+        cog = get_cog(interaction.client)
+        guild = interaction.guild
+        user = interaction.user
+        cog.members.remember(user)
+        reason = REASON_MAP.get(self.custom_id, "General")
         channel_name = f"ticket-{user.name}".replace(" ", "-").lower()
-        ticket_channel = await guild.create_text_channel(
-            name=channel_name,
-            category=category,
-            overwrites=overwrites,
-            topic=f"Ticket by {user.display_name} - {reason_map.get(self.custom_id, 'General')}"
-        )
-
-        active_tickets[ticket_channel.id] = {
-            "user_id": user.id,
-            "ticket_type": self.custom_id,
-            "opened_at": now_wib().isoformat(),
-            "channel_id": ticket_channel.id
-        }
-
-        active_ticket_ids = load_active_tickets()
-        if ticket_channel.id not in active_ticket_ids:
-            active_ticket_ids.append(ticket_channel.id)
-            save_active_tickets(active_ticket_ids)
-
-        view = View(timeout=None)
-        view.add_item(CloseTicketButton(ticket_channel))
-        interaction.client.add_view(view) 
-
-        role_mentions = " ".join(guild.get_role(rid).mention for rid in role_ids if guild.get_role(rid))
-
-        embed = discord.Embed(
-            title="🎫 Ticket Dibuka",
-            color=discord.Color.green(),
-            description=f"Silakan jelaskan kebutuhan kamu terkait **{reason_map.get(self.custom_id, 'General')}**.\n\n{role_mentions}"
+        ticket_channel = None
+        try:
+            if "parent" in plan:
+                # A private thread needs no overwrites and does not count
+                # toward the guild channel limit. The mentions in the welcome
+                # message add the owner and handlers to it.
+                parent = plan["parent"]
+                ticket_channel = await cog.rest.submit(
+                    route("create_thread", parent.id),
+                    lambda: parent.create_thread(
+                        name=channel_name,
+                        type=discord.ChannelType.private_thread,
+                        invitable=False,
+                        auto_archive_duration=10080
+                    ),
+                    INTERACTIVE
+                )
+            else:
+                ticket_channel = await self.create_ticket_channel(cog, guild, plan, channel_name, reason)
+            timer.mark("create_channel")
+
+            ticket_data = {
+                "user_id": user.id,
+                "guild_id": guild.id,
+                "ticket_type": self.custom_id,
+                "opened_at": now_wib().isoformat(),
+                "last_activity": time.time(),
+                "channel_id": ticket_channel.id
+            }
+            if "parent" in plan:
+                ticket_data["parent_id"] = plan["parent"].id
+            store.add_active(ticket_channel.id, ticket_data)
+            cog.stats.record_open(guild.id)
+            cog.expiry.touch(ticket_channel.id)
+            if cog.spool is not None:
+                cog.spool.start(ticket_channel.id)
+
+            view = View(timeout=None)
+            view.add_item(CloseTicketButton(ticket_channel))
+
+            role_mentions = plan["role_mentions"]
+            embed = discord.Embed(
+                title="🎫 Ticket Dibuka",
+                color=discord.Color.green(),
+                description=f"Silakan jelaskan kebutuhan kamu terkait **{reason}**.\n\n{role_mentions}"
+            )
+            embed.add_field(name="👤 Ticket Owner", value=user.mention, inline=True)
+            embed.add_field(name="📅 Dibuka", value=f"<t:{int(now_wib().timestamp())}:f>", inline=True)
+            embed.add_field(name="📝 Tipe Ticket", value=REASON_MAP.get(self.custom_id, self.custom_id), inline=False)
+            embed.set_footer(text="Gunakan tombol di bawah untuk menutup tiket.")
+
+            # The welcome message and the ephemeral reply do not depend on
+            # each other, so they go out together.
+            welcome, reply = await asyncio.gather(
+                cog.rest.submit(
+                    route("send_message", ticket_channel.id),
+                    lambda: ticket_channel.send(content=f"{user.mention} {role_mentions}", embed=embed, view=view),
+                    INTERACTIVE
+                ),
+                interaction.edit_original_response(content=f"✅ Tiket kamu telah dibuat: {ticket_channel.mention}"),
+                return_exceptions=True
+            )
+            timer.mark("welcome")
+            if isinstance(welcome, BaseException):
+                raise welcome
+            if isinstance(reply, BaseException):
+                # The welcome message already pinged the owner, so the ticket
+                # stays usable even though the reply was lost.
+                print(f"[ticket] Gagal membalas interaksi untuk {ticket_channel.id}: {reply!r}")
+        except Exception:
+            traceback.print_exc()
+            if ticket_channel is not None:
+                await discard_ticket_channel(cog, ticket_channel)
+                timer.mark("cleanup")
+            try:
+                await interaction.edit_original_response(content="❌ Gagal membuat tiket. Silakan coba lagi.")
+            except discord.HTTPException:
+                pass
+
+    async def create_ticket_channel(self, cog, guild, plan, channel_name, reason):
+        ticket_channel = None
+        # A category holds at most 50 channels; the pool picks the least
+        # full one for this ticket type and adds overflow as needed.
+        category = await cog.categories.acquire(guild, plan["category"], self.custom_id, plan["category_overwrites"])
+        try:
+            ticket_channel = await cog.rest.submit(
+                route("create_channel", guild.id),
+                lambda: guild.create_text_channel(
+                    name=channel_name,
+                    category=category,
+                    overwrites=plan["overwrites"],
+                    topic=f"Ticket by {plan['owner'].display_name} - {reason}"
+                ),
+                INTERACTIVE
+            )
+        finally:
+            cog.categories.release(category, ticket_channel)
+        return ticket_channel
+
+async def discard_ticket_channel(cog, channel):
+    # Rolls back a half-opened ticket: local state first, then the channel.
+    cog.store.pop_active(channel.id)
+    cog.expiry.discard(channel.id)
+    if cog.spool is not None:
+        await cog.spool.discard(channel.id)
+    try:
+        await cog.rest.submit(
+            route("delete_channel", channel.id),
+            lambda: delete_ticket_channel(channel, "Ticket gagal dibuat"),
+            NORMAL
         )
-        embed.add_field(name="👤 Ticket Owner", value=user.mention, inline=True)
-        embed.add_field(name="📅 Dibuka", value=f"<t:{int(now_wib().timestamp())}:f>", inline=True)
-        embed.add_field(name="📝 Tipe Ticket", value=reason_map.get(self.custom_id, self.custom_id), inline=False)
-        embed.set_footer(text="Gunakan tombol di bawah untuk menutup tiket.")
+    except discord.HTTPException:
+        traceback.print_exc()
+
+def resolve_ticket_channel(interaction: discord.Interaction, match):
+    channel_id = int(match["channel_id"])
+    # Archived threads drop out of the cache; the interaction still carries them.
+    return interaction.guild.get_channel_or_thread(channel_id) or interaction.channel
+
+async def find_ticket_channel(rest, guild, channel_id, data, priority):
+    # Channels are always in the gateway cache, but private threads drop out
+    # of it once archived, so a missing thread is fetched before it counts as
+    # gone. None means Discord confirmed it is gone; other API errors raise.
+    channel = guild.get_channel_or_thread(channel_id)
+    if channel is not None or data.get("parent_id") is None:
+        return channel
+    if guild.get_channel(data["parent_id"]) is None:
+        # Deleting a channel deletes its threads.
+        return None
+    try:
+        return await rest.submit(route("get_channel", channel_id), lambda: guild.fetch_channel(channel_id), priority)
+    except discord.NotFound:
+        return None
+
+def stats_file():
+    # Each cluster worker owns its own guilds, so each keeps its own file.
+    cluster = ClusterConfig.from_env()
+    if not cluster.enabled:
+        return TICKET_STATS_FILE
+    root, ext = os.path.splitext(TICKET_STATS_FILE)
+    return f"{root}-{cluster.cluster_id}{ext}"
+
+def record_ticket_close(stats, guild_id, ticket_data):
+    opened_at = ticket_data.get("opened_at")
+    duration = time.time() - wib_to_timestamp(opened_at) if opened_at else None
+    stats.record_close(guild_id, ticket_data.get("ticket_type"), ticket_data.get("closed_by"), duration)
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds} detik"
+    minutes, _ = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days} hari {hours} jam"
+    if hours:
+        return f"{hours} jam {minutes} menit"
+    return f"{minutes} menit"
+
+def closed_record(ticket_data, guild_id, closed_by):
+    record = {
+        "user_id": ticket_data.get("user_id"),
+        "guild_id": guild_id,
+        "ticket_type": ticket_data.get("ticket_type"),
+        "closed_by": closed_by
+    }
+    for field in ("parent_id", "opened_at"):
+        if ticket_data.get(field) is not None:
+            record[field] = ticket_data[field]
+    return record
+
+def reopened_record(closed, channel, owner_id):
+    # The active record a reopen puts back, so the ticket can be closed
+    # again, blocks duplicates and expires like any other.
+    record = {
+        "user_id": owner_id,
+        "guild_id": channel.guild.id,
+        "ticket_type": closed.get("ticket_type"),
+        "opened_at": closed.get("opened_at") or now_wib().isoformat(),
+        "last_activity": time.time(),
+        "channel_id": channel.id
+    }
+    if closed.get("parent_id") is not None:
+        record["parent_id"] = closed["parent_id"]
+    return record
+
+async def latest_messages(channel, limit):
+    return [msg async for msg in channel.history(limit=limit)]
+
+def has_ticket_controls(message):
+    # Reopen buttons posted before the dynamic items had random custom_ids
+    # that no longer route, so only the current reopen id counts; messages
+    # with just the legacy buttons get working controls re-posted.
+    return any(
+        (getattr(child, "custom_id", None) or "").startswith("reopen_ticket:")
+        for row in message.components
+        for child in getattr(row, "children", ())
+    )
 
-        await ticket_channel.send(content=f"{user.mention} {role_mentions}", embed=embed, view=view)
-        await interaction.response.send_message(f"✅ Tiket kamu telah dibuat: {ticket_channel.mention}", ephemeral=True)
+def delete_ticket_channel(channel, reason):
+    # Thread.delete() takes no audit log reason on older discord.py versions.
+    if isinstance(channel, discord.Thread):
+        return channel.delete()
+    return channel.delete(reason=reason)
+
+async def set_thread_archived(rest, thread, archived, priority):
+    await rest.submit(
+        route("edit_channel", thread.id),
+        lambda: thread.edit(archived=archived, locked=archived),
+        priority,
+        coalesce_key=f"archive:{thread.id}"
+    )
 
-class CloseTicketButton(Button):
+def ticket_mode(panel, ticket_type):
+    # A button's own mode wins over the guild-wide panel mode.
+    for button in panel.get("buttons", []):
+        if button["custom_id"] == ticket_type and button.get("mode"):
+            return button["mode"]
+    return panel.get("mode", "channel")
+
+# Ticket control buttons carry their channel in the custom_id and are routed
+# through dynamic items registered once in setup(), so no per-ticket view is
+# kept in memory. The "_" separator matches buttons sent by older versions.
+class CloseTicketButton(discord.ui.DynamicItem[Button], template=r"close_ticket[:_](?P<channel_id>[0-9]+)"):
     def __init__(self, channel: discord.TextChannel):
-        super().__init__(
+        super().__init__(Button(
             label="❌ Tutup Ticket",
             style=discord.ButtonStyle.danger,
-            custom_id=f"close_ticket_{channel.id}"
-        )
+            custom_id=f"close_ticket:{channel.id}"
+        ))
         self.channel = channel
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        return cls(resolve_ticket_channel(interaction, match))
+
+    @instrumented("close_ticket")
     async def callback(self, interaction: discord.Interaction):
+        cog = get_cog(interaction.client)
+        store = cog.store
         guild = interaction.guild
         user = interaction.user
-        role_ids = get_ticket_roles(guild.id, active_tickets[self.channel.id]["ticket_type"])
-        is_handler = any(role in user.roles for role in [guild.get_role(rid) for rid in role_ids])
+        ticket = store.active.get(self.channel.id)
+        if ticket is None:
+            message = "⚠️ Ticket ini sudah ditutup." if self.channel.id in store.closed else "❌ Ticket ini tidak terdaftar sebagai ticket aktif."
+            await interaction.response.send_message(message, ephemeral=True)
+            return
+        config = cog.config.get(guild)
+        is_handler = config.ticket_type(ticket.get("ticket_type")).is_handler(user)
         if not (user.guild_permissions.administrator or is_handler):
             await interaction.response.send_message("❌ Hanya admin atau handler yang dapat menutup ticket.", ephemeral=True)
             return
 
         await interaction.response.defer(ephemeral=True)
-        log_channel_id = get_ticket_log_channel(interaction.guild.id)
-        log_channel = interaction.guild.get_channel(log_channel_id) if log_channel_id else None
-        ticket_data = active_tickets.pop(self.channel.id, {})
+        log_channel = config.log_channel
+        ticket_data = store.pop_active(self.channel.id) or {}
+        cog.expiry.discard(self.channel.id)
 
         ticket_data.update({
             "closed_at": datetime.utcnow().isoformat(),
             "closed_by": interaction.user.id
         })
-        save_ticket_log(ticket_data)
-
-        closed_tickets = load_closed_tickets()
-        closed_tickets[str(self.channel.id)] = {
-            "user_id": ticket_data.get("user_id"),
-            "closed_by": interaction.user.id
-        }
-        save_closed_tickets(closed_tickets)
-
-        await self.channel.set_permissions(interaction.guild.default_role, read_messages=False)
-        await self.channel.set_permissions(interaction.user, read_messages=False)
+        await store.append_log(ticket_data)
+        record_ticket_close(cog.stats, guild.id, ticket_data)
+
+        store.add_closed(self.channel.id, closed_record(ticket_data, guild.id, interaction.user.id))
+
+        if not isinstance(self.channel, discord.Thread):
+            # One overwrite edit instead of a set_permissions call per target.
+            overwrites = dict(self.channel.overwrites)
+            overwrites[interaction.guild.default_role] = discord.PermissionOverwrite(read_messages=False)
+            overwrites[interaction.user] = discord.PermissionOverwrite(read_messages=False)
+            await cog.rest.submit(
+                route("edit_channel", self.channel.id),
+                lambda: self.channel.edit(overwrites=overwrites),
+                NORMAL,
+                coalesce_key=f"overwrites:{self.channel.id}"
+            )
 
         embed_ticket = discord.Embed(
             title="❌ Ticket Ditutup",
@@ -233,7 +648,15 @@ class CloseTicketButton(Button):
         )
         embed_ticket.add_field(name="Ditutup oleh", value=interaction.user.mention, inline=True)
         embed_ticket.add_field(name="Waktu", value=f"<t:{int(datetime.utcnow().timestamp())}:f>", inline=True)
-        await self.channel.send(embed=embed_ticket, view=DeleteReopenView(self.channel, ticket_data.get("user_id")))
+        control = await cog.rest.submit(
+            route("send_message", self.channel.id),
+            lambda: self.channel.send(embed=embed_ticket, view=DeleteReopenView(self.channel, ticket_data.get("user_id"))),
+            NORMAL
+        )
+        store.update_closed(self.channel.id, control_message_id=control.id)
+        if isinstance(self.channel, discord.Thread):
+            # Archiving goes last: nothing can be posted to an archived thread.
+            await set_thread_archived(cog.rest, self.channel, True, NORMAL)
 
 class DeleteReopenView(View):
     def __init__(self, channel: discord.TextChannel, user_id):
@@ -241,76 +664,167 @@ class DeleteReopenView(View):
         self.add_item(DeleteTicketButton(channel))
         self.add_item(ReopenTicketButton(channel, user_id))
 
-class DeleteTicketButton(Button):
+class DeleteTicketButton(discord.ui.DynamicItem[Button], template=r"delete_ticket[:_](?P<channel_id>[0-9]+)"):
     def __init__(self, channel):
-        super().__init__(
+        super().__init__(Button(
             label="🗑️ Hapus Ticket",
             style=discord.ButtonStyle.danger,
-            custom_id=f"delete_ticket_{channel.id}"
-        )
+            custom_id=f"delete_ticket:{channel.id}"
+        ))
         self.channel = channel
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        return cls(resolve_ticket_channel(interaction, match))
+
+    @instrumented("delete_ticket")
     async def callback(self, interaction: discord.Interaction):
-        closed_tickets = load_closed_tickets()
-        closed = closed_tickets.get(str(self.channel.id))
+        store = get_store(interaction.client)
+        closed = store.closed.get(self.channel.id)
         guild = interaction.guild
         user = interaction.user
-        role_ids = get_ticket_roles(guild.id, closed.get("ticket_type", "")) if closed else []
-        is_handler = any(role in user.roles for role in [guild.get_role(rid) for rid in role_ids])
+        config = get_config(interaction.client, guild)
+        is_handler = closed and config.ticket_type(closed.get("ticket_type", "")).is_handler(user)
         is_owner = closed and user.id == closed.get("user_id")
         if not (user.guild_permissions.administrator or is_owner or is_handler):
             await interaction.response.send_message("❌ Hanya admin, handler, atau pemilik ticket yang dapat menghapus ticket.", ephemeral=True)
             return
         await interaction.response.send_message("🗑️ Menghapus ticket...", ephemeral=True)
-        log_channel_id = get_ticket_log_channel(interaction.guild.id)
-        log_channel = interaction.guild.get_channel(log_channel_id) if log_channel_id else None
-
-        messages = []
-        async for msg in self.channel.history(limit=100, oldest_first=True):
-            time_str = msg.created_at.strftime("[%Y-%m-%d %H:%M]")
-            author = f"{msg.author} ({msg.author.mention})"
-            content = msg.content
-            messages.append(f"{time_str} {author}: {content}")
-        transcript_str = "\n".join(messages) if messages else "No messages."
-        transcript_file = discord.File(
-            io.BytesIO(transcript_str.encode("utf-8")),
-            filename=f"transcript-{self.channel.name}.txt"
-        )
+        log_channel = config.log_channel
 
+        cog = get_cog(interaction.client)
+        rest = cog.rest
+        spool = cog.spool
         if log_channel:
+            # A failed transcript or log post must not keep the channel around.
+            try:
+                await self.post_transcript(cog, guild, log_channel, interaction.user)
+            except Exception:
+                traceback.print_exc()
+
+        try:
+            await rest.submit(
+                route("delete_channel", self.channel.id),
+                lambda: delete_ticket_channel(self.channel, "Ticket deleted"),
+                NORMAL
+            )
+        except Exception:
+            # The closed record stays, so the button can simply be pressed again.
+            traceback.print_exc()
+            try:
+                await interaction.edit_original_response(content="❌ Gagal menghapus ticket. Silakan coba lagi.")
+            except discord.HTTPException:
+                pass
+            return
+        store.pop_closed(self.channel.id)
+        if spool is not None:
+            await spool.discard(self.channel.id)
+
+    async def post_transcript(self, cog, guild, log_channel, deleted_by):
+        spool = cog.spool
+        if spool is not None and self.channel.id in spool:
+            transcript_fp, transcript_name = await spool.render(
+                self.channel.id, self.channel.name, TRANSCRIPT_FORMAT, compress=TRANSCRIPT_GZIP
+            )
+        else:
+            transcript_fp, transcript_name = await export_history(
+                self.channel, TRANSCRIPT_FORMAT, compress=TRANSCRIPT_GZIP
+            )
+        parts = []
+        try:
             embed_log = discord.Embed(
                 title=f"📁 Ticket `{self.channel.name}` dihapus",
                 color=discord.Color.blue()
             )
-            embed_log.add_field(name="Dihapus oleh", value=interaction.user.mention, inline=True)
+            embed_log.add_field(name="Dihapus oleh", value=deleted_by.mention, inline=True)
             embed_log.add_field(name="Waktu", value=f"<t:{int(datetime.utcnow().timestamp())}:f>", inline=True)
-            await log_channel.send(embed=embed_log, file=transcript_file)
 
-        closed_tickets.pop(str(self.channel.id), None)
-        save_closed_tickets(closed_tickets)
-        await self.channel.delete(reason="Ticket deleted")
-
-class ReopenTicketButton(Button):
+            size = transcript_size(transcript_fp)
+            if size <= guild.filesize_limit:
+                parts = [(transcript_fp, transcript_name)]
+            else:
+                parts = await asyncio.to_thread(
+                    split_transcript, transcript_fp, transcript_name, guild.filesize_limit, MAX_TRANSCRIPT_PARTS
+                ) or []
+                note = f"{format_bytes(size)}, dibagi menjadi {len(parts)} bagian" if parts else (
+                    f"{format_bytes(size)}, terlalu besar untuk diunggah"
+                )
+                embed_log.add_field(name="Transkrip", value=note, inline=False)
+
+            # The uploads are the heaviest calls here; let interactive work go first.
+            for index, (fp, name) in enumerate(parts or [(None, None)]):
+                file = discord.File(fp, filename=name) if fp is not None else None
+                embed = embed_log if index == 0 else None
+                await cog.rest.submit(
+                    route("send_message", log_channel.id),
+                    lambda: log_channel.send(embed=embed, file=file) if file else log_channel.send(embed=embed),
+                    BACKGROUND
+                )
+        finally:
+            transcript_fp.close()
+            for fp, _ in parts:
+                fp.close()
+
+class ReopenTicketButton(discord.ui.DynamicItem[Button], template=r"reopen_ticket:(?P<channel_id>[0-9]+)(?::(?P<user_id>[0-9]+))?"):
     def __init__(self, channel: discord.TextChannel, user_id):
-        super().__init__(label="🔁 Reopen Ticket", style=discord.ButtonStyle.secondary)
+        custom_id = f"reopen_ticket:{channel.id}:{user_id}" if user_id else f"reopen_ticket:{channel.id}"
+        super().__init__(Button(label="🔁 Reopen Ticket", style=discord.ButtonStyle.secondary, custom_id=custom_id))
         self.channel = channel
         self.user_id = user_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        user_id = int(match["user_id"]) if match["user_id"] else None
+        return cls(resolve_ticket_channel(interaction, match), user_id)
+
+    @instrumented("reopen_ticket")
     async def callback(self, interaction: discord.Interaction):
-        closed_tickets = load_closed_tickets()
-        closed = closed_tickets.get(str(self.channel.id))
+        store = get_store(interaction.client)
+        if self.channel.id in store.active:
+            await interaction.response.send_message("⚠️ Ticket ini sudah dibuka.", ephemeral=True)
+            return
+        closed = store.closed.get(self.channel.id)
         is_owner = closed and interaction.user.id == closed.get("user_id")
         if not (interaction.user.guild_permissions.administrator or is_owner):
             await interaction.response.send_message("❌ Hanya admin atau pemilik ticket yang dapat membuka kembali ticket.", ephemeral=True)
             return
         guild = interaction.guild
-        user = guild.get_member(self.user_id)
-        if user:
-            await self.channel.set_permissions(user, read_messages=True, send_messages=True)
-            await self.channel.send(f"{user.mention} Ticket telah dibuka kembali oleh {interaction.user.mention}")
-        await interaction.response.send_message("🔓 Ticket dibuka kembali!", ephemeral=True)
-        closed_tickets.pop(str(self.channel.id), None)
-        save_closed_tickets(closed_tickets)
+        cog = get_cog(interaction.client)
+        cog.members.remember(interaction.user)
+        # The owner may need a member fetch when the member cache is off.
+        await interaction.response.defer(ephemeral=True)
+        closed = closed or {}
+        owner_id = closed.get("user_id") or self.user_id
+        user = await cog.members.get(guild, owner_id) if owner_id else None
+        rest = cog.rest
+        try:
+            if isinstance(self.channel, discord.Thread):
+                await set_thread_archived(rest, self.channel, False, NORMAL)
+            else:
+                type_config = cog.config.get(guild).ticket_type(closed.get("ticket_type"))
+                ticket_overwrites = type_config.overwrites_for(user) if user else type_config.overwrites
+                overwrites = reopened_overwrites(self.channel, ticket_overwrites)
+                await rest.submit(
+                    route("edit_channel", self.channel.id),
+                    lambda: self.channel.edit(overwrites=overwrites),
+                    NORMAL,
+                    coalesce_key=f"overwrites:{self.channel.id}"
+                )
+            if user:
+                await rest.submit(
+                    route("send_message", self.channel.id),
+                    lambda: self.channel.send(f"{user.mention} Ticket telah dibuka kembali oleh {interaction.user.mention}"),
+                    NORMAL
+                )
+        except Exception:
+            # Still closed, so the button can simply be pressed again.
+            traceback.print_exc()
+            await interaction.followup.send("❌ Gagal membuka kembali ticket. Silakan coba lagi.", ephemeral=True)
+            return
+        store.pop_closed(self.channel.id)
+        store.add_active(self.channel.id, reopened_record(closed, self.channel, owner_id))
+        cog.expiry.touch(self.channel.id)
+        await interaction.followup.send("🔓 Ticket dibuka kembali!", ephemeral=True)
 
 class TicketPanelView(View):
     def __init__(self, buttons=None):
@@ -319,6 +833,17 @@ class TicketPanelView(View):
             for btn in buttons:
                 self.add_item(TicketButton(btn["label"], discord.ButtonStyle(btn["style"]), btn["custom_id"]))
 
+def register_panel_views(client, panels):
+    # Panel buttons are routed by custom_id alone, so one button per distinct
+    # ticket type serves every panel in every guild.
+    unique = {}
+    for panel in panels:
+        for btn in panel.get("buttons", []):
+            unique.setdefault(btn["custom_id"], btn)
+    buttons = list(unique.values())
+    for start in range(0, len(buttons), 25):
+        client.add_view(TicketPanelView(buttons[start:start + 25]))
+
 class TicketEmbedEditModal(Modal, title="Edit Ticket Embed"):
     def __init__(self, ticket_view_update_callback):
         super().__init__()
@@ -357,52 +882,91 @@ class Ticket(commands.Cog):
     @app_commands.command(name="checkticketban", description="Cek apakah user diblokir dari sistem ticket")
     @app_commands.checks.has_permissions(administrator=True)
     async def check_ticket_ban(self, interaction: discord.Interaction, user: discord.User):
-        guild_id = str(interaction.guild.id)
-        data = load_banned_users()
-        if guild_id in data and user.id in data[guild_id]:
-            await interaction.response.send_message(f"❌ {user.mention} sedang diblokir dari sistem tiket.", ephemeral=True)
+        if self.store.is_banned(interaction.guild.id, user.id):
+            expires_at = self.store.ban_expiry(interaction.guild.id, user.id)
+            until = f" sampai <t:{int(expires_at)}:f>" if expires_at else ""
+            await interaction.response.send_message(f"❌ {user.mention} sedang diblokir dari sistem tiket{until}.", ephemeral=True)
         else:
             await interaction.response.send_message(f"✅ {user.mention} tidak diblokir dari sistem tiket.", ephemeral=True)
 
     @app_commands.command(name="banticketuser", description="Ban user dari penggunaan sistem ticket")
     @app_commands.checks.has_permissions(administrator=True)
-    async def ban_ticket_user(self, interaction: discord.Interaction, user: discord.User):
-        guild_id = str(interaction.guild.id)
-        data = load_banned_users()
-        if guild_id not in data:
-            data[guild_id] = []
-        if user.id not in data[guild_id]:
-            data[guild_id].append(user.id)
-            save_banned_users(data)
-            await interaction.response.send_message(f"✅ {user.mention} telah diblokir dari sistem tiket.", ephemeral=True)
+    @app_commands.describe(durasi="Lama blokir, mis. 30m, 12h, 7d (kosongkan untuk permanen)")
+    async def ban_ticket_user(self, interaction: discord.Interaction, user: discord.User, durasi: str = None):
+        expires_at = None
+        if durasi:
+            seconds = parse_duration(durasi)
+            if seconds is None:
+                await interaction.response.send_message("❌ Format durasi tidak valid. Contoh: `30m`, `12h`, `7d`.", ephemeral=True)
+                return
+            expires_at = time.time() + seconds
+        if self.store.ban(interaction.guild.id, user.id, expires_at):
+            until = f" sampai <t:{int(expires_at)}:f>" if expires_at else ""
+            await interaction.response.send_message(f"✅ {user.mention} telah diblokir dari sistem tiket{until}.", ephemeral=True)
         else:
             await interaction.response.send_message("⚠️ User sudah diblokir sebelumnya.", ephemeral=True)
 
     @app_commands.command(name="unbanticketuser", description="Unban user dari sistem ticket")
     @app_commands.checks.has_permissions(administrator=True)
     async def unban_ticket_user(self, interaction: discord.Interaction, user: discord.User):
-        guild_id = str(interaction.guild.id)
-        data = load_banned_users()
-        if guild_id in data and user.id in data[guild_id]:
-            data[guild_id].remove(user.id)
-            save_banned_users(data)
+        if self.store.unban(interaction.guild.id, user.id):
             await interaction.response.send_message(f"✅ {user.mention} telah diizinkan kembali menggunakan sistem tiket.", ephemeral=True)
         else:
             await interaction.response.send_message("⚠️ User ini tidak diblokir.", ephemeral=True)
 
+    @app_commands.command(name="importticketbans", description="Blokir banyak user sekaligus dari file daftar ID")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.describe(
+        file="File teks berisi satu user ID per baris (opsional diikuti waktu kedaluwarsa unix)",
+        durasi="Lama blokir untuk semua user, mis. 7d (menimpa waktu di file)"
+    )
+    async def import_ticket_bans(self, interaction: discord.Interaction, file: discord.Attachment, durasi: str = None):
+        if file.size > BAN_IMPORT_MAX_BYTES:
+            await interaction.response.send_message("❌ File terlalu besar.", ephemeral=True)
+            return
+        override = None
+        if durasi:
+            seconds = parse_duration(durasi)
+            if seconds is None:
+                await interaction.response.send_message("❌ Format durasi tidak valid. Contoh: `30m`, `12h`, `7d`.", ephemeral=True)
+                return
+            override = time.time() + seconds
+        await interaction.response.defer(ephemeral=True)
+        entries = parse_ban_list((await file.read()).decode("utf-8", errors="ignore"))
+        if override is not None:
+            entries = [(user_id, override) for user_id, _ in entries]
+        now = time.time()
+        entries = [(user_id, expires_at) for user_id, expires_at in entries if expires_at is None or expires_at > now]
+        added = self.store.ban_many(interaction.guild.id, entries)
+        await interaction.followup.send(
+            f"✅ {added} user diblokir dari {len(entries)} ID di file ({len(entries) - added} sudah diblokir).",
+            ephemeral=True
+        )
+
+    @app_commands.command(name="exportticketbans", description="Ekspor daftar user yang diblokir dari sistem ticket")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def export_ticket_bans(self, interaction: discord.Interaction):
+        bans = self.store.export_bans(interaction.guild.id)
+        if not bans:
+            await interaction.response.send_message("⚠️ Tidak ada user yang diblokir.", ephemeral=True)
+            return
+        payload = "".join(
+            f"{user_id}\n" if expires_at is None else f"{user_id} {int(expires_at)}\n"
+            for user_id, expires_at in bans
+        )
+        file = discord.File(io.BytesIO(payload.encode("utf-8")), filename=f"ticket_bans-{interaction.guild.id}.txt")
+        await interaction.response.send_message(f"📄 {len(bans)} user diblokir.", file=file, ephemeral=True)
+
     @app_commands.command(name="reorderticketbutton", description="Ubah urutan tombol dalam panel ticket")
     @app_commands.checks.has_permissions(administrator=True)
     @app_commands.describe(custom_id="ID tombol yang ingin dipindah", position="Posisi baru (mulai dari 0)")
     async def reorder_ticket_button(self, interaction: discord.Interaction, custom_id: str, position: int):
-        guild_id = str(interaction.guild.id)
-        data = load_ticket_buttons()
-        if guild_id not in data:
+        panel = self.store.get_panel(interaction.guild.id)
+        if not panel:
             await interaction.response.send_message("❌ Belum ada panel ticket untuk server ini.", ephemeral=True)
             return
 
-        buttons = data[guild_id].get("buttons", [])
-        message_id = data[guild_id].get("message_id")
-        channel_id = data[guild_id].get("channel_id")
+        buttons = panel.get("buttons", [])
 
         target = next((btn for btn in buttons if btn["custom_id"] == custom_id), None)
         if not target:
@@ -413,52 +977,40 @@ class Ticket(commands.Cog):
         position = max(0, min(position, len(buttons))) 
         buttons.insert(position, target)
 
-        data[guild_id]["buttons"] = buttons
-        save_ticket_buttons(data)
+        panel["buttons"] = buttons
+        self.store.update_panel(interaction.guild.id)
 
-        channel = interaction.guild.get_channel(channel_id)
-        try:
-            message = await channel.fetch_message(message_id)
-        except discord.NotFound:
-            del data[guild_id]
-            save_ticket_buttons(data)
+        if not await edit_panel_message(self.store, interaction.guild, view=TicketPanelView(buttons)):
             await interaction.response.send_message("❌ Panel tidak ditemukan. Data dihapus dari penyimpanan.", ephemeral=True)
             return
 
-        await message.edit(view=TicketPanelView(buttons))
         await interaction.response.send_message("✅ Urutan tombol berhasil diperbarui.", ephemeral=True)
 
     @app_commands.command(name="resetticketpanel", description="Hapus semua tombol dan data panel ticket untuk server ini")
     @app_commands.checks.has_permissions(administrator=True)
     async def reset_ticket_panel(self, interaction: discord.Interaction):
-        guild_id = str(interaction.guild.id)
-        data = load_ticket_buttons()
-        if guild_id not in data:
+        if not self.store.remove_panel(interaction.guild.id):
             await interaction.response.send_message("⚠️ Tidak ada data panel ticket yang tersimpan untuk server ini.", ephemeral=True)
             return
 
-        del data[guild_id]
-        save_ticket_buttons(data)
         await interaction.response.send_message("✅ Data panel ticket berhasil dihapus dari penyimpanan.", ephemeral=True)
 
     @app_commands.command(name="listticketbuttons", description="Lihat semua tombol aktif di panel ticket")
     @app_commands.checks.has_permissions(administrator=True)
     async def list_ticket_buttons(self, interaction: discord.Interaction):
-        guild_id = str(interaction.guild.id)
-        data = load_ticket_buttons()
-        if guild_id not in data or not data[guild_id].get("buttons"):
+        panel = self.store.get_panel(interaction.guild.id)
+        if not panel or not panel.get("buttons"):
             await interaction.response.send_message("⚠️ Tidak ada tombol yang tersimpan untuk server ini.", ephemeral=True)
             return
 
-        buttons = data[guild_id].get("buttons", [])
+        buttons = panel.get("buttons", [])
         if not buttons:
             await interaction.response.send_message("⚠️ Tidak ada tombol aktif ditemukan.", ephemeral=True)
             return
 
         content = "**Daftar Tombol Tiket:**\n"
         for i, btn in enumerate(buttons, 1):
-            role_ids = get_ticket_roles(interaction.guild.id, btn["custom_id"])
-            roles = [interaction.guild.get_role(rid) for rid in role_ids if interaction.guild.get_role(rid)]
+            roles = self.config.get(interaction.guild).ticket_type(btn["custom_id"]).roles
             role_mentions = ", ".join(role.mention for role in roles) if roles else "*Tidak ada handler*"
             content += (
                 f"{i}. Label: `{btn['label']}`, ID: `{btn['custom_id']}`, "
@@ -471,131 +1023,414 @@ class Ticket(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def edit_ticket_embed(self, interaction: discord.Interaction):
         async def update_ticket_embed(interaction, title, description, footer):
-            guild_id = str(interaction.guild.id)
-            data = load_ticket_buttons()
-            if guild_id not in data:
+            panel = self.store.get_panel(interaction.guild.id)
+            if not panel:
                 await interaction.response.send_message("❌ Tidak ada data panel ticket untuk server ini.", ephemeral=True)
                 return
 
-            message_id = data[guild_id].get("message_id")
-            channel_id = data[guild_id].get("channel_id")
-            buttons = data[guild_id].get("buttons", [])
-
-            channel = interaction.guild.get_channel(channel_id)
-            try:
-                message = await channel.fetch_message(message_id)
-            except discord.NotFound:
-                del data[guild_id]
-                save_ticket_buttons(data)
-                await interaction.response.send_message("❌ Panel tidak ditemukan. Data dihapus dari penyimpanan.", ephemeral=True)
-                return
+            buttons = panel.get("buttons", [])
 
             embed = discord.Embed(title=title, description=description, color=discord.Color.blue())
             embed.set_footer(text=footer)
 
-            await message.edit(embed=embed, view=TicketPanelView(buttons))
+            if not await edit_panel_message(self.store, interaction.guild, embed=embed, view=TicketPanelView(buttons)):
+                await interaction.response.send_message("❌ Panel tidak ditemukan. Data dihapus dari penyimpanan.", ephemeral=True)
+                return
             await interaction.response.send_message("✅ Embed berhasil diperbarui.", ephemeral=True)
 
         await interaction.response.send_modal(TicketEmbedEditModal(update_ticket_embed))
 
     def __init__(self, bot):
         self.bot = bot
-        self.ticket_expire_loop.start()
+        cluster_id = ClusterConfig.from_env().cluster_id
+        self.metrics = Metrics.from_env(port_offset=cluster_id)
+        self.loop_monitor = LoopMonitor.from_env(name=f"loop-c{cluster_id}", metrics=self.metrics)
+        self.store = TicketStore(create_storage(), metrics=self.metrics)
+        self.expiry = DeadlineScheduler(AUTO_EXPIRE_SECONDS)
+        self.expire_task = None
+        self.restore_task = None
+        self.spool = TranscriptSpool(TRANSCRIPT_SPOOL_DIR) if LIVE_TRANSCRIPT else None
+        self.rest = RestScheduler(metrics=self.metrics)
+        self.admission = AdmissionController.from_env(metrics=self.metrics)
+        self.config = TicketConfigCache()
+        self.categories = CategoryPool(self.rest)
+        self.members = MemberResolver(self.rest)
+        self.stats = TicketStats(stats_file())
+        self.register_gauges()
+
+    def register_gauges(self):
+        gauge = self.metrics.gauge
+        gauge("ticket_active", lambda: len(self.store.active), "Ticket aktif")
+        gauge("ticket_closed", lambda: len(self.store.closed), "Ticket tertutup yang belum dihapus")
+        gauge("ticket_expiry_scheduled", lambda: len(self.expiry), "Ticket yang menunggu auto-expire")
+        gauge("ticket_rest_pending", self.rest.pending, "Panggilan REST di antrean")
+        gauge("ticket_admission_queued", lambda: len(self.admission), "Permintaan ticket di antrean admission")
+        gauge("ticket_member_cache", lambda: len(self.members), "Member di cache MemberResolver")
+        gauge("process_resident_memory_bytes", rss_bytes, "RSS proses")
+
+    async def cog_load(self):
+        if self.metrics.port is not None:
+            await self.metrics.start_server()
+            print(f"📈 Metrik Prometheus di http://{self.metrics.host}:{self.metrics.port}/metrics")
+        if self.loop_monitor is not None:
+            self.loop_monitor.start()
+            print(f"🩺 Monitor event loop aktif (ambang {self.loop_monitor.threshold * 1000:.0f}ms, laporan di {self.loop_monitor.report_dir})")
+        await self.store.load()
+        await self.stats.load()
+        if self.spool is not None:
+            await asyncio.to_thread(self.spool.load)
+        for ch_id, data in self.store.active.items():
+            self.expiry.touch(ch_id, last_activity_of(data))
+        self.started = False
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # on_ready fires again after every reconnect; startup work runs once.
+        if self.started:
+            return
+        self.started = True
+        self.reconcile_tickets()
+        self.expire_task = asyncio.create_task(self.ticket_expire_loop())
+        # Runs in the background so ticket clicks are served meanwhile.
+        self.restore_task = asyncio.create_task(self.restore_closed_ticket_views())
+        await self.verify_panels()
+
+    def reconcile_tickets(self):
+        # One pass over the gateway caches; no REST call per ticket.
+        report = reconcile(
+            self.bot, self.store, self.config, REASON_MAP, owns_all_guilds=not ClusterConfig.from_env().enabled
+        )
+        for ch_id in report.purged_active:
+            self.expiry.discard(ch_id)
+        for ch_id in report.rebuilt + report.adopted:
+            if ch_id in self.store.active:
+                self.expiry.touch(ch_id, last_activity_of(self.store.active[ch_id]))
+        if self.spool is not None:
+            for ch_id in report.purged_active + report.purged_closed:
+                asyncio.create_task(self.spool.discard(ch_id))
+        if report:
+            print(f"[ticket] Rekonsiliasi: {report.summary()}")
+        return report
+
+    async def verify_panels(self):
+        for guild_id, panel in list(self.store.panels.items()):
+            channel = self.bot.get_channel(panel.get("channel_id"))
+            if channel is None:
+                self.store.remove_panel(guild_id)
+                continue
+            try:
+                await self.rest.submit(
+                    route("get_message", channel.id),
+                    lambda: channel.fetch_message(panel["message_id"]),
+                    BACKGROUND
+                )
+            except discord.NotFound:
+                self.store.remove_panel(guild_id)
+            except discord.HTTPException:
+                pass
 
 
     async def restore_closed_ticket_views(self):
-        await self.bot.wait_until_ready()
-        closed_tickets = load_closed_tickets()
-        for ch_id, data in closed_tickets.items():
-            channel = self.bot.get_channel(int(ch_id))
-            if channel:
+        # Closed tickets whose control message id is recorded are skipped
+        # without a fetch; the rest are checked by a few workers so startup
+        # cost does not grow one round trip at a time.
+        started = time.perf_counter()
+        pending = [ch_id for ch_id, data in self.store.closed.items() if not data.get("control_message_id")]
+        progress = {"checked": 0, "restored": 0, "found": 0, "missing": 0, "failed": 0}
+        total = len(pending)
+        queue = asyncio.Queue()
+        for ch_id in pending:
+            queue.put_nowait(ch_id)
+
+        async def worker():
+            while not queue.empty():
+                ch_id = queue.get_nowait()
                 try:
-                    last_msg = [msg async for msg in channel.history(limit=1)][0]
-                    has_view = last_msg.components and any(
-                        c['type'] == 1 for c in last_msg.components
-                    )
+                    progress[await self.restore_closed_ticket_view(ch_id)] += 1
                 except Exception:
-                    has_view = False
-                if not has_view:
-                    embed_ticket = discord.Embed(
-                        title="❌ Ticket Ditutup",
-                        color=discord.Color.red(),
-                        description="Ticket telah ditutup dan channel dikunci sebagai arsip."
-                    )
-                    user_id = data.get("user_id")
-                    embed_ticket.add_field(name="Ditutup oleh", value=f"<@{data.get('closed_by')}>", inline=True)
-                    embed_ticket.add_field(name="Waktu", value=f"<t:{int(datetime.utcnow().timestamp())}:f>", inline=True)
-                    await channel.send(embed=embed_ticket, view=DeleteReopenView(channel, user_id))
+                    progress["failed"] += 1
+                    traceback.print_exc()
+                progress["checked"] += 1
+                if progress["checked"] % RESTORE_PROGRESS_EVERY == 0:
+                    print(f"[ticket] Pemulihan tombol: {progress['checked']}/{total}")
+
+        await asyncio.gather(*(worker() for _ in range(min(RESTORE_CONCURRENCY, total))))
+        skipped = len(self.store.closed) - total
+        print(
+            f"[ticket] Pemulihan tombol selesai dalam {time.perf_counter() - started:.1f}s: "
+            f"{progress['restored']} dikirim ulang, {progress['found']} ditemukan, "
+            f"{progress['missing']} channel hilang, {progress['failed']} gagal, {skipped} dilewati"
+        )
+
+    async def restore_closed_ticket_view(self, ch_id):
+        data = self.store.closed.get(ch_id)
+        channel = self.bot.get_channel(ch_id)
+        if data is None or channel is None:
+            return "missing"
+        messages = await self.rest.submit(
+            route("get_messages", ch_id),
+            lambda: latest_messages(channel, 1),
+            BACKGROUND
+        )
+        if messages and has_ticket_controls(messages[0]):
+            self.store.update_closed(ch_id, control_message_id=messages[0].id)
+            return "found"
+
+        closed_by = data.get("closed_by")
+        embed_ticket = discord.Embed(
+            title="❌ Ticket Ditutup",
+            color=discord.Color.red(),
+            description="Ticket telah ditutup dan channel dikunci sebagai arsip."
+        )
+        embed_ticket.add_field(name="Ditutup oleh", value=f"<@{closed_by}>" if isinstance(closed_by, int) else str(closed_by), inline=True)
+        embed_ticket.add_field(name="Waktu", value=f"<t:{int(datetime.utcnow().timestamp())}:f>", inline=True)
+        message = await self.rest.submit(
+            route("send_message", ch_id),
+            lambda: channel.send(embed=embed_ticket, view=DeleteReopenView(channel, data.get("user_id"))),
+            BACKGROUND
+        )
+        self.store.update_closed(ch_id, control_message_id=message.id)
+        return "restored"
 
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def setticketcategory(self, ctx, category: discord.CategoryChannel):
         set_ticket_category(ctx.guild.id, category.id)
+        self.config.invalidate(ctx.guild.id)
         await ctx.send(f"Kategori ticket di-set ke {category.mention}")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def setticketlog(self, ctx, channel: discord.TextChannel):
         set_ticket_log_channel(ctx.guild.id, channel.id)
+        self.config.invalidate(ctx.guild.id)
         await ctx.send(f"Log channel ticket di-set ke {channel.mention}")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def addticketrole(self, ctx, tipe: str, role: discord.Role):
         add_ticket_role(ctx.guild.id, tipe, role.id)
+        self.config.invalidate(ctx.guild.id)
         await ctx.send(f"Role {role.mention} ditambahkan sebagai handler ticket tipe `{tipe}`.")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def removeticketrole(self, ctx, tipe: str, role: discord.Role):
         remove_ticket_role(ctx.guild.id, tipe, role.id)
+        self.config.invalidate(ctx.guild.id)
         await ctx.send(f"Role {role.mention} dihapus dari handler ticket tipe `{tipe}`.")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def listticketrole(self, ctx, tipe: str):
-        role_ids = get_ticket_roles(ctx.guild.id, tipe)
-        if not role_ids:
-            await ctx.send(f"Tidak ada role handler untuk ticket tipe `{tipe}`.")
-            return
-        roles = [ctx.guild.get_role(rid) for rid in role_ids if ctx.guild.get_role(rid)]
-        if not roles:
+        type_config = self.config.get(ctx.guild).ticket_type(tipe)
+        if not type_config.roles:
             await ctx.send(f"Tidak ada role handler valid untuk ticket tipe `{tipe}`.")
             return
-        role_mentions = " ".join(role.mention for role in roles)
-        await ctx.send(f"Role handler untuk ticket tipe `{tipe}`:{role_mentions}")
+        await ctx.send(f"Role handler untuk ticket tipe `{tipe}`:{type_config.mentions}")
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.config.channel_deleted(channel)
+        self.categories.channel_deleted(channel)
+        self.store.pop_active(channel.id)
+        self.store.pop_closed(channel.id)
+        self.expiry.discard(channel.id)
+        self.store.remove_panels_in_channel(channel.id)
+        if self.spool is not None:
+            await self.spool.discard(channel.id)
+
+    @commands.Cog.listener()
+    async def on_raw_thread_delete(self, payload):
+        self.store.pop_active(payload.thread_id)
+        self.store.pop_closed(payload.thread_id)
+        self.expiry.discard(payload.thread_id)
+        if self.spool is not None:
+            await self.spool.discard(payload.thread_id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        self.categories.channel_created(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        self.categories.channel_moved(before, after)
+        data = self.store.active.get(after.id)
+        if data is not None and not is_complete(data):
+            type_roles = type_roles_for(self.store, self.config, after.guild)
+            self.store.add_active(after.id, rebuild_metadata(after, data, REASON_MAP, type_roles))
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.config.role_deleted(role)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.config.invalidate(guild.id)
+
+    def record_deleted(self, channel_id, message_id, cached_message):
+        if self.spool is None or channel_id not in self.spool:
+            return
+        if cached_message is not None:
+            record = message_record(cached_message, event="delete")
+        else:
+            record = {"event": "delete", "id": message_id, "created_at": "", "author": "unknown", "content": ""}
+        record["created_at"] = datetime.now(timezone.utc).isoformat()
+        self.spool.record(channel_id, record)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.store.remove_panel_by_message(payload.message_id)
+        self.record_deleted(payload.channel_id, payload.message_id, payload.cached_message)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        cached = {msg.id: msg for msg in payload.cached_messages}
+        for message_id in payload.message_ids:
+            self.store.remove_panel_by_message(message_id)
+            self.record_deleted(payload.channel_id, message_id, cached.get(message_id))
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        if self.spool is None or payload.channel_id not in self.spool:
+            return
+        # Embed-only updates (link unfurls) carry no content and are not edits.
+        if "content" not in payload.data:
+            return
+        self.spool.record(payload.channel_id, raw_message_record(payload.data, "edit"))
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.guild is None:
+            return
+        # Most messages are outside tickets; only spooled channels pay for
+        # building a transcript record.
+        if self.spool is not None and message.channel.id in self.spool:
+            self.spool.record(message.channel.id, message_record(message))
+        if message.author.bot:
+            return
+        data = self.store.active.get(message.channel.id)
+        if data is None:
+            return
+        now = time.time()
+        data["last_activity"] = now
+        self.store.mark_dirty("active", message.channel.id)
+        self.expiry.touch(message.channel.id, now)
+
+    async def cog_unload(self):
+        # Let the background loops unwind before the REST scheduler and the
+        # store shut down underneath them.
+        tasks = [task for task in (self.expire_task, self.restore_task) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.spool is not None:
+            await self.spool.close()
+        self.categories.close()
+        await self.admission.close()
+        await self.rest.close()
+        await self.stats.close()
+        await self.store.close()
+        if self.loop_monitor is not None:
+            await self.loop_monitor.close()
+        await self.metrics.close()
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        # Runs before every app command of this cog, in the task that runs the
+        # command; the completion or error hook below records the duration.
+        if interaction.command is not None:
+            tag_handler(interaction.command.qualified_name)
+        if self.metrics.enabled:
+            interaction.extras["ticket_started"] = time.perf_counter()
+        return True
+
+    def record_command(self, interaction, outcome):
+        started = interaction.extras.pop("ticket_started", None)
+        if started is None or interaction.command is None:
+            return
+        self.metrics.observe(
+            "ticket_handler_seconds",
+            time.perf_counter() - started,
+            handler=interaction.command.qualified_name,
+            outcome=outcome
+        )
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction, command):
+        self.record_command(interaction, "ok")
 
-    def cog_unload(self):
-        self.ticket_expire_loop.cancel()
+    async def cog_app_command_error(self, interaction: discord.Interaction, error):
+        self.record_command(interaction, "error")
 
-    @tasks.loop(minutes=30)
     async def ticket_expire_loop(self):
-        now = datetime.utcnow()
-        to_close = []
-        for ch_id, data in active_tickets.items():
-            opened = datetime.fromisoformat(data["opened_at"])
-            if (now - opened).total_seconds() > AUTO_EXPIRE_SECONDS:
-                to_close.append(ch_id)
-        for ch_id in to_close:
+        async for ch_id in self.expiry.due():
+            if ch_id not in self.store.active:
+                continue
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                await self.expire_ticket(ch_id)
+                outcome = "ok"
+            except Exception:
+                traceback.print_exc()
+                # The ticket is still active; try again later instead of
+                # leaving it open with no deadline.
+                if ch_id in self.store.active and ch_id not in self.expiry:
+                    self.expiry.touch(ch_id, time.time() - AUTO_EXPIRE_SECONDS + EXPIRE_RETRY_SECONDS)
+            self.metrics.observe("ticket_expire_seconds", time.perf_counter() - started, outcome=outcome)
+
+    async def expire_ticket(self, ch_id):
+        # The active record is only replaced by the closed one once Discord
+        # has the notice and the locked channel, so a failure can be retried.
+        ticket_data = dict(self.store.active.get(ch_id) or {})
+        guild = self.bot.get_guild(ticket_data["guild_id"]) if ticket_data.get("guild_id") else None
+        if guild is None:
             channel = self.bot.get_channel(ch_id)
-            if channel:
-                await channel.send("⏰ Ticket ini telah otomatis ditutup karena tidak ada aktivitas selama 3 hari.")
-                await channel.edit(overwrites={role: discord.PermissionOverwrite(read_messages=False)
-                                               for role in channel.overwrites})
-                await channel.send(view=DeleteReopenView(channel, None))
-                ticket_data = active_tickets.pop(ch_id)
-                ticket_data.update({
-                    "closed_at": datetime.utcnow().isoformat(),
-                    "closed_by": "auto-expire"
-                })
-                save_ticket_log(ticket_data)
+        elif guild.unavailable:
+            raise RuntimeError(f"Guild {guild.id} belum tersedia, ticket {ch_id} dicoba lagi nanti")
+        else:
+            channel = await find_ticket_channel(self.rest, guild, ch_id, ticket_data, BACKGROUND)
+        if channel is None:
+            self.store.pop_active(ch_id)
+            return
+        # Expiry is housekeeping: queue it behind interactive work and send
+        # the notice together with the controls in one message.
+        control = await self.rest.submit(
+            route("send_message", ch_id),
+            lambda: channel.send(
+                "⏰ Ticket ini telah otomatis ditutup karena tidak ada aktivitas selama 3 hari.",
+                view=DeleteReopenView(channel, ticket_data.get("user_id"))
+            ),
+            BACKGROUND
+        )
+        if isinstance(channel, discord.Thread):
+            await set_thread_archived(self.rest, channel, True, BACKGROUND)
+        else:
+            overwrites = {role: discord.PermissionOverwrite(read_messages=False) for role in channel.overwrites}
+            await self.rest.submit(
+                route("edit_channel", ch_id),
+                lambda: channel.edit(overwrites=overwrites),
+                BACKGROUND,
+                coalesce_key=f"overwrites:{ch_id}"
+            )
+        if self.store.pop_active(ch_id) is None:
+            # Closed by hand while the notice was queued.
+            return
+        ticket_data.update({
+            "closed_at": datetime.utcnow().isoformat(),
+            "closed_by": "auto-expire"
+        })
+        await self.store.append_log(ticket_data)
+        record_ticket_close(self.stats, channel.guild.id, ticket_data)
+        record = closed_record(ticket_data, channel.guild.id, "auto-expire")
+        record["control_message_id"] = control.id
+        self.store.add_closed(ch_id, record)
 
     @app_commands.command(name="sendticketpanel", description="Kirim panel ticket ke channel ini")
     @app_commands.checks.has_permissions(administrator=True)
     async def send_ticket_panel(self, interaction: discord.Interaction):
-        guild_id = str(interaction.guild.id)
-        data = load_ticket_buttons()
-        buttons = data.get(guild_id, {}).get("buttons", [])
+        panel = self.store.get_panel(interaction.guild.id) or {}
+        buttons = panel.get("buttons", [])
 
         view = TicketPanelView(buttons)
         embed = discord.Embed(
@@ -606,12 +1441,11 @@ class Ticket(commands.Cog):
         embed.set_footer(text="KirikuDev Ticket system")
         message = await interaction.channel.send(embed=embed, view=view)
 
-        data[guild_id] = {
+        self.store.set_panel(interaction.guild.id, {
             "message_id": message.id,
             "channel_id": message.channel.id,
             "buttons": buttons
-        }
-        save_ticket_buttons(data)
+        })
         await interaction.response.send_message("✅ Panel ticket berhasil dikirim.", ephemeral=True)
 
     @app_commands.command(name="editticketbutton", description="Edit tombol ticket")
@@ -630,25 +1464,13 @@ class Ticket(commands.Cog):
         style: str,
         custom_id: str
     ):
-        guild_id = str(interaction.guild.id)
-        data = load_ticket_buttons()
-        if guild_id not in data:
+        panel = self.store.get_panel(interaction.guild.id)
+        if not panel:
             await interaction.response.send_message("❌ Belum ada panel yang dikirim.", ephemeral=True)
             return
 
-        buttons = data[guild_id].get("buttons", [])
-        message_id = data[guild_id]["message_id"]
-        channel_id = data[guild_id]["channel_id"]
-
-        channel = interaction.guild.get_channel(channel_id)
-        try:
-            message = await channel.fetch_message(message_id)
-        except discord.NotFound:
-            del data[guild_id]
-            save_ticket_buttons(data)
-            await interaction.response.send_message("❌ Panel ticket sudah dihapus dari Discord. Data telah dibersihkan.", ephemeral=True)
-            return
-
+        buttons = panel.get("buttons", [])
+        previous = next((btn for btn in buttons if btn["custom_id"] == custom_id), {})
         buttons = [btn for btn in buttons if btn["custom_id"] != custom_id]
 
         if action.lower() in ["add", "edit"]:
@@ -658,18 +1480,194 @@ class Ticket(commands.Cog):
                 "success": 3,
                 "danger": 4
             }
-            buttons.append({
+            button = {
                 "label": label,
                 "style": style_map.get(style.lower(), 2),
                 "custom_id": custom_id
-            })
-
-        data[guild_id]["buttons"] = buttons
-        save_ticket_buttons(data)
+            }
+            if previous.get("mode"):
+                button["mode"] = previous["mode"]
+            buttons.append(button)
+            register_panel_views(self.bot, [{"buttons": buttons}])
 
         new_view = TicketPanelView(buttons)
-        await message.edit(view=new_view)
+        if not await edit_panel_message(self.store, interaction.guild, view=new_view):
+            await interaction.response.send_message("❌ Panel ticket sudah dihapus dari Discord. Data telah dibersihkan.", ephemeral=True)
+            return
+
+        panel["buttons"] = buttons
+        self.store.update_panel(interaction.guild.id)
         await interaction.response.send_message("✅ Tombol berhasil diperbarui.", ephemeral=True)
 
+    @app_commands.command(name="ticketstats", description="Statistik ticket server ini")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.describe(tipe="Filter waktu penyelesaian per tipe ticket (opsional)")
+    async def ticket_stats(self, interaction: discord.Interaction, tipe: str = None):
+        stats = self.stats.get(interaction.guild.id)
+        if stats is None:
+            await interaction.response.send_message("⚠️ Belum ada statistik ticket untuk server ini.", ephemeral=True)
+            return
+
+        sketch = stats.time_to_close_by_type.get(tipe) if tipe else stats.time_to_close
+        if sketch is None:
+            await interaction.response.send_message(f"⚠️ Belum ada ticket tipe `{tipe}` yang ditutup.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="📊 Statistik Ticket", color=discord.Color.blue())
+        embed.add_field(name="Dibuka", value=str(stats.opened), inline=True)
+        embed.add_field(name="Ditutup", value=str(stats.closed), inline=True)
+        embed.add_field(name="Auto-expire", value=str(stats.auto_closed), inline=True)
+        opened_24h, closed_24h = stats.volume(24)
+        opened_7d, closed_7d = stats.volume(24 * 7)
+        embed.add_field(name="24 jam terakhir", value=f"{opened_24h} dibuka / {closed_24h} ditutup", inline=True)
+        embed.add_field(name="7 hari terakhir", value=f"{opened_7d} dibuka / {closed_7d} ditutup", inline=True)
+        label = f" (`{tipe}`)" if tipe else ""
+        embed.add_field(
+            name=f"Waktu penyelesaian{label}",
+            value=(
+                f"p50: {format_duration(sketch.quantile(0.5))}\n"
+                f"p90: {format_duration(sketch.quantile(0.9))}\n"
+                f"p99: {format_duration(sketch.quantile(0.99))}"
+            ),
+            inline=False
+        )
+        top_types = sorted(stats.by_type.items(), key=lambda item: item[1], reverse=True)[:5]
+        if top_types:
+            embed.add_field(name="Per tipe", value="\n".join(f"`{name}`: {count}" for name, count in top_types), inline=True)
+        top_handlers = sorted(stats.by_handler.items(), key=lambda item: item[1], reverse=True)[:5]
+        if top_handlers:
+            embed.add_field(name="Handler teratas", value="\n".join(f"<@{uid}>: {count}" for uid, count in top_handlers), inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="ticketmetrics", description="Ringkasan metrik performa bot ticket")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def ticket_metrics(self, interaction: discord.Interaction):
+        metrics = self.metrics
+        if not metrics.enabled:
+            await interaction.response.send_message("⚠️ Metrik tidak aktif. Set `TICKET_METRICS=1` atau `TICKET_METRICS_PORT`.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="📈 Metrik Ticket", color=discord.Color.blue())
+        # handler -> [calls, errors, histogram of successful calls]
+        handlers = {}
+        for key, histogram in metrics.histograms.get("ticket_handler_seconds", {}).items():
+            labels = dict(key)
+            entry = handlers.setdefault(labels["handler"], [0, 0, None])
+            entry[0] += histogram.count
+            if labels.get("outcome") == "ok":
+                entry[2] = histogram
+            else:
+                entry[1] += histogram.count
+        top_handlers = sorted(handlers.items(), key=lambda item: item[1][0], reverse=True)[:8]
+        if top_handlers:
+            embed.add_field(
+                name="Handler (n, p50, p99, error)",
+                value="\n".join(
+                    f"`{name}`: {count}, {format_ms(ok and ok.quantile(0.5))}, {format_ms(ok and ok.quantile(0.99))}, {errors}"
+                    for name, (count, errors, ok) in top_handlers
+                ),
+                inline=False
+            )
+
+        calls = metrics.counters.get("ticket_rest_requests_total", {})
+        limited = metrics.counters.get("ticket_rest_rate_limited_total", {})
+        top_routes = sorted(calls.items(), key=lambda item: item[1], reverse=True)[:6]
+        rest_lines = [f"Total {sum(calls.values())} panggilan, {sum(limited.values())} kena 429, {self.rest.pending()} antre"]
+        rest_lines += [f"`{dict(key)['route']}`: {count} ({limited.get(key, 0)} x 429)" for key, count in top_routes]
+        embed.add_field(name="REST", value="\n".join(rest_lines), inline=False)
+
+        def timing(name, **labels):
+            histogram = metrics.histograms.get(name, {}).get(tuple(sorted(labels.items())))
+            if histogram is None:
+                return "-"
+            return f"{histogram.count}x, p50 {format_ms(histogram.quantile(0.5))}, p99 {format_ms(histogram.quantile(0.99))}"
+
+        embed.add_field(
+            name="I/O & expire",
+            value=(
+                f"Flush store: {timing('ticket_store_flush_seconds')}\n"
+                f"Tulis log: {timing('ticket_log_append_seconds')}\n"
+                f"Auto-expire: {timing('ticket_expire_seconds', outcome='ok')}"
+            ),
+            inline=False
+        )
+        admissions = {dict(key)["result"]: count for key, count in metrics.counters.get("ticket_admission_total", {}).items()}
+        embed.add_field(
+            name="Admission",
+            value=(
+                f"{admissions.get('admitted', 0)} diterima, {admissions.get('queued', 0)} antre, "
+                f"{admissions.get('rejected_user', 0)} ditolak (per user), "
+                f"{admissions.get('shed_queue', 0) + admissions.get('shed_timeout', 0)} dibuang, {len(self.admission)} menunggu\n"
+                f"Tunggu antrean: {timing('ticket_admission_wait_seconds')}"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Status",
+            value=(
+                f"{len(self.store.active)} aktif, {len(self.store.closed)} tertutup, "
+                f"{len(self.expiry)} terjadwal expire, RSS {format_bytes(rss_bytes())}"
+            ),
+            inline=False
+        )
+        monitor = self.loop_monitor
+        if monitor is not None:
+            embed.add_field(
+                name="Event loop",
+                value=(
+                    f"lag p99 {format_ms(monitor.lag.quantile(0.99))}, maks {format_ms(monitor.max_lag)}, "
+                    f"{monitor.total_stalls} stall >= {format_ms(monitor.threshold)}"
+                ),
+                inline=False
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="reconcileticket", description="Cocokkan data ticket dengan channel yang ada di Discord")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def reconcile_ticket(self, interaction: discord.Interaction):
+        report = self.reconcile_tickets()
+        await interaction.response.send_message(f"🔧 Rekonsiliasi selesai: {report.summary()}.", ephemeral=True)
+
+    @app_commands.command(name="setticketmode", description="Atur ticket dibuka sebagai channel atau private thread")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.describe(
+        mode="channel / thread",
+        custom_id="ID tombol (kosongkan untuk semua tipe ticket)",
+        parent="Channel induk untuk thread (default: channel panel)"
+    )
+    async def set_ticket_mode(
+        self,
+        interaction: discord.Interaction,
+        mode: str,
+        custom_id: str = None,
+        parent: discord.TextChannel = None
+    ):
+        mode = mode.lower()
+        if mode not in ("channel", "thread"):
+            await interaction.response.send_message("❌ Mode harus `channel` atau `thread`.", ephemeral=True)
+            return
+        panel = self.store.get_panel(interaction.guild.id)
+        if not panel:
+            await interaction.response.send_message("❌ Belum ada panel yang dikirim.", ephemeral=True)
+            return
+
+        if custom_id:
+            button = next((btn for btn in panel.get("buttons", []) if btn["custom_id"] == custom_id), None)
+            if button is None:
+                await interaction.response.send_message("❌ Tombol dengan ID tersebut tidak ditemukan.", ephemeral=True)
+                return
+            button["mode"] = mode
+        else:
+            panel["mode"] = mode
+        if parent is not None:
+            panel["thread_parent_id"] = parent.id
+        self.store.update_panel(interaction.guild.id)
+
+        target = f"tipe `{custom_id}`" if custom_id else "semua tipe"
+        await interaction.response.send_message(f"✅ Ticket {target} sekarang dibuka sebagai `{mode}`.", ephemeral=True)
+
 async def setup(bot):
-    await bot.add_cog(Ticket(bot))
+    cog = Ticket(bot)
+    await bot.add_cog(cog)
+    bot.add_dynamic_items(CloseTicketButton, DeleteTicketButton, ReopenTicketButton)
+    register_panel_views(bot, cog.store.panels.values())
@@ -0,0 +1,248 @@
+import asyncio
+import contextlib
+import os
+import time
+from collections import OrderedDict, deque
+
+from utils.metrics import DISABLED
+
+USER_BUCKET_PRUNE_AT = 10000
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        if self.wait_time(now):
+            return False
+        self.tokens -= 1
+        return True
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+def _bucket(per_minute, burst, now):
+    # A limit of 0 turns that bucket off.
+    return TokenBucket(per_minute / 60, max(1, burst), now) if per_minute > 0 else None
+
+
+class Waiter:
+    __slots__ = ("guild_id", "future")
+
+    def __init__(self, guild_id, future):
+        self.guild_id = guild_id
+        self.future = future
+
+
+# Admission for ticket creation. Each user has a small bucket checked up
+# front, so one person clicking every panel button is turned away at once.
+# Guild and global buckets guard the channel-create rate limit: requests
+# that find them empty wait in a bounded per-guild FIFO, served round-robin
+# across guilds as tokens refill, and are shed once the queue is full.
+class AdmissionController:
+    def __init__(self, user_rate=3, user_burst=2, guild_rate=30, guild_burst=10, global_rate=120, global_burst=30,
+                 max_queue=25, max_queue_total=200, clock=time.monotonic, metrics=DISABLED):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.guild_rate = guild_rate
+        self.guild_burst = guild_burst
+        self.max_queue = max_queue
+        self.max_queue_total = max_queue_total
+        self.clock = clock
+        self.metrics = metrics
+        self._users = {}
+        self._guilds = {}
+        self._global = _bucket(global_rate, global_burst, clock())
+        # guild_id -> deque of waiters; order is the round-robin order
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._wake = asyncio.Event()
+        self._dispatcher = None
+
+    @classmethod
+    def from_env(cls, metrics=DISABLED):
+        def number(name, default):
+            return float(os.getenv(name, str(default)))
+
+        return cls(
+            user_rate=number("TICKET_OPEN_USER_PER_MIN", 3),
+            user_burst=number("TICKET_OPEN_USER_BURST", 2),
+            guild_rate=number("TICKET_OPEN_GUILD_PER_MIN", 30),
+            guild_burst=number("TICKET_OPEN_GUILD_BURST", 10),
+            global_rate=number("TICKET_OPEN_GLOBAL_PER_MIN", 120),
+            global_burst=number("TICKET_OPEN_GLOBAL_BURST", 30),
+            max_queue=int(number("TICKET_OPEN_QUEUE", 25)),
+            max_queue_total=int(number("TICKET_OPEN_QUEUE_TOTAL", 200)),
+            metrics=metrics
+        )
+
+    def __len__(self):
+        return self._queued
+
+    def check_user(self, guild_id, user_id):
+        # Returns None when the user may open a ticket, else seconds to wait.
+        if self.user_rate <= 0:
+            return None
+        now = self.clock()
+        key = (guild_id, user_id)
+        bucket = self._users.get(key)
+        if bucket is None:
+            if len(self._users) >= USER_BUCKET_PRUNE_AT:
+                self._users = {k: b for k, b in self._users.items() if not b.full(now)}
+            bucket = self._users[key] = _bucket(self.user_rate, self.user_burst, now)
+        if bucket.take(now):
+            return None
+        self.metrics.inc("ticket_admission_total", result="rejected_user")
+        return bucket.wait_time(now)
+
+    def _guild_bucket(self, guild_id, now):
+        if self.guild_rate <= 0:
+            return None
+        bucket = self._guilds.get(guild_id)
+        if bucket is None:
+            bucket = self._guilds[guild_id] = _bucket(self.guild_rate, self.guild_burst, now)
+        return bucket
+
+    def _wait_time(self, guild_id, now):
+        waits = [bucket.wait_time(now) for bucket in (self._guild_bucket(guild_id, now), self._global) if bucket is not None]
+        return max(waits, default=0.0)
+
+    def _take(self, guild_id, now):
+        for bucket in (self._guild_bucket(guild_id, now), self._global):
+            if bucket is not None:
+                bucket.take(now)
+
+    def try_admit(self, guild_id):
+        # Earlier waiters of the same guild go first.
+        if self._queues.get(guild_id):
+            return False
+        now = self.clock()
+        if self._wait_time(guild_id, now):
+            return False
+        self._take(guild_id, now)
+        self.metrics.inc("ticket_admission_total", result="admitted")
+        return True
+
+    def enqueue(self, guild_id):
+        queue = self._queues.get(guild_id)
+        if self._queued >= self.max_queue_total or (queue is not None and len(queue) >= self.max_queue):
+            self.metrics.inc("ticket_admission_total", result="shed_queue")
+            return None
+        if queue is None:
+            queue = self._queues[guild_id] = deque()
+        waiter = Waiter(guild_id, asyncio.get_running_loop().create_future())
+        queue.append(waiter)
+        self._queued += 1
+        self.metrics.inc("ticket_admission_total", result="queued")
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        self._wake.set()
+        return waiter
+
+    def position(self, waiter):
+        queue = self._queues.get(waiter.guild_id)
+        if not queue:
+            return None
+        for index, queued in enumerate(queue):
+            if queued is waiter:
+                return index + 1
+        return None
+
+    def cancel(self, waiter):
+        queue = self._queues.get(waiter.guild_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.guild_id]
+        if not waiter.future.done():
+            waiter.future.set_result(False)
+
+    async def _dispatch(self):
+        while self._queues:
+            self._wake.clear()
+            now = self.clock()
+            next_wait = None
+            for guild_id in list(self._queues):
+                queue = self._queues[guild_id]
+                while queue:
+                    wait = self._wait_time(guild_id, now)
+                    if wait:
+                        next_wait = wait if next_wait is None else min(next_wait, wait)
+                        break
+                    waiter = queue.popleft()
+                    self._queued -= 1
+                    if waiter.future.done():
+                        continue
+                    self._take(guild_id, now)
+                    waiter.future.set_result(True)
+                    self.metrics.inc("ticket_admission_total", result="admitted")
+                    # One per guild per pass keeps guilds taking turns.
+                    self._queues.move_to_end(guild_id)
+                    break
+                if not queue:
+                    del self._queues[guild_id]
+            if not self._queues:
+                break
+            if next_wait is None:
+                await asyncio.sleep(0)
+                continue
+            # Not wait_for: before Python 3.12 it can drop close()'s cancel
+            # when an enqueue wakes us on the same tick.
+            waiter = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=next_wait)
+            finally:
+                waiter.cancel()
+
+    async def wait(self, waiter, timeout, on_position=None, update_every=2.0):
+        # True once admitted; False when shed after timeout seconds. Position
+        # changes are reported at most every update_every seconds.
+        started = self.clock()
+        last = self.position(waiter)
+        try:
+            while True:
+                remaining = started + timeout - self.clock()
+                if remaining <= 0:
+                    self.cancel(waiter)
+                    self.metrics.inc("ticket_admission_total", result="shed_timeout")
+                    return False
+                try:
+                    admitted = await asyncio.wait_for(asyncio.shield(waiter.future), min(update_every, remaining))
+                except asyncio.TimeoutError:
+                    position = self.position(waiter)
+                    if on_position is not None and position is not None and position != last:
+                        last = position
+                        await on_position(position)
+                    continue
+                if admitted:
+                    self.metrics.observe("ticket_admission_wait_seconds", self.clock() - started)
+                return admitted
+        except BaseException:
+            self.cancel(waiter)
+            raise
+
+    async def close(self):
+        if self._dispatcher is not None and not self._dispatcher.done():
+            self._dispatcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._dispatcher
+        for queue in list(self._queues.values()):
+            for waiter in list(queue):
+                self.cancel(waiter)
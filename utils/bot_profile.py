@@ -0,0 +1,20 @@
+import discord
+
+
+def bot_options(profile):
+    if profile != "lean":
+        return {"intents": discord.Intents.all()}
+    # Interactions carry the clicking member with roles and permissions, so
+    # the ticket flow needs no member cache, presences or startup chunking.
+    # Message events stay on for activity tracking, transcripts and the
+    # prefix commands.
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.message_content = True
+    return {
+        "intents": intents,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+        "max_messages": None,
+    }
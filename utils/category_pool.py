@@ -0,0 +1,181 @@
+import asyncio
+import re
+import traceback
+
+from utils.rest_scheduler import route, INTERACTIVE, BACKGROUND
+
+CATEGORY_LIMIT = 50
+OVERFLOW_SEPARATOR = " • "
+
+
+def overflow_name(base, ticket_type, index):
+    return f"{base.name}{OVERFLOW_SEPARATOR}{ticket_type} {index}"
+
+
+# Spreads ticket channels over the configured category plus overflow
+# categories created on demand for each (guild, ticket type). Occupancy is
+# kept as channel-id sets fed by gateway create/delete events, plus slots
+# reserved by opens whose channel is still being created, so picking a
+# category never counts channels or calls the API.
+class CategoryPool:
+    def __init__(self, rest, limit=CATEGORY_LIMIT, idle_seconds=600):
+        self.rest = rest
+        self.limit = limit
+        self.idle_seconds = idle_seconds
+        # (guild_id, base_id, ticket_type) -> [category_id, ...], base first
+        self._pools = {}
+        self._overflow = set()
+        self._members = {}
+        self._reserved = {}
+        self._locks = {}
+        self._cleanup_tasks = {}
+
+    def _seed(self, category):
+        if category.id not in self._members:
+            self._members[category.id] = {channel.id for channel in category.channels}
+        return self._members[category.id]
+
+    def occupancy(self, category_id):
+        return len(self._members.get(category_id, ())) + self._reserved.get(category_id, 0)
+
+    def _pool(self, guild, base, ticket_type):
+        key = (guild.id, base.id, ticket_type)
+        pool = self._pools.get(key)
+        if pool is None:
+            # Overflow categories from before a restart are found by name.
+            pattern = re.compile(re.escape(f"{base.name}{OVERFLOW_SEPARATOR}{ticket_type} ") + r"(\d+)")
+            found = sorted(
+                (int(match[1]), category)
+                for category in guild.categories
+                if (match := pattern.fullmatch(category.name))
+            )
+            pool = self._pools[key] = [base.id] + [category.id for _, category in found]
+            for _, category in found:
+                self._overflow.add(category.id)
+                self._seed(category)
+            self._seed(base)
+        return pool
+
+    def _pick(self, guild, pool):
+        best = None
+        for category_id in pool:
+            category = guild.get_channel(category_id)
+            if category is None:
+                continue
+            count = self.occupancy(category_id)
+            if count < self.limit and (best is None or count < self.occupancy(best.id)):
+                best = category
+        return best
+
+    def _reserve(self, category):
+        self._reserved[category.id] = self._reserved.get(category.id, 0) + 1
+        return category
+
+    async def acquire(self, guild, base, ticket_type, overwrites):
+        pool = self._pool(guild, base, ticket_type)
+        category = self._pick(guild, pool)
+        if category is not None:
+            return self._reserve(category)
+        lock = self._locks.setdefault((guild.id, base.id, ticket_type), asyncio.Lock())
+        async with lock:
+            # Another open may have created an overflow while we waited.
+            category = self._pick(guild, pool)
+            if category is not None:
+                return self._reserve(category)
+            names = {getattr(guild.get_channel(category_id), "name", None) for category_id in pool}
+            index = 2
+            while overflow_name(base, ticket_type, index) in names:
+                index += 1
+            category = await self.rest.submit(
+                route("create_channel", guild.id),
+                lambda: guild.create_category(
+                    overflow_name(base, ticket_type, index),
+                    overwrites=overwrites,
+                    position=base.position + len(pool)
+                ),
+                INTERACTIVE
+            )
+            pool.append(category.id)
+            self._overflow.add(category.id)
+            self._members.setdefault(category.id, set())
+            return self._reserve(category)
+
+    def release(self, category, channel=None):
+        remaining = self._reserved.get(category.id, 0) - 1
+        if remaining > 0:
+            self._reserved[category.id] = remaining
+        else:
+            self._reserved.pop(category.id, None)
+        if channel is not None:
+            self._members.setdefault(category.id, set()).add(channel.id)
+        elif category.id in self._overflow:
+            self._schedule_cleanup(category)
+
+    def channel_created(self, channel):
+        members = self._members.get(getattr(channel, "category_id", None))
+        if members is not None:
+            members.add(channel.id)
+
+    def channel_deleted(self, channel):
+        if channel.id in self._members:
+            self._forget_category(channel.id)
+            return
+        category_id = getattr(channel, "category_id", None)
+        members = self._members.get(category_id)
+        if members is None:
+            return
+        members.discard(channel.id)
+        category = channel.guild.get_channel(category_id) if category_id in self._overflow else None
+        if category is not None:
+            self._schedule_cleanup(category)
+
+    def channel_moved(self, before, after):
+        if getattr(before, "category_id", None) == getattr(after, "category_id", None):
+            return
+        self.channel_deleted(before)
+        self.channel_created(after)
+
+    def _forget_category(self, category_id):
+        self._members.pop(category_id, None)
+        self._reserved.pop(category_id, None)
+        self._overflow.discard(category_id)
+        for key, pool in list(self._pools.items()):
+            if pool[0] == category_id:
+                del self._pools[key]
+            elif category_id in pool:
+                pool.remove(category_id)
+        task = self._cleanup_tasks.pop(category_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    def _schedule_cleanup(self, category):
+        if self.occupancy(category.id) or category.id in self._cleanup_tasks:
+            return
+        self._cleanup_tasks[category.id] = asyncio.get_running_loop().create_task(self._cleanup(category))
+
+    async def _cleanup(self, category):
+        # Overflow categories are only removed after staying empty for a
+        # while, so a burst that comes and goes does not churn them.
+        try:
+            await asyncio.sleep(self.idle_seconds)
+            if self.occupancy(category.id) or category.id not in self._overflow:
+                return
+            # Leave the pool first so no open picks it while it is deleted.
+            self._forget_category(category.id)
+            await self.rest.submit(
+                route("delete_channel", category.id),
+                lambda: category.delete(reason="Kategori overflow ticket kosong"),
+                BACKGROUND
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            traceback.print_exc()
+        finally:
+            if self._cleanup_tasks.get(category.id) is asyncio.current_task():
+                del self._cleanup_tasks[category.id]
+
+    def close(self):
+        for task in self._cleanup_tasks.values():
+            task.cancel()
+        self._cleanup_tasks.clear()
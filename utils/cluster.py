@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import traceback
+import uuid
+
+
+def shard_of(guild_id, shard_count):
+    # Discord routes a guild to shard (guild_id >> 22) % shard_count.
+    return (int(guild_id) >> 22) % shard_count
+
+
+def shard_ranges(shard_count, clusters):
+    # Contiguous, near-equal shard ranges, one per cluster.
+    base, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for index in range(clusters):
+        size = base + (1 if index < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+class ClusterConfig:
+    def __init__(self, cluster_id=0, clusters=1, shard_count=None):
+        self.cluster_id = cluster_id
+        self.clusters = clusters
+        self.shard_count = shard_count
+        self._owner = None
+        if clusters > 1:
+            self.shard_ids = shard_ranges(shard_count, clusters)[cluster_id]
+        else:
+            self.shard_ids = None
+
+    @classmethod
+    def from_env(cls):
+        clusters = int(os.getenv("BOT_CLUSTERS", "1"))
+        shard_count = int(os.getenv("BOT_SHARD_COUNT", str(clusters)))
+        if clusters > 1 and shard_count < clusters:
+            raise ValueError("BOT_SHARD_COUNT harus >= BOT_CLUSTERS")
+        return cls(int(os.getenv("BOT_CLUSTER_ID", "0")), clusters, shard_count)
+
+    @property
+    def enabled(self):
+        return self.clusters > 1
+
+    @property
+    def is_worker(self):
+        return "BOT_CLUSTER_ID" in os.environ
+
+    @property
+    def owner(self):
+        # Unique per process: a stale or duplicate worker with the same
+        # cluster id waits for the lease like any other. A clean shutdown
+        # releases the lease, so only a crashed worker's lease has to expire.
+        if self._owner is None:
+            self._owner = f"{socket.gethostname()}:cluster-{self.cluster_id}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        return self._owner
+
+    def owns_guild(self, guild_id):
+        if not self.enabled:
+            return True
+        if guild_id is None:
+            # Records from before guild ids were stored belong to cluster 0.
+            return self.cluster_id == 0
+        return shard_of(guild_id, self.shard_count) in self.shard_ids
+
+
+LEASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shard_leases (
+    shard_id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+# Shard ownership leases in the shared SQLite file. A worker takes its shard
+# range before connecting and keeps renewing it, so a second process started
+# with an overlapping range (a stale worker, a bad restart) waits instead of
+# writing the same guilds. A worker whose lease is taken over, or that cannot
+# renew it before it runs out, calls on_lost and must stop writing.
+class ShardLeases:
+    def __init__(self, path, owner, shard_ids, ttl=90, renew_every=30, on_lost=None, clock=time.time):
+        self.path = path
+        self.owner = owner
+        self.shard_ids = list(shard_ids)
+        self.ttl = ttl
+        self.renew_every = renew_every
+        self.on_lost = on_lost
+        self.clock = clock
+        self.lost = False
+        self.renewed_at = None
+        self._task = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(LEASE_SCHEMA)
+        return conn
+
+    def _try_acquire(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = self.clock()
+            marks = ",".join("?" * len(self.shard_ids))
+            held = conn.execute(
+                f"SELECT shard_id, owner FROM shard_leases WHERE shard_id IN ({marks}) AND owner != ? AND expires_at > ?",
+                (*self.shard_ids, self.owner, now)
+            ).fetchall()
+            if held:
+                conn.rollback()
+                return held
+            conn.executemany(
+                "INSERT OR REPLACE INTO shard_leases (shard_id, owner, expires_at) VALUES (?, ?, ?)",
+                [(shard_id, self.owner, now + self.ttl) for shard_id in self.shard_ids]
+            )
+            conn.commit()
+            self.renewed_at = now
+            return []
+        finally:
+            conn.close()
+
+    async def acquire(self, poll=5):
+        while True:
+            held = await asyncio.to_thread(self._try_acquire)
+            if not held:
+                break
+            print(f"⏳ Shard {[shard for shard, _ in held]} masih dipegang {held[0][1]}, menunggu lease kedaluwarsa")
+            await asyncio.sleep(poll)
+        self._task = asyncio.create_task(self._renew_loop())
+
+    async def _renew_loop(self):
+        while not self.lost:
+            await asyncio.sleep(self.renew_every)
+            try:
+                held = await asyncio.to_thread(self._try_acquire)
+            except Exception:
+                traceback.print_exc()
+                # Keep going while the lease is still ours past the next try.
+                if self.clock() + self.renew_every < self.renewed_at + self.ttl:
+                    continue
+                print(f"❌ Lease shard {self.shard_ids} tidak bisa diperpanjang sebelum kedaluwarsa")
+                self._lose()
+                continue
+            if held:
+                print(f"❌ Lease shard {[shard for shard, _ in held]} diambil alih oleh {held[0][1]}")
+                self._lose()
+
+    def _lose(self):
+        self.lost = True
+        if self.on_lost is not None:
+            self.on_lost()
+
+    def _release(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    f"DELETE FROM shard_leases WHERE owner = ? AND shard_id IN ({','.join('?' * len(self.shard_ids))})",
+                    (self.owner, *self.shard_ids)
+                )
+        finally:
+            conn.close()
+
+    async def release(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        if not self.lost:
+            await asyncio.to_thread(self._release)
+
+
+def run_cluster(config, restart_delay=5):
+    # Supervisor: one worker process per shard range, restarted if it dies.
+    # Workers rerun this script with BOT_CLUSTER_ID set.
+    def spawn(cluster_id):
+        env = dict(os.environ, BOT_CLUSTER_ID=str(cluster_id))
+        return subprocess.Popen([sys.executable, *sys.argv], env=env)
+
+    workers = {cluster_id: spawn(cluster_id) for cluster_id in range(config.clusters)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for proc in workers.values():
+            with contextlib.suppress(ProcessLookupError):
+                proc.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    ranges = shard_ranges(config.shard_count, config.clusters)
+    for cluster_id, proc in workers.items():
+        print(f"🚀 Cluster {cluster_id} (pid {proc.pid}) memegang shard {ranges[cluster_id]}")
+
+    while workers:
+        for cluster_id, proc in list(workers.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+            if stopping or code == 0:
+                del workers[cluster_id]
+                continue
+            print(f"⚠️ Cluster {cluster_id} keluar dengan kode {code}, dijalankan ulang dalam {restart_delay}s")
+            time.sleep(restart_delay)
+            workers[cluster_id] = spawn(cluster_id)
+        time.sleep(1)
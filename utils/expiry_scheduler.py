@@ -0,0 +1,72 @@
+import asyncio
+import heapq
+import time
+
+
+# Min-heap of (deadline, key) with lazy deletion: touching a key pushes a new
+# entry and the stale one is skipped when it surfaces. The heap is rebuilt
+# from the live deadlines whenever stale entries outnumber them.
+class DeadlineScheduler:
+    def __init__(self, timeout, clock=time.time):
+        self.timeout = timeout
+        self.clock = clock
+        self._deadlines = {}
+        self._heap = []
+        self._wake = asyncio.Event()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def deadline(self, key):
+        return self._deadlines.get(key)
+
+    def touch(self, key, last_activity=None):
+        if last_activity is None:
+            last_activity = self.clock()
+        deadline = last_activity + self.timeout
+        earliest = self._heap[0][0] if self._heap else None
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(d, k) for k, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        if earliest is None or deadline < earliest:
+            self._wake.set()
+
+    def discard(self, key):
+        self._deadlines.pop(key, None)
+
+    def _drop_stale(self):
+        while self._heap:
+            deadline, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return
+            heapq.heappop(self._heap)
+
+    async def due(self):
+        # Yields each key as its deadline passes, sleeping exactly until the
+        # earliest live deadline in between.
+        while True:
+            self._drop_stale()
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            deadline, key = self._heap[0]
+            delay = deadline - self.clock()
+            if delay > 0:
+                # Not wait_for: on Python < 3.12 it swallows a cancel that
+                # lands as the wake event fires, and cog_unload then waits
+                # on this loop forever.
+                waiter = asyncio.ensure_future(self._wake.wait())
+                try:
+                    await asyncio.wait((waiter,), timeout=delay)
+                finally:
+                    waiter.cancel()
+                continue
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            yield key
@@ -0,0 +1,238 @@
+import asyncio
+import contextlib
+import contextvars
+import glob
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import Counter
+from datetime import datetime
+
+from utils.metrics import DISABLED, Histogram
+from utils.ticket_storage import atomic_write
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_STACK_DEPTH = 40
+
+# Name of the interaction handler or command running in the current task.
+# Tasks spawned by a handler inherit it through their context.
+current_handler = contextvars.ContextVar("ticket_handler", default=None)
+# The watchdog thread cannot read another thread's context before Python
+# 3.12 (Task.get_context), so tagged tasks are also kept here.
+_task_handlers = weakref.WeakKeyDictionary()
+
+
+def tag_handler(name):
+    token = current_handler.set(name)
+    task = asyncio.current_task()
+    previous = None
+    if task is not None:
+        previous = _task_handlers.get(task)
+        _task_handlers[task] = name
+    return token, task, previous
+
+
+@contextlib.contextmanager
+def handler_scope(name):
+    token, task, previous = tag_handler(name)
+    try:
+        yield
+    finally:
+        current_handler.reset(token)
+        if task is not None:
+            if previous is None:
+                _task_handlers.pop(task, None)
+            else:
+                _task_handlers[task] = previous
+
+
+def handler_of(task):
+    if task is None:
+        return "callback"
+    get_context = getattr(task, "get_context", None)
+    handler = get_context().get(current_handler) if get_context is not None else None
+    return handler or _task_handlers.get(task) or task.get_name()
+
+
+class Stall:
+    __slots__ = ("started_at", "samples", "duration")
+
+    def __init__(self, started_at):
+        self.started_at = started_at
+        # (handler, stack) -> sample count; back-to-back blocking callbacks
+        # can share one stall, so every sample carries its own handler.
+        self.samples = Counter()
+        self.duration = None
+
+    @property
+    def handler(self):
+        handlers = Counter()
+        for (handler, _), count in self.samples.items():
+            handlers[handler] += count
+        return handlers.most_common(1)[0][0] if handlers else "callback"
+
+
+# Measures event-loop lag with a ticker coroutine and, from a side thread,
+# samples the loop thread's stack while the ticker is overdue by more than
+# threshold seconds. Each stall is tagged with the handler of the task that
+# was running and periodically written to report_dir, oldest reports pruned.
+class LoopMonitor:
+    def __init__(self, threshold=0.1, interval=0.05, sample_every=0.01, report_dir="loop_reports",
+                 report_interval=300, keep=24, name="loop", metrics=DISABLED):
+        self.threshold = threshold
+        self.interval = interval
+        self.sample_every = sample_every
+        self.report_dir = report_dir
+        self.report_interval = report_interval
+        self.keep = keep
+        self.name = name
+        self.metrics = metrics
+        self.lag = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.total_stalls = 0
+        self.stalls = []
+        self._stall = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._beat = time.monotonic()
+        self._window_started = time.time()
+        self._loop = None
+        self._loop_thread = None
+        self._thread = None
+        self._task = None
+
+    @classmethod
+    def from_env(cls, name="loop", metrics=DISABLED):
+        if os.getenv("TICKET_LOOP_MONITOR", "0") != "1":
+            return None
+        return cls(
+            threshold=int(os.getenv("TICKET_LOOP_LAG_MS", "100")) / 1000,
+            report_dir=os.getenv("TICKET_LOOP_REPORT_DIR", "loop_reports"),
+            report_interval=int(os.getenv("TICKET_LOOP_REPORT_SECONDS", "300")),
+            name=name,
+            metrics=metrics
+        )
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = self._loop.create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def _tick(self):
+        last_report = time.monotonic()
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._beat - self.interval)
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self.metrics.observe("ticket_loop_lag_seconds", lag)
+            with self._lock:
+                stall, self._stall = self._stall, None
+                if stall is not None and lag >= self.threshold:
+                    stall.duration = lag
+                    self.stalls.append(stall)
+                    self.total_stalls += 1
+            if stall is not None and lag >= self.threshold:
+                self.metrics.inc("ticket_loop_stalls_total", handler=stall.handler)
+            if time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                try:
+                    await self.write_report()
+                except Exception:
+                    traceback.print_exc()
+
+    def _watch(self):
+        # Runs in its own thread: the loop cannot observe itself while blocked.
+        while not self._stop.wait(self.sample_every):
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = tuple(
+                f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+                for entry in traceback.extract_stack(frame)[-MAX_STACK_DEPTH:]
+            )
+            del frame
+            try:
+                task = asyncio.current_task(self._loop)
+            except RuntimeError:
+                task = None
+            with self._lock:
+                if self._stall is None:
+                    self._stall = Stall(time.time() - overdue)
+                self._stall.samples[(handler_of(task), stack)] += 1
+
+    def _snapshot(self):
+        with self._lock:
+            stalls, self.stalls = self.stalls, []
+        lag, self.lag = self.lag, Histogram(LAG_BUCKETS)
+        window = (self._window_started, time.time())
+        self._window_started = window[1]
+        return stalls, lag, window
+
+    async def write_report(self):
+        stalls, lag, window = self._snapshot()
+        if not stalls:
+            return None
+        return await asyncio.to_thread(self._write_report, stalls, lag, window)
+
+    def _write_report(self, stalls, lag, window):
+        os.makedirs(self.report_dir, exist_ok=True)
+        started, ended = (datetime.fromtimestamp(value) for value in window)
+        path = os.path.join(self.report_dir, f"{self.name}-{ended:%Y%m%d-%H%M%S}.txt")
+        lines = [
+            f"Laporan event loop {self.name} {started:%Y-%m-%d %H:%M:%S} - {ended:%H:%M:%S}",
+            f"lag p50 {(lag.quantile(0.5) or 0) * 1000:.1f}ms, p99 {(lag.quantile(0.99) or 0) * 1000:.1f}ms, "
+            f"{len(stalls)} stall >= {self.threshold * 1000:.0f}ms",
+            "",
+            "Stall per handler:",
+        ]
+        per_handler = {}
+        for stall in stalls:
+            entry = per_handler.setdefault(stall.handler, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += stall.duration
+            entry[2] = max(entry[2], stall.duration)
+        for handler, (count, total, longest) in sorted(per_handler.items(), key=lambda item: item[1][1], reverse=True):
+            lines.append(f"  {handler}: {count}x, total {total * 1000:.0f}ms, maks {longest * 1000:.0f}ms")
+
+        lines += ["", "Stall:"]
+        for stall in stalls:
+            top = stall.samples.most_common(1)[0][0][1][-1] if stall.samples else "-"
+            lines.append(
+                f"  {datetime.fromtimestamp(stall.started_at):%H:%M:%S.%f} {stall.handler} "
+                f"{stall.duration * 1000:.0f}ms ({sum(stall.samples.values())} sampel) di {top}"
+            )
+
+        # Folded stacks, one per line, ready for flamegraph.pl or speedscope.
+        folded = Counter()
+        for stall in stalls:
+            for (handler, stack), count in stall.samples.items():
+                folded[(handler,) + stack] += count
+        lines += ["", "Stack (folded):"]
+        lines += [f"{';'.join(stack)} {count}" for stack, count in folded.most_common()]
+
+        atomic_write(path, "\n".join(lines) + "\n")
+        for old in sorted(glob.glob(os.path.join(self.report_dir, f"{self.name}-*.txt")))[:-self.keep]:
+            with contextlib.suppress(OSError):
+                os.remove(old)
+        return path
+
+    async def close(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+        await self.write_report()
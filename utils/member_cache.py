@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+
+import discord
+
+from utils.rest_scheduler import route, INTERACTIVE
+
+
+# Small LRU of guild members for when the member cache is off. Members seen
+# in interactions are remembered for free; anything else is fetched once and
+# kept for ttl seconds so role changes are picked up eventually.
+class MemberResolver:
+    def __init__(self, rest, maxsize=1024, ttl=600, clock=time.monotonic):
+        self.rest = rest
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._members = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._members)
+
+    def remember(self, member):
+        if not isinstance(member, discord.Member):
+            return
+        key = (member.guild.id, member.id)
+        self._members[key] = (self.clock() + self.ttl, member)
+        self._members.move_to_end(key)
+        while len(self._members) > self.maxsize:
+            self._members.popitem(last=False)
+
+    def cached(self, guild, user_id):
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        key = (guild.id, user_id)
+        entry = self._members.get(key)
+        if entry is None:
+            return None
+        expires_at, member = entry
+        if expires_at <= self.clock():
+            del self._members[key]
+            return None
+        self._members.move_to_end(key)
+        return member
+
+    async def get(self, guild, user_id, priority=INTERACTIVE):
+        member = self.cached(guild, user_id)
+        if member is not None:
+            self.hits += 1
+            return member
+        self.misses += 1
+        try:
+            member = await self.rest.submit(
+                route("get_member", guild.id),
+                lambda: guild.fetch_member(user_id),
+                priority
+            )
+        except discord.NotFound:
+            return None
+        self.remember(member)
+        return member
@@ -0,0 +1,189 @@
+import asyncio
+import bisect
+import contextlib
+import os
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "ticket_handler_seconds": "Durasi handler interaksi (tombol dan app command)",
+    "ticket_rest_requests_total": "Panggilan REST per route",
+    "ticket_rest_rate_limited_total": "Respons 429 per route",
+    "ticket_rest_seconds": "Durasi panggilan REST per route",
+    "ticket_rest_queue_seconds": "Waktu tunggu di antrean REST per prioritas",
+    "ticket_store_flush_seconds": "Durasi flush store ke backend",
+    "ticket_log_append_seconds": "Durasi menulis entri log ticket",
+    "ticket_expire_seconds": "Durasi menutup satu ticket di ticket_expire_loop",
+    "ticket_admission_total": "Keputusan admission pembuatan ticket per hasil",
+    "ticket_admission_wait_seconds": "Waktu tunggu di antrean admission sebelum ticket dibuat",
+    "ticket_loop_lag_seconds": "Keterlambatan event loop",
+    "ticket_loop_stalls_total": "Event loop tertahan melewati ambang, per handler",
+}
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count", "max")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket, like histogram_quantile(),
+        # capped at the largest value seen: interpolating towards the upper
+        # bound can otherwise report a p99 above the maximum.
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.bounds):
+                    return self.max
+                lower = self.bounds[index - 1] if index else 0.0
+                return min(self.max, lower + (self.bounds[index] - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+
+# Counters and histograms keyed by (name, labels). Recording is a no-op while
+# disabled, so the hooks in the hot paths cost one attribute check. Gauges
+# are callbacks evaluated only when the metrics are rendered.
+class Metrics:
+    def __init__(self, enabled=False, host="127.0.0.1", port=None):
+        self.enabled = enabled
+        self.host = host
+        self.port = port
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self._server = None
+
+    @classmethod
+    def from_env(cls, port_offset=0):
+        # Each cluster worker listens on TICKET_METRICS_PORT + its cluster id.
+        port = os.getenv("TICKET_METRICS_PORT")
+        return cls(
+            enabled=os.getenv("TICKET_METRICS", "0") == "1" or bool(port),
+            host=os.getenv("TICKET_METRICS_HOST", "127.0.0.1"),
+            port=int(port) + port_offset if port else None
+        )
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        series = self.counters.setdefault(name, {})
+        key = _labels_key(labels)
+        series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        series = self.histograms.setdefault(name, {})
+        key = _labels_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def gauge(self, name, callback, help_text=None):
+        self.gauges[name] = (callback, help_text)
+
+    def render(self):
+        lines = []
+
+        def header(name, kind, help_text=None):
+            lines.append(f"# HELP {name} {help_text or HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in sorted(self.counters.items()):
+            header(name, "counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        for name, series in sorted(self.histograms.items()):
+            header(name, "histogram")
+            for key, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        for name, (callback, help_text) in sorted(self.gauges.items()):
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            header(name, "gauge", help_text)
+            lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    async def start_server(self):
+        if self.port is None:
+            return None
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        return self._server
+
+    async def _serve(self, reader, writer):
+        # Just enough HTTP/1.1 for a Prometheus scrape or curl.
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] in (b"/", b"/metrics"):
+                status, body = "200 OK", self.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            with contextlib.suppress(Exception):
+                await self._server.wait_closed()
+            self._server = None
+
+
+DISABLED = Metrics()
@@ -0,0 +1,220 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+
+from utils.metrics import DISABLED
+
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BACKGROUND: "background"}
+
+
+def route(name, major_id):
+    # Discord's real bucket ids come from X-RateLimit-Bucket, which
+    # discord.py keeps to itself. Buckets are scoped by major parameter
+    # (guild, channel or webhook id), so route name plus major id is a
+    # conservative stand-in: it may split one Discord bucket in two, but
+    # never merges two. 429s still block the key that hit them.
+    return f"{name}:{major_id}"
+
+
+def route_name(route_key):
+    # Metrics are labelled by route name only; ids would explode cardinality.
+    return route_key.split(":", 1)[0]
+
+
+def retry_after_of(exc):
+    value = getattr(exc, "retry_after", None)
+    if value is not None:
+        return float(value)
+    if getattr(exc, "status", None) == 429:
+        headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+        return float(headers.get("Retry-After", 1.0))
+    return None
+
+
+class _Bucket:
+    __slots__ = ("blocked_until", "inflight", "hits")
+
+    def __init__(self):
+        self.blocked_until = 0.0
+        self.inflight = 0
+        self.hits = 0
+
+
+class _Job:
+    __slots__ = ("route", "call", "priority", "future", "attempts", "started", "coalesce_key", "queued_at")
+
+    def __init__(self, route, call, priority, future, coalesce_key, queued_at):
+        self.route = route
+        self.call = call
+        self.priority = priority
+        self.future = future
+        self.attempts = 0
+        self.started = False
+        self.coalesce_key = coalesce_key
+        self.queued_at = queued_at
+
+
+# Orders REST calls by priority and keeps at most one call in flight per
+# route key. A 429 (or discord.RateLimited once max_ratelimit_timeout is hit)
+# blocks only that route key and requeues the call, so other routes keep
+# moving. Background work never takes the last concurrency slot, which stays
+# free for interactive calls.
+class RestScheduler:
+    def __init__(self, max_concurrency=4, max_retries=3, clock=time.monotonic, metrics=DISABLED):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.clock = clock
+        self.metrics = metrics
+        self._queue = []
+        self._seq = itertools.count()
+        self._buckets = {}
+        self._coalesce = {}
+        self._running = set()
+        self._wake = asyncio.Event()
+        self._dispatcher = None
+        self._closed = False
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        return bucket
+
+    def pending(self):
+        # Raising a coalesced job's priority pushes a second heap entry, so
+        # count distinct jobs rather than entries.
+        return len({job for _, _, job in self._queue if not job.started and not job.future.done()})
+
+    async def submit(self, route_key, call, priority=NORMAL, coalesce_key=None):
+        if coalesce_key is not None:
+            job = self._coalesce.get(coalesce_key)
+            if job is not None and not job.started:
+                # The pending call is superseded: the latest state wins and
+                # every caller shares one request.
+                job.call = call
+                if priority < job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._seq), job))
+                return await asyncio.shield(job.future)
+        job = _Job(route_key, call, priority, asyncio.get_running_loop().create_future(), coalesce_key, self.clock())
+        if coalesce_key is not None:
+            self._coalesce[coalesce_key] = job
+        heapq.heappush(self._queue, (priority, next(self._seq), job))
+        self._ensure_dispatcher()
+        self._wake.set()
+        return await asyncio.shield(job.future)
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    def _slots_for(self, priority):
+        if priority == BACKGROUND:
+            return max(1, self.max_concurrency - 1)
+        return self.max_concurrency
+
+    async def _dispatch(self):
+        while self._queue or self._running:
+            self._wake.clear()
+            now = self.clock()
+            deferred = []
+            next_ready = None
+            while self._queue:
+                priority, seq, job = heapq.heappop(self._queue)
+                if job.started or job.future.done():
+                    continue
+                bucket = self._bucket(job.route)
+                if len(self._running) >= self._slots_for(job.priority):
+                    deferred.append((priority, seq, job))
+                    if len(self._running) >= self.max_concurrency:
+                        break
+                    continue
+                if bucket.inflight or bucket.blocked_until > now:
+                    if bucket.blocked_until > now:
+                        next_ready = bucket.blocked_until if next_ready is None else min(next_ready, bucket.blocked_until)
+                    deferred.append((priority, seq, job))
+                    continue
+                self._start(job, bucket)
+            for entry in deferred:
+                heapq.heappush(self._queue, entry)
+            timeout = None if next_ready is None else max(0.0, next_ready - self.clock())
+            if not self._queue and not self._running:
+                break
+            # asyncio.wait rather than wait_for, which before Python 3.12 can
+            # swallow close()'s cancel if a submit wakes us on the same tick.
+            waiter = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=timeout)
+            finally:
+                waiter.cancel()
+
+    def _start(self, job, bucket):
+        job.started = True
+        job.attempts += 1
+        if job.coalesce_key is not None and self._coalesce.get(job.coalesce_key) is job:
+            del self._coalesce[job.coalesce_key]
+        bucket.inflight += 1
+        if self.metrics.enabled:
+            self.metrics.observe("ticket_rest_queue_seconds", self.clock() - job.queued_at, priority=PRIORITY_NAMES[job.priority])
+        task = asyncio.get_running_loop().create_task(self._execute(job, bucket))
+        self._running.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task):
+        self._running.discard(task)
+        self._wake.set()
+
+    async def _execute(self, job, bucket):
+        started = self.clock()
+        try:
+            result = await job.call()
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as exc:
+            retry_after = retry_after_of(exc)
+            if retry_after is not None:
+                bucket.hits += 1
+                bucket.blocked_until = max(bucket.blocked_until, self.clock() + retry_after)
+                self.metrics.inc("ticket_rest_rate_limited_total", route=route_name(job.route))
+            if retry_after is not None and job.attempts <= self.max_retries:
+                if self._closed:
+                    # No dispatcher is left to retry it.
+                    job.future.cancel()
+                    return
+                job.started = False
+                job.queued_at = self.clock()
+                heapq.heappush(self._queue, (job.priority, next(self._seq), job))
+            else:
+                job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
+        finally:
+            bucket.inflight -= 1
+            if self.metrics.enabled:
+                name = route_name(job.route)
+                self.metrics.inc("ticket_rest_requests_total", route=name)
+                self.metrics.observe("ticket_rest_seconds", self.clock() - started, route=name)
+
+    async def close(self, timeout=10.0):
+        self._closed = True
+        if self._dispatcher is not None and not self._dispatcher.done():
+            self._dispatcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._dispatcher
+        for _, _, job in self._queue:
+            if not job.future.done():
+                job.future.cancel()
+        self._queue.clear()
+        # Calls already sent may finish so their callers see the result;
+        # whatever is still running after timeout seconds is cancelled.
+        if self._running:
+            _, running = await asyncio.wait(set(self._running), timeout=timeout)
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,79 @@
+import discord
+
+from utils.guild_config import get_ticket_category, get_ticket_roles, get_ticket_log_channel
+
+HANDLER_PERMISSIONS = discord.PermissionOverwrite(read_messages=True, send_messages=True, read_message_history=True)
+HIDDEN = discord.PermissionOverwrite(read_messages=False)
+
+
+class TicketTypeConfig:
+    __slots__ = ("roles", "role_ids", "mentions", "overwrites")
+
+    def __init__(self, guild, role_ids):
+        self.roles = [role for role in (guild.get_role(rid) for rid in role_ids) if role]
+        self.role_ids = frozenset(role.id for role in self.roles)
+        self.mentions = " ".join(role.mention for role in self.roles)
+        # Base overwrites for a new ticket; the owner is added per ticket.
+        self.overwrites = {guild.default_role: HIDDEN}
+        for role in self.roles:
+            self.overwrites[role] = HANDLER_PERMISSIONS
+
+    def is_handler(self, member):
+        return not self.role_ids.isdisjoint(role.id for role in member.roles)
+
+    def overwrites_for(self, owner):
+        overwrites = dict(self.overwrites)
+        overwrites[owner] = HANDLER_PERMISSIONS
+        return overwrites
+
+
+class GuildTicketConfig:
+    def __init__(self, guild):
+        self.guild = guild
+        category_id = get_ticket_category(guild.id)
+        category = guild.get_channel(category_id) if category_id else None
+        self.category = category if isinstance(category, discord.CategoryChannel) else None
+        log_channel_id = get_ticket_log_channel(guild.id)
+        self.log_channel = guild.get_channel(log_channel_id) if log_channel_id else None
+        self._types = {}
+
+    def ticket_type(self, ticket_type):
+        config = self._types.get(ticket_type)
+        if config is None:
+            config = self._types[ticket_type] = TicketTypeConfig(self.guild, get_ticket_roles(self.guild.id, ticket_type))
+        return config
+
+    def uses_role(self, role_id):
+        return any(role_id in config.role_ids for config in self._types.values())
+
+    def references(self, channel_id):
+        return any(
+            channel is not None and channel.id == channel_id
+            for channel in (self.category, self.log_channel)
+        )
+
+
+# Resolved guild_config per guild, built on first use. Config commands and
+# role/channel deletions drop the guild's entry so it is rebuilt lazily.
+class TicketConfigCache:
+    def __init__(self):
+        self._guilds = {}
+
+    def get(self, guild):
+        config = self._guilds.get(guild.id)
+        if config is None:
+            config = self._guilds[guild.id] = GuildTicketConfig(guild)
+        return config
+
+    def invalidate(self, guild_id):
+        self._guilds.pop(guild_id, None)
+
+    def channel_deleted(self, channel):
+        config = self._guilds.get(channel.guild.id)
+        if config is not None and config.references(channel.id):
+            self.invalidate(channel.guild.id)
+
+    def role_deleted(self, role):
+        config = self._guilds.get(role.guild.id)
+        if config is not None and config.uses_role(role.id):
+            self.invalidate(role.guild.id)
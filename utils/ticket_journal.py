@@ -0,0 +1,185 @@
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import time
+
+from utils.write_behind import DebouncedFlush
+
+SEGMENT_PREFIX = "segment-"
+
+
+def _segment_paths(directory):
+    if not os.path.isdir(directory):
+        return []
+    names = {name for name in os.listdir(directory) if name.startswith(SEGMENT_PREFIX) and not name.endswith(".tmp")}
+    # A crash during rotation can leave a sealed segment next to its .gz;
+    # the .gz is only renamed into place once complete, so it wins.
+    names = {name for name in names if name + ".gz" not in names}
+    # Segment names embed a zero-padded creation time, so sorting by name
+    # yields write order.
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def _finish_rotation(directory):
+    # Cleans up after a crash in _maybe_rotate: drops half-written .gz files
+    # and plain segments whose compressed copy was already in place.
+    names = set(os.listdir(directory))
+    for name in names:
+        if not name.startswith(SEGMENT_PREFIX):
+            continue
+        if name.endswith(".tmp") or name + ".gz" in names:
+            os.unlink(os.path.join(directory, name))
+
+
+def _open_segment(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_journal(directory):
+    for path in _segment_paths(directory):
+        try:
+            f = _open_segment(path)
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a torn final line; skip it.
+                    continue
+
+
+class TicketJournal:
+    def __init__(
+        self,
+        directory,
+        max_segment_bytes=8 * 1024 * 1024,
+        max_segment_age=86400,
+        fsync_interval=1.0,
+        fsync_batch=64,
+        compress=True,
+        legacy_file=None
+    ):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.compress = compress
+        self.legacy_file = legacy_file
+        self._pending = []
+        self._file = None
+        self._path = None
+        self._opened_at = 0
+        self._write_lock = asyncio.Lock()
+        # One fsync covers everything appended during the interval, or the
+        # batch as soon as it fills up.
+        self._flusher = DebouncedFlush(self.flush, lambda: bool(self._pending), fsync_interval)
+
+    async def open(self):
+        await asyncio.to_thread(self._open)
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        _finish_rotation(self.directory)
+        self._migrate_legacy()
+        segments = [p for p in _segment_paths(self.directory) if not p.endswith(".gz")]
+        if segments:
+            path = segments[-1]
+            name = os.path.basename(path)
+            self._opened_at = int(name[len(SEGMENT_PREFIX):].split(".")[0]) / 1000
+            self._path = path
+            self._file = open(path, "a", encoding="utf-8")
+            self._maybe_rotate()
+        else:
+            self._start_segment()
+
+    def _migrate_legacy(self):
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        if _segment_paths(self.directory):
+            return
+        with open(self.legacy_file, "r", encoding="utf-8") as f:
+            try:
+                entries = json.load(f)
+            except json.JSONDecodeError:
+                entries = []
+        path = self._segment_path(0)
+        with open(path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.legacy_file, self.legacy_file + ".migrated")
+
+    def _segment_path(self, created_ms):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{created_ms:015d}.jsonl")
+
+    def _start_segment(self):
+        now = time.time()
+        created_ms = int(now * 1000)
+        # Fast rotations can land in the same millisecond; never reuse a name,
+        # or the new segment would append to (and later overwrite) a sealed one.
+        while os.path.exists(self._segment_path(created_ms)) or os.path.exists(self._segment_path(created_ms) + ".gz"):
+            created_ms += 1
+        self._opened_at = now
+        self._path = self._segment_path(created_ms)
+        self._file = open(self._path, "a", encoding="utf-8")
+
+    def _maybe_rotate(self):
+        too_big = self._file.tell() >= self.max_segment_bytes
+        too_old = time.time() - self._opened_at >= self.max_segment_age
+        if not (too_big or too_old) or self._file.tell() == 0:
+            return
+        sealed = self._path
+        self._file.close()
+        if self.compress:
+            tmp_path = sealed + ".gz.tmp"
+            with open(sealed, "rb") as src, open(tmp_path, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_path, sealed + ".gz")
+            os.unlink(sealed)
+        self._start_segment()
+
+    def append(self, entry):
+        self._pending.append(json.dumps(entry) + "\n")
+        if len(self._pending) >= self.fsync_batch:
+            self._flusher.wake()
+        self._flusher.schedule()
+
+    async def flush(self):
+        async with self._write_lock:
+            if not self._pending:
+                return
+            lines, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, lines)
+            except Exception:
+                self._pending[:0] = lines
+                raise
+
+    def _write(self, lines):
+        self._file.write("".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._maybe_rotate()
+
+    async def close(self):
+        await self._flusher.close()
+        try:
+            await self.flush()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
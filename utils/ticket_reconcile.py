@@ -0,0 +1,200 @@
+from datetime import timedelta
+
+import discord
+
+from utils.category_pool import OVERFLOW_SEPARATOR
+
+REQUIRED_FIELDS = ("user_id", "guild_id", "ticket_type")
+
+
+def is_complete(data):
+    return all(data.get(field) is not None for field in REQUIRED_FIELDS)
+
+
+def _is_member_target(target):
+    if isinstance(target, (discord.Member, discord.User)):
+        return True
+    return isinstance(target, discord.Object) and getattr(target, "type", None) in (discord.Member, discord.User)
+
+
+def member_overwrites(channel):
+    return [
+        (target.id, overwrite)
+        for target, overwrite in channel.overwrites.items()
+        if _is_member_target(target) and not getattr(target, "bot", False)
+    ]
+
+
+def owner_of(channel):
+    # Handlers are granted through roles, so the owner is the member overwrite
+    # that may send; closing only adds deny overwrites for the closer.
+    overwrites = member_overwrites(channel)
+    for member_id, overwrite in overwrites:
+        if overwrite.send_messages:
+            return member_id
+    return overwrites[0][0] if overwrites else None
+
+
+def looks_closed(channel):
+    return any(overwrite.read_messages is False for _, overwrite in member_overwrites(channel))
+
+
+def reopened_overwrites(channel, ticket_overwrites):
+    # Undoes a close: the member deny overwrites looks_closed() keys on are
+    # dropped and the ticket type's overwrites (owner included) put back,
+    # which also restores the roles an auto-expire hid.
+    overwrites = {
+        target: overwrite
+        for target, overwrite in channel.overwrites.items()
+        if not (_is_member_target(target) and overwrite.read_messages is False)
+    }
+    overwrites.update(ticket_overwrites)
+    return overwrites
+
+
+def ticket_type_of(channel, reason_map, type_roles):
+    topic = getattr(channel, "topic", None) or ""
+    if " - " in topic:
+        reason = topic.rsplit(" - ", 1)[1]
+        for ticket_type, label in reason_map.items():
+            if label == reason:
+                return ticket_type
+    # Fall back to the ticket type whose handler roles match the overwrites.
+    role_ids = {target.id for target in channel.overwrites if not _is_member_target(target)}
+    for ticket_type, handler_ids in type_roles.items():
+        if handler_ids and handler_ids <= role_ids:
+            return ticket_type
+    return None
+
+
+def rebuild_metadata(channel, data, reason_map, type_roles):
+    # Everything comes from the gateway cache: overwrites, topic, creation
+    # time and the last message snowflake.
+    rebuilt = dict(data)
+    rebuilt["channel_id"] = channel.id
+    rebuilt["guild_id"] = channel.guild.id
+    if rebuilt.get("user_id") is None:
+        rebuilt["user_id"] = owner_of(channel)
+    if rebuilt.get("ticket_type") is None:
+        rebuilt["ticket_type"] = ticket_type_of(channel, reason_map, type_roles)
+    if rebuilt.get("opened_at") is None:
+        rebuilt["opened_at"] = (channel.created_at.replace(tzinfo=None) + timedelta(hours=7)).isoformat()
+    if rebuilt.get("last_activity") is None:
+        last_id = getattr(channel, "last_message_id", None)
+        created = discord.utils.snowflake_time(last_id) if last_id else channel.created_at
+        rebuilt["last_activity"] = created.timestamp()
+    return rebuilt
+
+
+def ticket_categories(guild, base):
+    if base is None:
+        return []
+    prefix = f"{base.name}{OVERFLOW_SEPARATOR}"
+    return [base] + [category for category in guild.categories if category.name.startswith(prefix)]
+
+
+class ReconcileReport:
+    def __init__(self):
+        self.rebuilt = []
+        self.purged_active = []
+        self.purged_closed = []
+        self.adopted = []
+        self.skipped = 0
+
+    def __bool__(self):
+        return bool(self.rebuilt or self.purged_active or self.purged_closed or self.adopted)
+
+    def summary(self):
+        return (
+            f"{len(self.rebuilt)} metadata dibangun ulang, "
+            f"{len(self.purged_active)} ticket aktif yatim dihapus, "
+            f"{len(self.purged_closed)} ticket tertutup yatim dihapus, "
+            f"{len(self.adopted)} channel ticket diadopsi, "
+            f"{self.skipped} dilewati"
+        )
+
+
+def _guild_ready(bot, guild_id):
+    guild = bot.get_guild(guild_id) if guild_id is not None else None
+    return guild if guild is not None and not guild.unavailable else None
+
+
+def _channel_gone(bot, data, all_ready, owns_all_guilds):
+    # A missing channel only counts as deleted once its guild is loaded.
+    # Archived threads are not cached, so thread tickets are kept while their
+    # parent channel exists.
+    if data.get("parent_id") is not None:
+        return bot.get_channel(data["parent_id"]) is None and _guild_ready(bot, data.get("guild_id")) is not None
+    if data.get("guild_id") is not None:
+        return _guild_ready(bot, data["guild_id"]) is not None
+    # Legacy records without a guild can only be judged by a process that
+    # sees every guild; a cluster worker would purge other clusters' tickets.
+    return all_ready and owns_all_guilds
+
+
+def reconcile(bot, store, config, reason_map, owns_all_guilds=True):
+    report = ReconcileReport()
+    all_ready = not any(guild.unavailable for guild in bot.guilds)
+
+    for channel_id, data in list(store.active.items()):
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            if _channel_gone(bot, data, all_ready, owns_all_guilds):
+                store.pop_active(channel_id)
+                report.purged_active.append(channel_id)
+            else:
+                report.skipped += 1
+            continue
+        if not is_complete(data) or "last_activity" not in data:
+            type_roles = type_roles_for(store, config, channel.guild)
+            store.add_active(channel_id, rebuild_metadata(channel, data, reason_map, type_roles))
+            report.rebuilt.append(channel_id)
+
+    for channel_id, data in list(store.closed.items()):
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            if _channel_gone(bot, data, all_ready, owns_all_guilds):
+                store.pop_closed(channel_id)
+                report.purged_closed.append(channel_id)
+            else:
+                report.skipped += 1
+        elif data.get("guild_id") is None:
+            store.add_closed(channel_id, {**data, "guild_id": channel.guild.id})
+            report.rebuilt.append(channel_id)
+
+    for guild in bot.guilds:
+        if guild.unavailable:
+            continue
+        categories = ticket_categories(guild, config.get(guild).category)
+        type_roles = None
+        for category in categories:
+            for channel in category.text_channels:
+                if channel.id in store.active or channel.id in store.closed:
+                    continue
+                if not channel.name.startswith("ticket-"):
+                    continue
+                if owner_of(channel) is None:
+                    continue
+                if type_roles is None:
+                    type_roles = type_roles_for(store, config, guild)
+                data = rebuild_metadata(channel, {}, reason_map, type_roles)
+                if looks_closed(channel):
+                    store.add_closed(channel.id, {
+                        "user_id": data["user_id"],
+                        "guild_id": guild.id,
+                        "ticket_type": data["ticket_type"],
+                        "closed_by": None
+                    })
+                else:
+                    store.add_active(channel.id, data)
+                report.adopted.append(channel.id)
+    return report
+
+
+def type_roles_for(store, config, guild):
+    panel = store.get_panel(guild.id) or {}
+    guild_config = config.get(guild)
+    return {
+        button["custom_id"]: guild_config.ticket_type(button["custom_id"]).role_ids
+        for button in panel.get("buttons", [])
+    }
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import math
+import time
+
+from utils.ticket_storage import atomic_write, read_json
+from utils.write_behind import DebouncedFlush
+
+HOURLY_RETENTION = 30 * 24
+
+
+# Log-bucketed quantile sketch: every value lands in bucket ceil(log_gamma(x)),
+# so any quantile is within relative_accuracy of the true value and memory is
+# bounded by the value range, not by how many tickets were closed.
+class QuantileSketch:
+    def __init__(self, relative_accuracy=0.02):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            "accuracy": self.relative_accuracy,
+            "zero": self.zero,
+            "count": self.count,
+            "buckets": {str(key): count for key, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get("accuracy", 0.02))
+        sketch.zero = data.get("zero", 0)
+        sketch.count = data.get("count", 0)
+        sketch.buckets = {int(key): count for key, count in data.get("buckets", {}).items()}
+        return sketch
+
+
+class GuildStats:
+    def __init__(self):
+        self.opened = 0
+        self.closed = 0
+        self.auto_closed = 0
+        self.by_type = {}
+        self.by_handler = {}
+        self.time_to_close = QuantileSketch()
+        self.time_to_close_by_type = {}
+        # hour (unix time // 3600) -> [opened, closed]
+        self.hourly = {}
+
+    def _bump_hour(self, timestamp, column):
+        hour = int(timestamp // 3600)
+        bucket = self.hourly.setdefault(hour, [0, 0])
+        bucket[column] += 1
+        if len(self.hourly) > HOURLY_RETENTION:
+            cutoff = hour - HOURLY_RETENTION
+            for old in [h for h in self.hourly if h <= cutoff]:
+                del self.hourly[old]
+
+    def record_open(self, timestamp):
+        self.opened += 1
+        self._bump_hour(timestamp, 0)
+
+    def record_close(self, ticket_type, closed_by, duration, timestamp):
+        self.closed += 1
+        type_key = ticket_type or "unknown"
+        self.by_type[type_key] = self.by_type.get(type_key, 0) + 1
+        if isinstance(closed_by, int):
+            self.by_handler[str(closed_by)] = self.by_handler.get(str(closed_by), 0) + 1
+        else:
+            self.auto_closed += 1
+        if duration is not None:
+            self.time_to_close.add(duration)
+            self.time_to_close_by_type.setdefault(type_key, QuantileSketch()).add(duration)
+        self._bump_hour(timestamp, 1)
+
+    def volume(self, hours, now=None):
+        current = int((now or time.time()) // 3600)
+        opened = closed = 0
+        for hour in range(current - hours + 1, current + 1):
+            bucket = self.hourly.get(hour)
+            if bucket:
+                opened += bucket[0]
+                closed += bucket[1]
+        return opened, closed
+
+    def to_dict(self):
+        return {
+            "opened": self.opened,
+            "closed": self.closed,
+            "auto_closed": self.auto_closed,
+            "by_type": self.by_type,
+            "by_handler": self.by_handler,
+            "time_to_close": self.time_to_close.to_dict(),
+            "time_to_close_by_type": {key: sketch.to_dict() for key, sketch in self.time_to_close_by_type.items()},
+            "hourly": {str(hour): bucket for hour, bucket in self.hourly.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.opened = data.get("opened", 0)
+        stats.closed = data.get("closed", 0)
+        stats.auto_closed = data.get("auto_closed", 0)
+        stats.by_type = data.get("by_type", {})
+        stats.by_handler = data.get("by_handler", {})
+        stats.time_to_close = QuantileSketch.from_dict(data.get("time_to_close", {}))
+        stats.time_to_close_by_type = {
+            key: QuantileSketch.from_dict(sketch) for key, sketch in data.get("time_to_close_by_type", {}).items()
+        }
+        stats.hourly = {int(hour): bucket for hour, bucket in data.get("hourly", {}).items()}
+        return stats
+
+
+# Aggregates are updated as tickets open and close and saved with the same
+# debounced write-behind as the ticket store, so /ticketstats never rescans
+# the ticket log.
+class TicketStats:
+    def __init__(self, path, flush_delay=10.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.guilds = {}
+        self._dirty = False
+        self._flusher = DebouncedFlush(self.flush, lambda: self._dirty, flush_delay)
+
+    async def load(self):
+        data = await asyncio.to_thread(read_json, self.path, {})
+        self.guilds = {int(guild_id): GuildStats.from_dict(stats) for guild_id, stats in data.items()}
+
+    def get(self, guild_id):
+        return self.guilds.get(guild_id)
+
+    def _guild(self, guild_id):
+        stats = self.guilds.get(guild_id)
+        if stats is None:
+            stats = self.guilds[guild_id] = GuildStats()
+        return stats
+
+    def record_open(self, guild_id, timestamp=None):
+        self._guild(guild_id).record_open(timestamp or time.time())
+        self._mark_dirty()
+
+    def record_close(self, guild_id, ticket_type, closed_by, duration, timestamp=None):
+        self._guild(guild_id).record_close(ticket_type, closed_by, duration, timestamp or time.time())
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        self._dirty = True
+        self._flusher.schedule()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        payload = json.dumps({str(guild_id): stats.to_dict() for guild_id, stats in self.guilds.items()})
+        try:
+            await asyncio.to_thread(atomic_write, self.path, payload)
+        except Exception:
+            self._dirty = True
+            raise
+
+    async def close(self):
+        await self._flusher.close()
+        await self.flush()
@@ -0,0 +1,356 @@
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.ticket_journal import iter_journal
+
+
+def read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return default
+
+
+def atomic_write(path, payload):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+
+def normalize_bans(raw):
+    # Permanent bans are bare user ids, as in older files; temporary bans are
+    # [user_id, expires_at] pairs.
+    bans = {}
+    for guild_id, entries in raw.items():
+        users = bans[str(guild_id)] = {}
+        for entry in entries:
+            if isinstance(entry, list):
+                users[int(entry[0])] = entry[1]
+            else:
+                users[int(entry)] = None
+    return bans
+
+
+def dump_bans(bans):
+    return {
+        guild_id: [user_id if expires_at is None else [user_id, expires_at] for user_id, expires_at in users.items()]
+        for guild_id, users in bans.items()
+        if users
+    }
+
+
+def load_json_state(files):
+    bans = normalize_bans(read_json(files["bans"], {}))
+    panels = read_json(files["panels"], {})
+
+    active = read_json(files["active"], [])
+    # Older versions stored a bare list of channel ids.
+    if isinstance(active, list):
+        active = {int(ch_id): {"channel_id": int(ch_id)} for ch_id in active}
+    else:
+        active = {int(ch_id): data for ch_id, data in active.items()}
+
+    closed = read_json(files["closed"], {})
+    closed = {int(ch_id): data for ch_id, data in closed.items()}
+    return {"bans": bans, "panels": panels, "active": active, "closed": closed}
+
+
+# A backend turns the store's dirty collections into durable state.
+# prepare() runs on the event loop and must copy whatever it needs out of the
+# live dicts; everything else runs off the loop.
+class StorageBackend:
+    async def load(self):
+        raise NotImplementedError
+
+    def prepare(self, name, items, keys):
+        raise NotImplementedError
+
+    async def commit(self, payloads):
+        raise NotImplementedError
+
+    async def append_log(self, entry):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class JsonStorage(StorageBackend):
+    def __init__(self, bans_file, panels_file, active_file, closed_file, journal):
+        self.files = {
+            "bans": bans_file,
+            "panels": panels_file,
+            "active": active_file,
+            "closed": closed_file,
+        }
+        self.journal = journal
+
+    async def load(self):
+        await self.journal.open()
+        return await asyncio.to_thread(load_json_state, self.files)
+
+    def prepare(self, name, items, keys):
+        # Flat files can only be rewritten whole, so dirty keys are ignored.
+        if name in ("active", "closed"):
+            return json.dumps({str(ch_id): data for ch_id, data in items.items()})
+        if name == "bans":
+            return json.dumps(dump_bans(items))
+        return json.dumps(items)
+
+    async def commit(self, payloads):
+        await asyncio.to_thread(self._write_payloads, payloads)
+
+    def _write_payloads(self, payloads):
+        for name, payload in payloads.items():
+            atomic_write(self.files[name], payload)
+
+    async def append_log(self, entry):
+        self.journal.append(entry)
+
+    async def close(self):
+        await self.journal.close()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS bans (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS panels (
+    guild_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS active_tickets (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    user_id INTEGER,
+    ticket_type TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS active_tickets_owner ON active_tickets (guild_id, user_id, ticket_type);
+CREATE TABLE IF NOT EXISTS closed_tickets (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    user_id INTEGER,
+    ticket_type TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS closed_tickets_owner ON closed_tickets (guild_id, user_id, ticket_type);
+CREATE TABLE IF NOT EXISTS ticket_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_id INTEGER,
+    guild_id INTEGER,
+    user_id INTEGER,
+    ticket_type TEXT,
+    closed_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ticket_log_owner ON ticket_log (guild_id, user_id, ticket_type);
+CREATE INDEX IF NOT EXISTS ticket_log_channel ON ticket_log (channel_id);
+CREATE INDEX IF NOT EXISTS ticket_log_closed_at ON ticket_log (closed_at);
+"""
+
+TICKET_TABLES = {"active": "active_tickets", "closed": "closed_tickets"}
+
+
+def _ticket_row(channel_id, data):
+    return (
+        int(channel_id),
+        data.get("guild_id"),
+        data.get("user_id"),
+        data.get("ticket_type"),
+        json.dumps(data),
+    )
+
+
+def _log_row(entry):
+    return (
+        entry.get("channel_id"),
+        entry.get("guild_id"),
+        entry.get("user_id"),
+        entry.get("ticket_type"),
+        entry.get("closed_at"),
+        json.dumps(entry),
+    )
+
+
+class SqliteStorage(StorageBackend):
+    def __init__(self, path, legacy_files=None, legacy_log_file=None, legacy_log_dir=None, owns_guild=None):
+        self.path = path
+        # In cluster mode several processes share the file and each one only
+        # loads and replaces rows for the guilds it owns.
+        self.owns_guild = owns_guild or (lambda guild_id: True)
+        self.legacy_files = legacy_files
+        self.legacy_log_file = legacy_log_file
+        self.legacy_log_dir = legacy_log_dir
+        # One worker thread owns the connection, so every query is serialised
+        # without blocking the event loop.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ticket-sqlite")
+        self._conn = None
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function("owns_guild", 1, self.owns_guild, deterministic=True)
+            conn.executescript(SCHEMA)
+            self._upgrade(conn)
+            self._conn = conn
+        return self._conn
+
+    def _upgrade(self, conn):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(bans)")}
+        if "expires_at" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE bans ADD COLUMN expires_at REAL")
+
+    async def load(self):
+        return await self._run(self._load)
+
+    def _load(self):
+        conn = self._connect()
+        if self.legacy_files and not self._migrated(conn):
+            # Other cluster workers may race for the migration; the write lock
+            # lets exactly one of them run it.
+            conn.execute("BEGIN IMMEDIATE")
+            if self._migrated(conn):
+                conn.rollback()
+            else:
+                self._migrate_json(conn)
+
+        bans = {}
+        for guild_id, user_id, expires_at in conn.execute("SELECT guild_id, user_id, expires_at FROM bans WHERE owns_guild(guild_id)"):
+            bans.setdefault(str(guild_id), {})[user_id] = expires_at
+        panels = {str(guild_id): json.loads(data) for guild_id, data in conn.execute("SELECT guild_id, data FROM panels WHERE owns_guild(guild_id)")}
+        active = {ch_id: json.loads(data) for ch_id, data in conn.execute("SELECT channel_id, data FROM active_tickets WHERE owns_guild(guild_id)")}
+        closed = {ch_id: json.loads(data) for ch_id, data in conn.execute("SELECT channel_id, data FROM closed_tickets WHERE owns_guild(guild_id)")}
+        return {"bans": bans, "panels": panels, "active": active, "closed": closed}
+
+    def _migrated(self, conn):
+        return conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone() is not None
+
+    def _migrate_json(self, conn):
+        state = load_json_state(self.legacy_files)
+        with conn:
+            for guild_id, users in state["bans"].items():
+                conn.executemany(
+                    "INSERT OR IGNORE INTO bans (guild_id, user_id, expires_at) VALUES (?, ?, ?)",
+                    [(int(guild_id), user_id, expires_at) for user_id, expires_at in users.items()]
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO panels (guild_id, data) VALUES (?, ?)",
+                [(int(guild_id), json.dumps(panel)) for guild_id, panel in state["panels"].items()]
+            )
+            for name, table in TICKET_TABLES.items():
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?, ?)",
+                    [_ticket_row(ch_id, data) for ch_id, data in state[name].items()]
+                )
+            log_sql = "INSERT INTO ticket_log (channel_id, guild_id, user_id, ticket_type, closed_at, data) VALUES (?, ?, ?, ?, ?, ?)"
+            if self.legacy_log_file:
+                conn.executemany(log_sql, [_log_row(entry) for entry in read_json(self.legacy_log_file, [])])
+            if self.legacy_log_dir:
+                conn.executemany(log_sql, (_log_row(entry) for entry in iter_journal(self.legacy_log_dir)))
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', '1')")
+
+    def prepare(self, name, items, keys):
+        if name == "bans":
+            # Ban keys are (guild_id, user_id) pairs, so a ban touches one row.
+            if keys is None:
+                keys = [(g, user_id) for g, users in items.items() for user_id in users]
+            rows = {}
+            for g, user_id in keys:
+                users = items.get(g, {})
+                rows[(int(g), user_id)] = (users[user_id],) if user_id in users else None
+            return keys is None, rows
+        if name == "panels":
+            guild_ids = items.keys() if keys is None else keys
+            return keys is None, {int(g): json.dumps(items[g]) if g in items else None for g in guild_ids}
+        channel_ids = items.keys() if keys is None else keys
+        return keys is None, {
+            ch_id: _ticket_row(ch_id, items[ch_id]) if ch_id in items else None
+            for ch_id in channel_ids
+        }
+
+    async def commit(self, payloads):
+        await self._run(self._commit, payloads)
+
+    def _commit(self, payloads):
+        conn = self._connect()
+        with conn:
+            for name, (replace_all, rows) in payloads.items():
+                if name == "bans":
+                    if replace_all:
+                        conn.execute("DELETE FROM bans WHERE owns_guild(guild_id)")
+                    conn.executemany(
+                        "DELETE FROM bans WHERE guild_id = ? AND user_id = ?",
+                        [key for key, row in rows.items() if row is None]
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO bans (guild_id, user_id, expires_at) VALUES (?, ?, ?)",
+                        [(*key, *row) for key, row in rows.items() if row is not None]
+                    )
+                elif name == "panels":
+                    if replace_all:
+                        conn.execute("DELETE FROM panels WHERE owns_guild(guild_id)")
+                    for guild_id, data in rows.items():
+                        if data is None:
+                            conn.execute("DELETE FROM panels WHERE guild_id = ?", (guild_id,))
+                        else:
+                            conn.execute("INSERT OR REPLACE INTO panels (guild_id, data) VALUES (?, ?)", (guild_id, data))
+                else:
+                    table = TICKET_TABLES[name]
+                    if replace_all:
+                        conn.execute(f"DELETE FROM {table} WHERE owns_guild(guild_id)")
+                    for ch_id, row in rows.items():
+                        if row is None:
+                            conn.execute(f"DELETE FROM {table} WHERE channel_id = ?", (ch_id,))
+                        else:
+                            conn.execute(f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?, ?)", row)
+
+    async def append_log(self, entry):
+        await self._run(self._append_log, _log_row(entry))
+
+    def _append_log(self, row):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO ticket_log (channel_id, guild_id, user_id, ticket_type, closed_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                row
+            )
+
+    async def close(self):
+        def shutdown():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        await self._run(shutdown)
+        self._executor.shutdown(wait=True)
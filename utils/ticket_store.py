@@ -0,0 +1,227 @@
+import asyncio
+import time
+import weakref
+
+from utils.metrics import DISABLED
+from utils.write_behind import DebouncedFlush
+
+
+# Interactions only touch the in-memory dicts. Each mutation marks the changed
+# key dirty and the backend persists every dirty collection once per
+# flush_delay window, however many clicks happened in between.
+class TicketStore:
+    def __init__(self, backend, flush_delay=2.0, metrics=DISABLED):
+        self.backend = backend
+        self.flush_delay = flush_delay
+        self.metrics = metrics
+        self.bans = {}
+        self.panels = {}
+        self.active = {}
+        self.closed = {}
+        # (guild_id, user_id, ticket_type) -> channel_id of the open ticket
+        self.owner_index = {}
+        self._owner_locks = weakref.WeakValueDictionary()
+        # message_id -> guild_id of the panel it carries, kept current from
+        # gateway delete events so clicks never have to fetch the panel.
+        self.panel_messages = {}
+        # name -> set of dirty keys, or None when the whole collection changed
+        self._dirty = {}
+        self._flush_lock = asyncio.Lock()
+        # Keys dirtied while a flush is in flight are picked up by the next pass.
+        self._flusher = DebouncedFlush(self.flush, lambda: bool(self._dirty), flush_delay)
+
+    async def load(self):
+        state = await self.backend.load()
+        self.bans = state["bans"]
+        self.panels = state["panels"]
+        self.active = state["active"]
+        self.closed = state["closed"]
+        self.owner_index = {}
+        for channel_id, data in self.active.items():
+            self._index_active(channel_id, data)
+        self.panel_messages = {}
+        for guild_id, panel in self.panels.items():
+            self._index_panel(guild_id, panel)
+
+    def _merge_dirty(self, name, keys):
+        if keys is None:
+            self._dirty[name] = None
+        elif name not in self._dirty:
+            self._dirty[name] = set(keys)
+        elif self._dirty[name] is not None:
+            self._dirty[name].update(keys)
+
+    def mark_dirty(self, name, key=None):
+        self._merge_dirty(name, None if key is None else (key,))
+        self._flusher.schedule()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+            payloads = {
+                name: self.backend.prepare(name, getattr(self, name), keys)
+                for name, keys in dirty.items()
+            }
+            started = time.perf_counter()
+            try:
+                await self.backend.commit(payloads)
+            except Exception:
+                for name, keys in dirty.items():
+                    self._merge_dirty(name, keys)
+                raise
+            self.metrics.observe("ticket_store_flush_seconds", time.perf_counter() - started)
+
+    async def close(self):
+        await self._flusher.close()
+        try:
+            await self.flush()
+        finally:
+            await self.backend.close()
+
+    async def append_log(self, entry):
+        started = time.perf_counter()
+        await self.backend.append_log(entry)
+        self.metrics.observe("ticket_log_append_seconds", time.perf_counter() - started)
+
+    # bans maps guild_id -> {user_id: expires_at or None}, so a check is one
+    # dict lookup. Expired temporary bans are dropped when next looked at.
+    def is_banned(self, guild_id, user_id):
+        banned = self.bans.get(str(guild_id))
+        if not banned or user_id not in banned:
+            return False
+        expires_at = banned[user_id]
+        if expires_at is not None and expires_at <= time.time():
+            self.unban(guild_id, user_id)
+            return False
+        return True
+
+    def ban_expiry(self, guild_id, user_id):
+        return self.bans.get(str(guild_id), {}).get(user_id)
+
+    def ban(self, guild_id, user_id, expires_at=None):
+        if self.is_banned(guild_id, user_id) and self.ban_expiry(guild_id, user_id) == expires_at:
+            return False
+        self.bans.setdefault(str(guild_id), {})[user_id] = expires_at
+        self.mark_dirty("bans", (str(guild_id), user_id))
+        return True
+
+    def ban_many(self, guild_id, entries):
+        return sum(1 for user_id, expires_at in entries if self.ban(guild_id, user_id, expires_at))
+
+    def unban(self, guild_id, user_id):
+        banned = self.bans.get(str(guild_id))
+        if not banned or user_id not in banned:
+            return False
+        del banned[user_id]
+        self.mark_dirty("bans", (str(guild_id), user_id))
+        return True
+
+    def export_bans(self, guild_id):
+        banned = self.bans.get(str(guild_id), {})
+        return sorted(
+            (user_id, banned[user_id])
+            for user_id in list(banned)
+            if self.is_banned(guild_id, user_id)
+        )
+
+    def _index_panel(self, guild_id, panel):
+        if panel.get("message_id") is not None:
+            self.panel_messages[panel["message_id"]] = guild_id
+
+    def get_panel(self, guild_id):
+        return self.panels.get(str(guild_id))
+
+    def set_panel(self, guild_id, panel):
+        previous = self.panels.get(str(guild_id))
+        if previous is not None:
+            self.panel_messages.pop(previous.get("message_id"), None)
+        self.panels[str(guild_id)] = panel
+        self._index_panel(str(guild_id), panel)
+        self.mark_dirty("panels", str(guild_id))
+
+    def update_panel(self, guild_id):
+        self.mark_dirty("panels", str(guild_id))
+
+    def remove_panel(self, guild_id):
+        panel = self.panels.pop(str(guild_id), None)
+        if panel is None:
+            return False
+        self.panel_messages.pop(panel.get("message_id"), None)
+        self.mark_dirty("panels", str(guild_id))
+        return True
+
+    def remove_panel_by_message(self, message_id):
+        guild_id = self.panel_messages.get(message_id)
+        if guild_id is None:
+            return False
+        return self.remove_panel(guild_id)
+
+    def remove_panels_in_channel(self, channel_id):
+        guild_ids = [guild_id for guild_id, panel in self.panels.items() if panel.get("channel_id") == channel_id]
+        for guild_id in guild_ids:
+            self.remove_panel(guild_id)
+        return len(guild_ids)
+
+    @staticmethod
+    def _owner_key(data):
+        if data.get("guild_id") is None or data.get("user_id") is None:
+            return None
+        return (data["guild_id"], data["user_id"], data.get("ticket_type"))
+
+    def _index_active(self, channel_id, data):
+        key = self._owner_key(data)
+        if key is not None:
+            self.owner_index[key] = channel_id
+
+    def _unindex_active(self, channel_id, data):
+        key = self._owner_key(data)
+        if key is not None and self.owner_index.get(key) == channel_id:
+            del self.owner_index[key]
+
+    def find_active(self, guild_id, user_id, ticket_type):
+        return self.owner_index.get((guild_id, user_id, ticket_type))
+
+    def owner_lock(self, guild_id, user_id, ticket_type):
+        # Held across the duplicate check and channel creation so a double
+        # click cannot open two tickets. Locks vanish once nobody holds them.
+        key = (guild_id, user_id, ticket_type)
+        lock = self._owner_locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._owner_locks[key] = lock
+        return lock
+
+    def add_active(self, channel_id, data):
+        previous = self.active.get(channel_id)
+        if previous is not None:
+            self._unindex_active(channel_id, previous)
+        self.active[channel_id] = data
+        self._index_active(channel_id, data)
+        self.mark_dirty("active", channel_id)
+
+    def pop_active(self, channel_id):
+        data = self.active.pop(channel_id, None)
+        if data is not None:
+            self._unindex_active(channel_id, data)
+            self.mark_dirty("active", channel_id)
+        return data
+
+    def add_closed(self, channel_id, data):
+        self.closed[channel_id] = data
+        self.mark_dirty("closed", channel_id)
+
+    def update_closed(self, channel_id, **fields):
+        data = self.closed.get(channel_id)
+        if data is None:
+            return False
+        data.update(fields)
+        self.mark_dirty("closed", channel_id)
+        return True
+
+    def pop_closed(self, channel_id):
+        data = self.closed.pop(channel_id, None)
+        if data is not None:
+            self.mark_dirty("closed", channel_id)
+        return data
@@ -0,0 +1,302 @@
+import asyncio
+import contextlib
+import gzip
+import html
+import json
+import os
+import tempfile
+
+from utils.write_behind import DebouncedFlush
+
+TRANSCRIPT_FORMATS = ("txt", "jsonl", "html")
+SPOOL_MAX_SIZE = 1024 * 1024
+
+HTML_HEADER = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; background: #313338; color: #dbdee1; }}
+.msg {{ padding: 4px 8px; border-bottom: 1px solid #3f4147; }}
+.meta {{ color: #949ba4; font-size: 12px; }}
+.author {{ font-weight: bold; color: #f2f3f5; }}
+.content {{ white-space: pre-wrap; }}
+.extra {{ color: #00a8fc; font-size: 13px; margin-left: 12px; }}
+</style></head><body><h2>{title}</h2>
+"""
+HTML_FOOTER = "</body></html>\n"
+
+
+def message_record(msg, event="message"):
+    return {
+        "event": event,
+        "id": msg.id,
+        "created_at": msg.created_at.isoformat(),
+        "edited_at": msg.edited_at.isoformat() if msg.edited_at else None,
+        "author_id": msg.author.id,
+        "author": str(msg.author),
+        "content": msg.content,
+        "attachments": [
+            {
+                "filename": a.filename,
+                "url": a.url,
+                "size": a.size,
+                "content_type": a.content_type,
+            }
+            for a in msg.attachments
+        ],
+        "embeds": [
+            {
+                "title": e.title,
+                "description": e.description,
+                "url": e.url,
+            }
+            for e in msg.embeds
+        ],
+    }
+
+
+def _format_text(record):
+    time_str = record["created_at"][:16].replace("T", " ")
+    label = record["author"]
+    if record.get("author_id") is not None:
+        label = f"{label} (<@{record['author_id']}>)"
+    event = record.get("event", "message")
+    marker = "" if event == "message" else f" [{event}]"
+    lines = [f"[{time_str}] {label}{marker}: {record.get('content') or ''}"]
+    for a in record.get("attachments", []):
+        lines.append(f"    📎 {a['filename']} ({a['url']})")
+    for e in record.get("embeds", []):
+        parts = [p for p in (e.get("title"), e.get("description")) if p]
+        lines.append(f"    [embed] {' — '.join(parts)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_html(record):
+    event = record.get("event", "message")
+    marker = "" if event == "message" else f" [{html.escape(event)}]"
+    parts = [
+        '<div class="msg">',
+        f'<span class="author">{html.escape(record["author"])}</span> ',
+        f'<span class="meta">{html.escape(record["created_at"])}{marker}</span>',
+        f'<div class="content">{html.escape(record.get("content") or "")}</div>',
+    ]
+    for a in record.get("attachments", []):
+        url = html.escape(a["url"], quote=True)
+        parts.append(f'<div class="extra">📎 <a href="{url}">{html.escape(a["filename"])}</a></div>')
+    for e in record.get("embeds", []):
+        text = " — ".join(p for p in (e.get("title"), e.get("description")) if p)
+        parts.append(f'<div class="extra">[embed] {html.escape(text)}</div>')
+    parts.append("</div>\n")
+    return "".join(parts)
+
+
+# Encodes records one at a time into a spooled temp file: small transcripts
+# stay in memory, large ones roll over to disk, so memory use does not grow
+# with the number of messages.
+class TranscriptWriter:
+    def __init__(self, name, fmt="txt", compress=False):
+        if fmt not in TRANSCRIPT_FORMATS:
+            raise ValueError(f"Unknown transcript format: {fmt}")
+        self.name = name
+        self.fmt = fmt
+        self.compress = compress
+        self.count = 0
+        self._raw = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+        self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb") if compress else self._raw
+        if fmt == "html":
+            self._write(HTML_HEADER.format(title=html.escape(name)))
+
+    @property
+    def filename(self):
+        name = f"transcript-{self.name}.{self.fmt}"
+        return name + ".gz" if self.compress else name
+
+    def _write(self, text):
+        self._stream.write(text.encode("utf-8"))
+
+    def write(self, record):
+        self.count += 1
+        if self.fmt == "jsonl":
+            self._write(json.dumps(record, ensure_ascii=False) + "\n")
+        elif self.fmt == "html":
+            self._write(_format_html(record))
+        else:
+            self._write(_format_text(record))
+
+    def finish(self):
+        if self.count == 0 and self.fmt == "txt":
+            self._write("No messages.")
+        if self.fmt == "html":
+            self._write(HTML_FOOTER)
+        if self.compress:
+            self._stream.close()
+        self._raw.seek(0)
+        return self._raw
+
+
+async def export_history(channel, fmt="txt", compress=False):
+    writer = TranscriptWriter(channel.name, fmt, compress)
+    try:
+        # history() pages 100 messages per request, so only one page is held
+        # in memory at a time.
+        async for msg in channel.history(limit=None, oldest_first=True):
+            writer.write(message_record(msg))
+    except BaseException:
+        writer.finish().close()
+        raise
+    return writer.finish(), writer.filename
+
+
+def raw_message_record(data, event):
+    author = data.get("author") or {}
+    name = author.get("username", "unknown")
+    if author.get("discriminator") not in (None, "0"):
+        name = f"{name}#{author['discriminator']}"
+    return {
+        "event": event,
+        "id": int(data["id"]),
+        "created_at": data.get("edited_timestamp") or data.get("timestamp") or "",
+        "edited_at": data.get("edited_timestamp"),
+        "author_id": int(author["id"]) if "id" in author else None,
+        "author": name,
+        "content": data.get("content", ""),
+        "attachments": [
+            {
+                "filename": a.get("filename"),
+                "url": a.get("url"),
+                "size": a.get("size"),
+                "content_type": a.get("content_type"),
+            }
+            for a in data.get("attachments", [])
+        ],
+        "embeds": [
+            {
+                "title": e.get("title"),
+                "description": e.get("description"),
+                "url": e.get("url"),
+            }
+            for e in data.get("embeds", [])
+        ],
+    }
+
+
+def render_spool(path, name, fmt="txt", compress=False):
+    writer = TranscriptWriter(name, fmt, compress)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            writer.write(record)
+    return writer.finish(), writer.filename
+
+
+def transcript_size(fp):
+    size = fp.seek(0, os.SEEK_END)
+    fp.seek(0)
+    return size
+
+
+# Splits a transcript that is over the upload limit into numbered parts of at
+# most limit bytes, cut after a newline when one is in reach so text parts
+# stay readable. Compressed parts are plain byte ranges: concatenating them
+# gives back the original .gz. Returns None if more than max_parts are needed.
+def split_transcript(fp, filename, limit, max_parts):
+    size = transcript_size(fp)
+    if size > limit * max_parts:
+        return None
+    parts = []
+    carry = b""
+    while True:
+        chunk = carry + fp.read(limit - len(carry))
+        if not chunk:
+            break
+        carry = b""
+        if len(chunk) == limit and not filename.endswith(".gz"):
+            cut = chunk.rfind(b"\n") + 1
+            if cut:
+                chunk, carry = chunk[:cut], chunk[cut:]
+        part = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+        part.write(chunk)
+        part.seek(0)
+        parts.append(part)
+        if len(parts) > max_parts:
+            for part in parts:
+                part.close()
+            return None
+    return [(part, f"part{index}-{filename}") for index, part in enumerate(parts, 1)]
+
+
+# Per-ticket append-only spool of message, edit and delete events captured
+# from the gateway. Only channels started through start() are recorded, so a
+# spool always covers a ticket from its first message.
+class TranscriptSpool:
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._known = set()
+        self._pending = {}
+        self._write_lock = asyncio.Lock()
+        self._flusher = DebouncedFlush(self.flush, lambda: bool(self._pending), flush_interval)
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if name.endswith(".jsonl"):
+                self._known.add(int(name[:-len(".jsonl")]))
+
+    def path(self, channel_id):
+        return os.path.join(self.directory, f"{channel_id}.jsonl")
+
+    def __contains__(self, channel_id):
+        return channel_id in self._known
+
+    def start(self, channel_id):
+        self._known.add(channel_id)
+        self._pending.setdefault(channel_id, [])
+        self._flusher.schedule()
+
+    def record(self, channel_id, record):
+        if channel_id not in self._known:
+            return
+        self._pending.setdefault(channel_id, []).append(json.dumps(record, ensure_ascii=False) + "\n")
+        self._flusher.schedule()
+
+    async def flush(self, channel_id=None):
+        async with self._write_lock:
+            if channel_id is None:
+                pending, self._pending = self._pending, {}
+            elif channel_id in self._pending:
+                pending = {channel_id: self._pending.pop(channel_id)}
+            else:
+                return
+            try:
+                await asyncio.to_thread(self._write, pending)
+            except Exception:
+                # Put the lines back in front of anything recorded meanwhile.
+                for ch_id, lines in pending.items():
+                    if ch_id in self._known:
+                        self._pending[ch_id] = lines + self._pending.get(ch_id, [])
+                raise
+
+    def _write(self, pending):
+        for channel_id, lines in pending.items():
+            with open(self.path(channel_id), "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+
+    async def render(self, channel_id, name, fmt="txt", compress=False):
+        await self.flush(channel_id)
+        return await asyncio.to_thread(render_spool, self.path(channel_id), name, fmt, compress)
+
+    async def discard(self, channel_id):
+        if channel_id not in self._known:
+            return
+        self._known.discard(channel_id)
+        self._pending.pop(channel_id, None)
+        async with self._write_lock:
+            with contextlib.suppress(FileNotFoundError):
+                await asyncio.to_thread(os.unlink, self.path(channel_id))
+
+    async def close(self):
+        await self._flusher.close()
+        await self.flush()
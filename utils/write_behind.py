@@ -0,0 +1,56 @@
+import asyncio
+import contextlib
+import traceback
+
+
+# Debounced background flush shared by the write-behind stores. The owner
+# marks data dirty and calls schedule(); one task then calls flush() once per
+# delay window while pending() is true. Failed flushes are retried with
+# exponential back-off instead of spinning. Once close() is called the task
+# exits without another attempt, so the owner's final flush runs exactly once
+# and its error reaches the caller.
+class DebouncedFlush:
+    def __init__(self, flush, pending, delay, max_backoff=60.0):
+        self.flush = flush
+        self.pending = pending
+        self.delay = delay
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+    def schedule(self):
+        if self._closing:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def wake(self):
+        # Flush now instead of at the end of the window (e.g. a full batch).
+        self._wake.set()
+
+    def next_delay(self):
+        if not self.failures:
+            return self.delay
+        return min(self.max_backoff, self.delay * 2 ** self.failures)
+
+    async def _run(self):
+        while self.pending() and not self._closing:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.next_delay())
+            self._wake.clear()
+            if self._closing:
+                break
+            try:
+                await self.flush()
+                self.failures = 0
+            except Exception:
+                self.failures += 1
+                traceback.print_exc()
+
+    async def close(self):
+        self._closing = True
+        self._wake.set()
+        if self._task is not None and not self._task.done():
+            await self._task